@@ -1,23 +1,62 @@
 """ Git utils
 """
 
+import base64
+import hashlib
+import json
 import logging
+import os
 import sh
 import re
+import tempfile
+import threading
+import time
+from pathlib import Path
 from subprocess import run
-from typing import Dict, List
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote
 from .github_api import Repository
+from .run import concurrently
 import requests
 import requests.auth
 from retry import retry
 
 log = logging.getLogger(__name__)
 
+# Seconds a cached ref listing is trusted before it is revalidated against the remote
+REF_CACHE_TTL = int(os.environ.get("REF_CACHE_TTL", 600))
+
 
 def _natural_sort_key(s, _nsre=re.compile("([0-9]+)")):
     return [int(text) if text.isdigit() else text for text in _nsre.split(s)]
 
 
+def _redact(url):
+    """Drops any credentials from a remote url"""
+    return re.sub(r"//[^/@]+@", "//", url)
+
+
+def _credentials(url) -> Tuple[str, Optional[str]]:
+    """Splits a remote url into the url without credentials and those credentials"""
+    match = re.search(r"//([^/@]+)@", url)
+    return _redact(url), match and unquote(match.group(1))
+
+
+def _auth_env(userinfo) -> Optional[Dict[str, str]]:
+    """Environment sending credentials to a remote without storing them in a config"""
+    if not userinfo:
+        return None
+    token = base64.b64encode(userinfo.encode()).decode()
+    count = int(os.environ.get("GIT_CONFIG_COUNT", 0))
+    return {
+        **os.environ,
+        "GIT_CONFIG_COUNT": str(count + 1),
+        f"GIT_CONFIG_KEY_{count}": "http.extraheader",
+        f"GIT_CONFIG_VALUE_{count}": f"Authorization: Basic {token}",
+    }
+
+
 def default_gh_branch(repo: str, ignore_errors=False, auth=None):
     """
     Fetch the default GitHub branch.
@@ -43,14 +82,20 @@ def default_gh_branch(repo: str, ignore_errors=False, auth=None):
             raise
 
 
-def clone(url, **subprocess_kwargs):
+def clone(url, dest=None, branch=None, strategy=None, **subprocess_kwargs):
     """Clone package repo"""
-    run(["git", "clone", url], **subprocess_kwargs)
+    strategy = strategy or FULL
+    run(["git", *strategy.clone_args(url, dest, branch)], **subprocess_kwargs)
 
 
-def fetch(origin="origin", **subprocess_kwargs):
+def fetch(origin="origin", strategy=None, **subprocess_kwargs):
     """Fetch"""
-    run(["git", "fetch", origin], **subprocess_kwargs)
+    strategy = strategy or FULL
+    if strategy.reference:
+        url = remote_url(origin, **subprocess_kwargs)
+        if url:
+            borrow_objects(url, **subprocess_kwargs)
+    run(["git", "fetch", *strategy.fetch_args(), origin], **subprocess_kwargs)
 
 
 def checkout(ref, new_branch=False, force=False, **subprocess_kwargs):
@@ -105,11 +150,22 @@ def commit(message, **subprocess_kwargs):
 def push(origin="origin", ref="master", **subprocess_kwargs):
     """Pushes commit to repo"""
     run(["git", "push", origin, ref], **subprocess_kwargs)
+    url = remote_url(origin, **subprocess_kwargs)
+    if url:
+        ref_cache.invalidate(url)
 
 
 def merge(origin="origin", ref="master", **subprocess_kwargs):
     """Merges branch"""
-    run(["git", "merge", f"{origin}/{ref}"], **subprocess_kwargs)
+    return run(["git", "merge", f"{origin}/{ref}"], **subprocess_kwargs)
+
+
+def is_ancestor(ancestor, ref="HEAD", **subprocess_kwargs) -> bool:
+    """Checks if ancestor is already in the history of ref"""
+    output = run(
+        ["git", "merge-base", "--is-ancestor", ancestor, ref], **subprocess_kwargs
+    )
+    return output.returncode == 0
 
 
 def remote_add(origin, url, **subprocess_kwargs):
@@ -117,19 +173,286 @@ def remote_add(origin, url, **subprocess_kwargs):
     run(["git", "remote", "add", origin, url], **subprocess_kwargs)
 
 
+def remote_url(origin="origin", **subprocess_kwargs) -> Optional[str]:
+    """Returns the url of a configured remote, or None if it isn't known"""
+    output = run(
+        ["git", "remote", "get-url", origin],
+        capture_output=True,
+        text=True,
+        **subprocess_kwargs,
+    )
+    if output.returncode != 0:
+        return None
+    return output.stdout.strip()
+
+
+# retry because this fails often against git.launchpad.net
+@retry(delay=1, backoff=2, tries=7)  # exponential, fails after ~63 seconds
+def _ls_remote(url) -> str:
+    """Lists the heads and tags of a remote in a single round-trip"""
+    return str(sh.git("ls-remote", "--heads", "--tags", "--refs", url))
+
+
+class RefCache:
+    """Persistent cache of remote ref listings keyed by repo url.
+
+    Both heads and tags are listed by one `git ls-remote` and stored together,
+    so `remote_tags` and `remote_branches` of the same repo share a single
+    round-trip. Entries are kept in memory and under `path` on disk so that
+    separate invocations within a job reuse them.
+
+    Git has no conditional ls-remote, so once an entry is older than `ttl`
+    it is revalidated by listing the remote again and comparing a digest of
+    the output against the stored etag; an unchanged listing only refreshes
+    the timestamp.
+    """
+
+    def __init__(self, path=None, ttl=REF_CACHE_TTL):
+        if path is None:
+            path = Path(os.environ.get("WORKSPACE", "/tmp")) / "cache" / "git-refs"
+        self.path = Path(path)
+        self.ttl = ttl
+        self._entries = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _url_lock(self, url) -> threading.Lock:
+        # one lock per remote so listing different repos can happen concurrently
+        with self._lock:
+            return self._locks.setdefault(url, threading.Lock())
+
+    def _entry_path(self, url) -> Path:
+        # urls may carry credentials, never write them out in a file name
+        return self.path / f"{hashlib.sha256(url.encode()).hexdigest()}.json"
+
+    def _load(self, url) -> Optional[dict]:
+        if url in self._entries:
+            return self._entries[url]
+        try:
+            entry = json.loads(self._entry_path(url).read_text())
+        except (OSError, ValueError):
+            return None
+        self._entries[url] = entry
+        return entry
+
+    def _store(self, url, entry):
+        self._entries[url] = entry
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+            with os.fdopen(fd, "w") as fp:
+                json.dump(entry, fp)
+            os.replace(tmp, self._entry_path(url))
+        except OSError:
+            log.exception(f"Unable to persist ref cache in {self.path}")
+
+    def refs(self, url) -> Dict[str, str]:
+        """Returns a mapping of ref name to commit sha for a remote"""
+        with self._url_lock(url):
+            entry = self._load(url)
+            if entry and time.time() - entry["timestamp"] < self.ttl:
+                return entry["refs"]
+
+            output = _ls_remote(url)
+            etag = hashlib.sha256(output.encode()).hexdigest()
+            if entry and entry["etag"] == etag:
+                log.debug("Revalidated cached refs")
+                entry["timestamp"] = time.time()
+            else:
+                refs = {}
+                for line in output.splitlines():
+                    sha, _, ref = line.partition("\t")
+                    refs[ref.strip()] = sha
+                entry = {"etag": etag, "timestamp": time.time(), "refs": refs}
+            self._store(url, entry)
+            return entry["refs"]
+
+    def prefetch(self, urls, workers=8):
+        """Lists the refs of many remotes at once"""
+        _, failed = concurrently(
+            self.refs, sorted(set(urls)), workers=workers, name=_redact
+        )
+        for url in failed:
+            log.error(f"Couldn't prefetch refs of {url}, will retry on use")
+
+    def invalidate(self, url):
+        """Drops the cached listing of a remote after it was changed"""
+        with self._url_lock(url):
+            self._entries.pop(url, None)
+            self._entry_path(url).unlink(missing_ok=True)
+
+
+ref_cache = RefCache()
+
+
+# retry because this fails often against git.launchpad.net
+@retry(delay=1, backoff=2, tries=7)  # exponential, fails after ~63 seconds
+def _git_remote(*args, **kwargs):
+    """Runs a git command which talks to a remote"""
+    return sh.git(*args, **kwargs)
+
+
+class MirrorCache:
+    """Persistent bare mirrors of remote repos keyed by url.
+
+    A mirror is cloned once, then kept current with `git fetch`, at most once
+    per process. Checkouts are added to it as worktrees, so nothing but the
+    working files is written for each one. Mirrors outlive the job, so they
+    only ever record the url without credentials, which are sent per command.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = Path(os.environ.get("WORKSPACE", "/tmp")) / "cache" / "git-mirrors"
+        self.path = Path(path)
+        self._fetched = set()
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _url_lock(self, url) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(_redact(url), threading.Lock())
+
+    def mirror_path(self, url) -> Path:
+        url = _redact(url)
+        return self.path / f"{hashlib.sha256(url.encode()).hexdigest()}.git"
+
+    def update(self, url) -> Path:
+        """Clones or fetches the mirror of a remote, returning its path"""
+        url, userinfo = _credentials(url)
+        env = _auth_env(userinfo)
+        auth = {"_env": env} if env else {}
+        mirror = self.mirror_path(url)
+        with self._url_lock(url):
+            if url in self._fetched:
+                return mirror
+            if (mirror / "HEAD").exists():
+                log.debug(f"Fetching mirror {mirror}")
+                # mirrors made before credentials were split off still had them
+                sh.git("--git-dir", str(mirror), "remote", "set-url", "origin", url)
+                _git_remote(
+                    "--git-dir", str(mirror), "fetch", "--prune", "origin", **auth
+                )
+            else:
+                self.path.mkdir(parents=True, exist_ok=True)
+                tmp = tempfile.mkdtemp(dir=self.path, suffix=".tmp")
+                _git_remote("clone", "--mirror", url, tmp, **auth)
+                os.replace(tmp, mirror)
+            self._fetched.add(url)
+        return mirror
+
+    def rev_parse(self, url, ref) -> str:
+        """Returns the commit sha of a ref in the mirror of a remote"""
+        mirror = self.update(url)
+        output = sh.git(
+            "--git-dir", str(mirror), "rev-parse", "--verify", f"{ref}^{{commit}}"
+        )
+        return str(output).strip()
+
+    def worktree(self, url, ref, dest) -> str:
+        """Checks out a ref of a remote at dest, returning its commit sha"""
+        sha = self.rev_parse(url, ref)
+        mirror = self.mirror_path(url)
+        with self._url_lock(url):
+            # forget worktrees whose directories were cleaned away
+            sh.git("--git-dir", str(mirror), "worktree", "prune")
+            sh.git(
+                "--git-dir",
+                str(mirror),
+                "worktree",
+                "add",
+                "--force",
+                "--detach",
+                str(dest),
+                sha,
+            )
+        return sha
+
+
+mirror_cache = MirrorCache()
+
+
+@dataclass(frozen=True)
+class CloneStrategy:
+    """How much of a remote a caller needs cloned or fetched.
+
+    reference: borrow objects from the mirror cache rather than downloading
+               them, the mirror itself only fetches what is new since last run
+    depth:     truncate history to this many commits
+    blobless:  partial clone fetching file contents only when checked out
+    """
+
+    reference: bool = False
+    depth: Optional[int] = None
+    blobless: bool = False
+
+    def clone_args(self, url, dest=None, branch=None) -> List[str]:
+        """Arguments to `git` cloning url with this strategy"""
+        args = ["clone"]
+        if self.reference:
+            args += ["--reference-if-able", str(mirror_cache.update(url))]
+        if self.depth:
+            # --depth implies --single-branch, a --branch tag is fetched too
+            args += ["--depth", str(self.depth)]
+        if self.blobless:
+            args.append("--filter=blob:none")
+        if branch:
+            args += ["--branch", branch]
+        args.append(url)
+        if dest:
+            args.append(str(dest))
+        return args
+
+    def fetch_args(self) -> List[str]:
+        """Arguments to `git fetch` with this strategy"""
+        # a filter only applies to the remote a partial clone was made from
+        return ["--depth", str(self.depth)] if self.depth else []
+
+
+# full history and contents
+FULL = CloneStrategy()
+# full history, reusing objects already in the mirror cache
+REFERENCE = CloneStrategy(reference=True)
+# full history, contents of only the checked out commits
+BLOBLESS = CloneStrategy(blobless=True)
+# a single commit, when only the tip of a branch or tag is needed
+SHALLOW = CloneStrategy(depth=1)
+
+
+def borrow_objects(url, **subprocess_kwargs):
+    """Lets the repo at cwd read objects from the mirror of url
+
+    Fetching a remote then only transfers objects the mirror lacks.
+    """
+    mirror = mirror_cache.update(url)
+    output = run(
+        ["git", "rev-parse", "--git-path", "objects/info/alternates"],
+        capture_output=True,
+        text=True,
+        **subprocess_kwargs,
+    )
+    alternates = Path(subprocess_kwargs.get("cwd") or ".") / output.stdout.strip()
+    existing = alternates.read_text().split() if alternates.exists() else []
+    objects = str(mirror.resolve() / "objects")
+    if objects not in existing:
+        alternates.parent.mkdir(parents=True, exist_ok=True)
+        with alternates.open("a") as fp:
+            fp.write(f"{objects}\n")
+
+
 def remote_tags(url, **subprocess_kwargs):
     """Returns a list of remote tags"""
-    refs = sh.git("ls-remote", "-t", "--refs", url)
-    tags = [line.split("/")[2] for line in refs.splitlines()]
+    refs = ref_cache.refs(url)
+    tags = [ref.split("/")[2] for ref in refs if ref.startswith("refs/tags/")]
     return sorted(tags, key=_natural_sort_key)
 
 
-# retry because this fails often against git.launchpad.net
-@retry(delay=1, backoff=2, tries=7)  # exponential, fails after ~63 seconds
 def remote_branches(url, **subprocess_kwargs):
     """Returns a list of remote branches"""
-    refs = sh.git("ls-remote", "-h", "--refs", url)
-    tags = ["/".join(line.split("/")[2:]) for line in refs.splitlines()]
+    refs = ref_cache.refs(url)
+    tags = [
+        "/".join(ref.split("/")[2:]) for ref in refs if ref.startswith("refs/heads/")
+    ]
     branches = ["main", "master"]  # wokeignore:rule=master
     return sorted(filter(lambda t: t not in branches, tags), key=_natural_sort_key)
 
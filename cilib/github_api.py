@@ -1,15 +1,106 @@
 from dataclasses import dataclass, asdict
+from multiprocessing.pool import ThreadPool
+from pathlib import Path
+import hashlib
+import json
 import logging
 import os
+import re
+import tempfile
+import threading
+import time
 from types import SimpleNamespace
-from typing import Tuple
-from urllib.parse import quote
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import quote, urlencode, urlparse, parse_qs
 import requests
+import requests.adapters
 import requests.auth
+import requests.structures
 
 
 LOG = logging.getLogger("github_api")
 
+# Connections kept open to api.github.com by each shared session
+POOL_SIZE = 16
+# Pages of a listing fetched at once once the last page is known
+PAGE_WORKERS = 8
+# Longest time spent waiting for a rate limit to reset before giving up
+MAX_RATE_LIMIT_WAIT = 300
+# Repositories resolved by each GraphQL query of bulk_resolve
+BULK_BATCH_SIZE = 40
+GRAPHQL_API = "https://api.github.com/graphql"
+# Upper bound of the on-disk response cache before least recently used entries go
+RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+class ResponseCache:
+    """On-disk cache of GitHub GET responses revalidated with their ETag.
+
+    GitHub doesn't count `304 Not Modified` answers against the rate limit,
+    so a cached body is only downloaded again when it changed. Entries are
+    evicted least recently used first once they take more than `max_bytes`.
+    """
+
+    HEADERS = ["Content-Type", "ETag", "Link"]
+
+    def __init__(self, path, max_bytes=RESPONSE_CACHE_MAX_BYTES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+
+    def _entry_path(self, key) -> Path:
+        return self.path / f"{hashlib.sha256(key.encode()).hexdigest()}.json"
+
+    def get(self, key) -> Optional[dict]:
+        entry_path = self._entry_path(key)
+        try:
+            entry = json.loads(entry_path.read_text())
+        except (OSError, ValueError):
+            return None
+        entry_path.touch()
+        return entry
+
+    def put(self, key, resp):
+        entry = {
+            "headers": {h: resp.headers[h] for h in self.HEADERS if h in resp.headers},
+            "body": resp.text,
+        }
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+            with os.fdopen(fd, "w") as fp:
+                json.dump(entry, fp)
+            os.replace(tmp, self._entry_path(key))
+            self._evict()
+        except OSError:
+            LOG.exception(f"Unable to persist response cache in {self.path}")
+
+    def _evict(self):
+        entries = []
+        for entry_path in self.path.glob("*.json"):
+            try:
+                stat = entry_path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry_path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            entry_path.unlink(missing_ok=True)
+            total -= size
+
+    @staticmethod
+    def response(entry, not_modified) -> requests.Response:
+        """Rebuilds the cached response answered by a 304."""
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.headers = requests.structures.CaseInsensitiveDict(entry["headers"])
+        resp._content = entry["body"].encode()
+        resp.encoding = "utf-8"
+        resp.url = not_modified.url
+        resp.request = not_modified.request
+        return resp
+
 
 class AuthSession(requests.Session):
     WRITE_METHODS = [
@@ -19,19 +110,58 @@ class AuthSession(requests.Session):
         "PUT",
     ]
 
-    def __init__(self, auth: Tuple[str, str] = None, read_only=True) -> None:
+    _shared: Dict[tuple, "AuthSession"] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(
+        self, auth: Tuple[str, str] = None, read_only=True, cache: ResponseCache = None
+    ) -> None:
         super().__init__()
         self._read_only = read_only
+        self._cache = cache
 
         user, passwd = auth or (
             quote(os.environ.get(_) or "") for _ in ["CDKBOT_GH_USR", "CDKBOT_GH_PSW"]
         )
         if all([user, passwd]):
             self.auth = requests.auth.HTTPBasicAuth(user, passwd)
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=POOL_SIZE)
+        self.mount("https://", adapter)
+
+    @classmethod
+    def shared(cls, auth: Tuple[str, str] = None, read_only=True) -> "AuthSession":
+        """Session, and its connection pool, shared by every user of the same credentials.
 
-    def request(self, method, *args, **kwargs):
-        if self._read_only and method.upper() in self.WRITE_METHODS:
-            _args = ", ".join(args)
+        Setting GH_RESPONSE_CACHE to a directory opts these sessions into the
+        on-disk ResponseCache.
+        """
+        key = (tuple(auth) if auth else None, read_only)
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cache_dir = os.environ.get("GH_RESPONSE_CACHE")
+                cache = ResponseCache(cache_dir) if cache_dir else None
+                cls._shared[key] = cls(auth=auth, read_only=read_only, cache=cache)
+            return cls._shared[key]
+
+    @staticmethod
+    def _rate_limit_delay(resp):
+        """Seconds to wait before retrying a rate limited response, None if it wasn't."""
+        if resp.status_code not in (403, 429):
+            return None
+        if "Retry-After" in resp.headers:
+            return int(resp.headers["Retry-After"])
+        if resp.headers.get("X-RateLimit-Remaining") == "0":
+            reset = int(resp.headers.get("X-RateLimit-Reset", 0))
+            return max(reset - time.time(), 1)
+        return None
+
+    def request(self, method, url, *args, **kwargs):
+        is_write = method.upper() in self.WRITE_METHODS
+        if is_write and url == GRAPHQL_API:
+            # GraphQL reads are POSTed too, only its mutations write
+            is_write = not _is_graphql_query(kwargs.get("json"))
+        if self._read_only and is_write:
+            _args = ", ".join([url, *args])
             _kwds = ", ".join(f"{k}={v}" for k, v in kwargs.items())
             LOG.debug(f"{method}({_args}, {_kwds})")
             return SimpleNamespace(
@@ -40,7 +170,115 @@ class AuthSession(requests.Session):
                 text=f"{method} blocked by `read_only` flag",
                 raise_for_status=lambda: None,
             )
-        return super().request(method, *args, **kwargs)
+
+        cached, cache_key = None, None
+        if self._cache and method.upper() == "GET":
+            user = self.auth.username if self.auth else ""
+            cache_key = f"{user}@{url}"
+            cached = self._cache.get(cache_key)
+            if cached and "ETag" in cached["headers"]:
+                headers = dict(kwargs.get("headers") or {})
+                headers["If-None-Match"] = cached["headers"]["ETag"]
+                kwargs["headers"] = headers
+
+        waited = 0
+        while True:
+            resp = super().request(method, url, *args, **kwargs)
+            delay = self._rate_limit_delay(resp)
+            if delay is None or waited + delay > MAX_RATE_LIMIT_WAIT:
+                break
+            LOG.warning(f"GitHub rate limit hit, retrying in {delay:.0f}s")
+            time.sleep(delay)
+            waited += delay
+
+        if cache_key and cached and resp.status_code == 304:
+            return self._cache.response(cached, resp)
+        if cache_key and resp.ok and "ETag" in resp.headers:
+            self._cache.put(cache_key, resp)
+        return resp
+
+
+def _is_graphql_query(body) -> bool:
+    """Whether a GraphQL request body holds nothing but queries."""
+    document = body.get("query") if isinstance(body, dict) else None
+    if not isinstance(document, str):
+        return False
+    # drop comments and strings, then look for any other operation type
+    document = re.sub(r'#[^\n]*|"(?:\\.|[^"\\])*"', "", document)
+    return not re.search(r"\b(mutation|subscription)\b", document)
+
+
+# Listings and default branches resolved by bulk_resolve, keyed by (owner, repo)
+_SEEDED: Dict[Tuple[str, str], Dict[str, object]] = {}
+
+_BULK_FIELDS = """
+    defaultBranchRef { name }
+    branches: refs(refPrefix: "refs/heads/", first: 100) {
+      nodes { name }
+      pageInfo { hasNextPage }
+    }
+    tags: refs(refPrefix: "refs/tags/", first: 100) {
+      nodes { name }
+      pageInfo { hasNextPage }
+    }
+"""
+
+
+def _repo_key(path: str) -> Optional[Tuple[str, str]]:
+    """(owner, repo) of a GitHub url or owner/repo path, None if it isn't one."""
+    parsed = urlparse(path)
+    if parsed.netloc and not parsed.netloc.endswith("github.com"):
+        return None
+    parts = [p for p in parsed.path.split("/") if p]
+    if len(parts) != 2:
+        return None
+    owner, repo = parts
+    return owner.lower(), repo.replace(".git", "").lower()
+
+
+def bulk_resolve(
+    repos: Iterable[str], auth: Tuple[str, str] = None, batch_size=BULK_BATCH_SIZE
+):
+    """Resolves default branch, branches and tags of many repos with GraphQL.
+
+    The results seed every Repository of those repos, so their `default_branch`,
+    `branches` and `tags` no longer need a REST round-trip each. Repositories
+    which couldn't be resolved, or whose refs don't fit in one page, keep
+    using the REST API.
+
+    :param repos: GitHub urls or owner/repo paths, anything else is ignored
+    :param tuple[str, str] auth: username/password used by basic-auth
+    """
+    keys = sorted({key for key in map(_repo_key, repos) if key})
+    session = AuthSession.shared(auth=auth)
+    for start in range(0, len(keys), batch_size):
+        end = start + batch_size
+        batch = keys[start:end]
+        query = "query {%s}" % "".join(
+            f"r{n}: repository(owner: {json.dumps(owner)}, name: {json.dumps(repo)})"
+            f"{{{_BULK_FIELDS}}}"
+            for n, (owner, repo) in enumerate(batch)
+        )
+        try:
+            resp = session.post(GRAPHQL_API, json={"query": query})
+        except requests.RequestException:
+            LOG.exception("GraphQL query failed, falling back to REST")
+            return
+        if not resp.ok:
+            LOG.warning(f"GraphQL query failed {resp.status_code}: {resp.text}")
+            return
+        data = resp.json().get("data") or {}
+        for n, key in enumerate(batch):
+            found = data.get(f"r{n}")
+            if not found:
+                continue
+            seed = _SEEDED.setdefault(key, {})
+            if found["defaultBranchRef"]:
+                seed["default_branch"] = found["defaultBranchRef"]["name"]
+            for refs in ["branches", "tags"]:
+                if not found[refs]["pageInfo"]["hasNextPage"]:
+                    seed[refs] = [node["name"] for node in found[refs]["nodes"]]
+    LOG.info(f"Resolved {len(keys)} repositories with GraphQL")
 
 
 @dataclass
@@ -63,7 +301,7 @@ class Repository:
     def with_session(
         cls, owner: str, repo: str, auth: Tuple[str, str] = None, read_only=True
     ):
-        session = AuthSession(auth=auth, read_only=read_only)
+        session = AuthSession.shared(auth=auth, read_only=read_only)
         return cls(session, owner, repo)
 
     @property
@@ -73,25 +311,58 @@ class Repository:
         str_d["repo"] = str_d["repo"].replace(".git", "")
         return str_d
 
+    def _get_page(self, url: str):
+        resp = self.session.get(url)
+        resp.raise_for_status()
+        return resp
+
     def _paginate(self, base_url: str, transform):
-        result = []
         url = base_url.format(**self._render)
-        while url:
-            resp = self.session.get(url)
-            result += [transform(t) for t in resp.json()]
-            url = resp.links.get("next", {}).get("url")
-        return result
+        pages = [self._get_page(url)]
+        last_url = pages[0].links.get("last", {}).get("url")
+        if last_url:
+            # the last page is known, so fetch every page in between at once
+            parsed = urlparse(last_url)
+            query = parse_qs(parsed.query)
+            last_page = int(query["page"][0])
+            urls = [
+                parsed._replace(query=urlencode({**query, "page": n}, doseq=True))
+                for n in range(2, last_page + 1)
+            ]
+            with ThreadPool(min(PAGE_WORKERS, len(urls))) as pool:
+                pages += pool.map(self._get_page, [u.geturl() for u in urls])
+        else:
+            next_url = pages[0].links.get("next", {}).get("url")
+            while next_url:
+                pages.append(self._get_page(next_url))
+                next_url = pages[-1].links.get("next", {}).get("url")
+        return [transform(t) for resp in pages for t in resp.json()]
+
+    @property
+    def _seeded(self) -> Dict[str, object]:
+        render = self._render
+        return _SEEDED.get((render["owner"].lower(), render["repo"].lower()), {})
+
+    def _unseed(self):
+        render = self._render
+        _SEEDED.pop((render["owner"].lower(), render["repo"].lower()), None)
 
     @property
     def tags(self):
+        if "tags" in self._seeded:
+            return list(self._seeded["tags"])
         return self._paginate(self._TAG_API, lambda t: t["name"])
 
     @property
     def branches(self):
+        if "branches" in self._seeded:
+            return list(self._seeded["branches"])
         return self._paginate(self._BRANCH_API, lambda t: t["name"])
 
     @property
     def default_branch(self):
+        if "default_branch" in self._seeded:
+            return self._seeded["default_branch"]
         resp = self.session.get(self._REPO_API.format(**self._render))
         if resp.ok:
             return resp.json()["default_branch"]
@@ -104,6 +375,7 @@ class Repository:
             headers={"Accept": "application/vnd.github+json"},
             json={"new_name": to_name},
         )
+        self._unseed()
         if not resp.ok:
             LOG.error(f"Rename Branch {resp.status_code}: {resp.text}")
         resp.raise_for_status()
@@ -161,6 +433,7 @@ class Repository:
             headers={"Accept": "application/vnd.github+json"},
             json=dict(ref=ref, sha=sha),
         )
+        self._unseed()
         return resp
 
 
@@ -1,23 +1,49 @@
 """Launchpad PPA model"""
 
-from cilib import lp, version
+import threading
+from cilib import lp, log, version
+from typing import Dict, Optional, Tuple
 
 
 class PPA:
     def __init__(self, collection):
         self.collection = collection
+        self._sources = None
+        self._latest = None
+        self._lock = threading.Lock()
+
+    @property
+    def name(self):
+        return self.collection.name
 
     @property
     def sources(self):
-        """Return the published sources for PPA collection"""
-        return [
-            {
-                "name": pkg.source_package_name,
-                "version": pkg.source_package_version,
-                "status": pkg.status,
-            }
-            for pkg in self.collection.getPublishedSources()
-        ]
+        """Return the published sources for PPA collection
+
+        Launchpad is only asked once, later calls reuse the listing.
+        """
+        with self._lock:
+            if self._sources is None:
+                self._sources = [
+                    {
+                        "name": pkg.source_package_name,
+                        "version": pkg.source_package_version,
+                        "status": pkg.status,
+                    }
+                    for pkg in self.collection.getPublishedSources()
+                ]
+        return self._sources
+
+    @property
+    def latest(self) -> Dict[str, dict]:
+        """Latest published source of each package by name"""
+        if self._latest is None:
+            latest = {}
+            # sources are listed newest first
+            for pkg in self.published:
+                latest.setdefault(pkg["name"], pkg)
+            self._latest = latest
+        return self._latest
 
     @property
     def published(self):
@@ -26,10 +52,7 @@ class PPA:
 
     def get_latest_source(self, name):
         """Gets the latest published package by name"""
-        for pkg in self.published:
-            if pkg["name"] == name:
-                return pkg
-        return None
+        return self.latest.get(name)
 
     def get_source_semver(self, name):
         """Get semver for latest published package"""
@@ -42,15 +65,43 @@ class PPA:
 class PPACollection:
     def __init__(self, ppas):
         self.ppas = ppas
+        self._by_name = None
 
-    def get_ppa_by_major_minor(self, major_minor):
+    @property
+    def _archives(self) -> Dict[str, PPA]:
+        # listing the owner's ppas is a launchpad request too, only make it once
+        if self._by_name is None:
+            self._by_name = {_ppa.name: PPA(_ppa) for _ppa in self.ppas}
+        return self._by_name
+
+    def get_ppa_by_major_minor(self, major_minor) -> Optional[PPA]:
         """Returns the ppa archive by name which is major.minor"""
-        for _ppa in self.ppas:
-            if _ppa.name == major_minor:
-                return PPA(_ppa)
-        return None
+        return self._archives.get(major_minor)
 
     @property
     def names(self):
         """Returns a list of all ppas in collection by name"""
-        return [_ppa.name for _ppa in self.ppas]
+        return list(self._archives)
+
+    def prefetch(self):
+        """Lists the published sources of every ppa up front
+
+        The ppas share one launchpadlib client, which isn't thread safe, so
+        they are listed one after another. There are only a handful of them.
+        """
+        for name, ppa in self._archives.items():
+            try:
+                ppa.sources
+            except Exception:
+                log.exception(
+                    f"Couldn't prefetch sources of ppa {name}, will retry on use"
+                )
+
+    @property
+    def index(self) -> Dict[Tuple[str, str], dict]:
+        """Latest published source of each package keyed by (ppa, package)"""
+        return {
+            (name, package): pkg
+            for name, ppa in self._archives.items()
+            for package, pkg in ppa.latest.items()
+        }
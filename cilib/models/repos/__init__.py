@@ -57,9 +57,9 @@ class BaseRepoModel(log.DebugMixin):
 
         return _request_get(url)
 
-    def clone(self, **subprocess_kwargs):
+    def clone(self, branch=None, strategy=None, **subprocess_kwargs):
         """Clone package repo"""
-        git.clone(self.repo, **subprocess_kwargs)
+        git.clone(self.repo, branch=branch, strategy=strategy, **subprocess_kwargs)
 
     def checkout(
         self, ref="master", new_branch=False, force=False, **subprocess_kwargs
@@ -84,13 +84,17 @@ class BaseRepoModel(log.DebugMixin):
         """Pushes commit to repo"""
         git.push(origin, ref, **subprocess_kwargs)
 
-    def fetch(self, origin="origin", **subprocess_kwargs):
+    def fetch(self, origin="origin", strategy=None, **subprocess_kwargs):
         """Fetch package repo"""
-        git.fetch(origin, **subprocess_kwargs)
+        git.fetch(origin, strategy=strategy, **subprocess_kwargs)
 
     def merge(self, origin="origin", ref="master", **subprocess_kwargs):
         """Merge branch repo"""
-        git.merge(origin, ref, **subprocess_kwargs)
+        return git.merge(origin, ref, **subprocess_kwargs)
+
+    def is_ancestor(self, ancestor, ref="HEAD", **subprocess_kwargs):
+        """Checks if ancestor is already merged into ref"""
+        return git.is_ancestor(ancestor, ref, **subprocess_kwargs)
 
     def remote_add(self, origin, url, **subprocess_kwargs):
         """Add a remote to git repo"""
@@ -106,21 +110,31 @@ class BaseRepoModel(log.DebugMixin):
         """Grabs remote branches"""
         return git.remote_branches(self.repo, **subprocess_kwargs)
 
+    @property
+    def tag_index(self):
+        """Semantic version index of the remote tags"""
+        return version.ref_index(self.tags)
+
+    @property
+    def branch_index(self):
+        """Semantic version index of the remote branches"""
+        return version.ref_index(self.branches)
+
     def latest_branch_from_major_minor(self, major_minor, exclude_pre=False):
         """Grabs latest known branch semver for a major.minor release"""
-        return self._latest_from_semver(self.branches, major_minor, exclude_pre)
+        return self._latest_from_semver(self.branch_index, major_minor, exclude_pre)
 
     def latest_tag_from_major_minor(self, major_minor, exclude_pre=False):
         """Grabs latest known tag semver for a major.minor release"""
-        return self._latest_from_semver(self.tags, major_minor, exclude_pre)
+        return self._latest_from_semver(self.tag_index, major_minor, exclude_pre)
 
     def branches_from_semver_point(self, starting_semver):
         """Returns a list of branches from a starting semantic version"""
-        return self._semvers_from_point(self.branches, starting_semver)
+        return self.branch_index.from_point(starting_semver)
 
     def tags_from_semver_point(self, starting_semver):
         """Returns a list of tags from a starting semantic version"""
-        return self._semvers_from_point(self.tags, starting_semver)
+        return self.tag_index.from_point(starting_semver)
 
     def tags_subset(self, alt_model):
         """Grabs a subset of tags from a another repo model"""
@@ -135,54 +149,17 @@ class BaseRepoModel(log.DebugMixin):
 
     # private
 
-    def _latest_from_semver(self, semvers, major_minor, exclude_pre=False):
-        """Grabs latest semver from list of semvers"""
-        _semvers = []
-        for _semver in semvers:
-            try:
-                semver_version = version.parse(_semver)
-                if exclude_pre and semver_version.prerelease is not None:
-                    continue
-                if major_minor == f"{semver_version.major}.{semver_version.minor}":
-                    _semvers.append(str(semver_version))
-            except:
-                continue
-        if not _semvers:
+    def _latest_from_semver(self, index, major_minor, exclude_pre=False):
+        """Grabs latest semver of a major.minor from a semver index"""
+        max_ver = index.latest(major_minor, exclude_pre)
+        if not max_ver:
             return None
-        max_ver = max(map(version.parse, _semvers))
-
-        # Grab the branches for max_ver to determine if there are any patches that need to be applied
-        # If any branches has +patch.X defined we use that build information to determine the latest patched
-        # version of that particular major.minor.patch level and that will be built instead.
-        branches = self.branches_from_semver_point(f"{max_ver.major}.{max_ver.minor}.0")
-        patched_branches = []
-        for branch in branches:
-            if (
-                version.normalize(branch)
-                == f"{max_ver.major}.{max_ver.minor}.{max_ver.patch}"
-                and "patch" in branch
-            ):
-                patched_branches.append(version.parse(branch).build)
-
-        if patched_branches:
-            max_patched = max(patched_branches)
-            return str(f"{max_ver}+{max_patched}")
 
-        return str(max_ver)
+        # If any branch has +patch.X defined for max_ver we use that build information
+        # to determine the latest patched version of that particular major.minor.patch
+        # level and that will be built instead.
+        patch = self.branch_index.patch(max_ver)
+        if patch is not None:
+            return f"{max_ver}+patch.{patch}"
 
-    def _semvers_from_point(self, semvers, starting_semver):
-        """Grabs all semvers from branches or tags at starting semver point"""
-        _semvers = []
-        for _semver in semvers:
-            try:
-                if version.greater(_semver, starting_semver):
-                    _semvers.append(_semver)
-            except ValueError:
-                self.debug(f"Ignoring non-semver branch: {_semver}")
-                continue
-            except Exception:
-                self.exception(
-                    f"Unexpected semver error while parsing branch: {_semver}"
-                )
-                continue
-        return _semvers
+        return str(max_ver)
@@ -1,13 +1,10 @@
 """ Repo classes for downstream snaps """
 
 from . import BaseRepoModel
-from cilib import enums
+from cilib import enums, snapapi
 from cilib.log import DebugMixin
 from cilib.snapapi import SnapStore
 import os
-import sh
-import re
-import semver
 
 
 class SnapBaseRepoModel(DebugMixin):
@@ -35,30 +32,23 @@ class SnapBaseRepoModel(DebugMixin):
     @property
     def revisions(self):
         """Grab revision data"""
-        re_comp = re.compile("[ \t+]{2,}")
-        revision_list = self._get_revision_output()
-
         revision_map = {}
-        for line in revision_list:
-            rev, timestamp, arch, version, channels = re_comp.split(line)
-            channels = [
-                {
-                    "promoted": channel.endswith("*"),
-                    "channel": channel.rstrip("*").strip(),
-                }
-                for channel in channels.split(",")
-            ]
-            try:
-                version = semver.VersionInfo.parse(version)
-            except ValueError:
-                print(f"Skipping invalid semver: {line}")
+        for rev in snapapi.list_revisions(self.name):
+            if not rev.semver_version:
+                print(f"Skipping invalid semver: {rev}")
                 continue
 
-            revision_map[rev] = {
-                "timestamp": timestamp,
-                "arch": arch,
-                "version": version,
-                "channels": channels,
+            revision_map[str(rev.revision)] = {
+                "timestamp": rev.uploaded,
+                "arch": rev.arch,
+                "version": rev.semver_version,
+                "channels": [
+                    {
+                        "promoted": channel.endswith("*"),
+                        "channel": channel.rstrip("*").strip(),
+                    }
+                    for channel in rev.channels
+                ],
             }
         return revision_map
 
@@ -70,11 +60,6 @@ class SnapBaseRepoModel(DebugMixin):
             return None
         return max_rev
 
-    # private
-    def _get_revision_output(self):
-        revision_list = sh.snapcraft.revisions(self.name, _err_to_out=True)
-        return revision_list.splitlines()[1:]
-
 
 class SnapKubeApiServerRepoModel(SnapBaseRepoModel):
     def __init__(self):
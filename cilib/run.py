@@ -3,8 +3,10 @@ import click
 import shlex
 import os
 import tempfile
+from multiprocessing.pool import ThreadPool
 from pathlib import Path
 from types import SimpleNamespace
+from cilib import log
 
 
 def make_executable(path):
@@ -104,3 +106,28 @@ def cmd_ok(script, **kwargs):
     if check and exitcode > 0:
         raise subprocess.CalledProcessError(exitcode, "", "")
     return SimpleNamespace(ok=bool(exitcode == 0), returncode=exitcode)
+
+
+def concurrently(func, items, workers=None, name=str):
+    """Runs func over items on a bounded thread pool
+
+    Unlike ThreadPool.map, a failing item doesn't abort the others. Every
+    exception is logged and collected so callers can report them once all
+    items were processed.
+
+    Returns:
+        results: func's return value per item, in order (None when it failed)
+        failed: exception raised per failing item, keyed by name(item)
+    """
+    failed = {}
+
+    def _call(item):
+        try:
+            return func(item)
+        except Exception as e:
+            log.exception(f"[{name(item)}] {e}")
+            failed[name(item)] = e
+
+    with ThreadPool(workers) as pool:
+        results = pool.map(_call, items, chunksize=1)
+    return results, failed
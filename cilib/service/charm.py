@@ -1,11 +1,41 @@
 """ Charm, layer, interface service object """
 
+from cilib import git
 from cilib.log import DebugMixin
+from dataclasses import dataclass
+from enum import Enum
 from urllib.parse import urlparse
 import tempfile
+import time
 from pathlib import Path
 
 
+class SyncStatus(str, Enum):
+    """How syncing a fork ended."""
+
+    ERROR = "error"
+    CONFLICT = "conflict"
+    SYNCED = "synced"
+    UP_TO_DATE = "up to date"
+    SKIPPED = "skipped"
+
+
+@dataclass
+class SyncResult:
+    """Outcome of syncing a fork with its upstream"""
+
+    name: str
+    upstream: str
+    downstream: str
+    status: SyncStatus
+    detail: str = ""
+    seconds: float = 0.0
+
+
+# git reports these for paths left unmerged
+_CONFLICTED = {"DD", "AU", "UD", "UA", "DU", "AA", "UU"}
+
+
 class CharmService(DebugMixin):
     def __init__(self, repo):
         self.repo = repo
@@ -21,24 +51,69 @@ class CharmService(DebugMixin):
         """checks if upstream equals downstream"""
         return self.upstream_normalized == self.downstream_normalized
 
-    def sync(self):
-        """Syncs all charm, layers, interfaces repositories with their downstream counterparts"""
+    def sync(self) -> SyncResult:
+        """Syncs all charm, layers, interfaces repositories with their downstream counterparts
+
+        Failures are reported in the result rather than raised, so one repo
+        doesn't hold up syncing the others.
+        """
+        result = SyncResult(
+            self.name,
+            self.upstream_normalized,
+            self.downstream_normalized,
+            SyncStatus.SKIPPED,
+        )
+        start = time.monotonic()
+        try:
+            result.status, result.detail = self._sync()
+        except Exception as e:
+            detail = str(e)
+            if self.repo.password:
+                # clone urls carry the bot's credentials
+                detail = detail.replace(self.repo.password, "***")
+            self.error(f"Failed syncing: {detail}")
+            result.status, result.detail = SyncStatus.ERROR, detail
+        result.seconds = round(time.monotonic() - start, 2)
+        return result
+
+    def _sync(self):
         if self.is_upstream_eq_downstream:
             self.log(
                 f"Skipping {self.repo.name} ({self.upstream_normalized} == {self.downstream_normalized})"
             )
-            return
+            return SyncStatus.SKIPPED, "upstream is downstream"
 
         self.log(f"Syncing {self.upstream_normalized} -> {self.downstream_normalized}")
         upstream_ref = self.repo.default_gh_branch(self.upstream_normalized)
         downstream_ref = self.repo.default_gh_branch(self.downstream_normalized)
         with tempfile.TemporaryDirectory() as tmpdir:
             src_path = Path(tmpdir) / self.repo.src
-            self.repo.base.clone(cwd=tmpdir)
+            # merging needs the history of both sides, which the mirrors keep
+            self.repo.base.clone(cwd=tmpdir, strategy=git.REFERENCE, check=True)
             self.repo.base.remote_add(
                 origin="upstream", url=self.repo.upstream, cwd=str(src_path)
             )
-            self.repo.base.fetch(origin="upstream", cwd=str(src_path))
+            self.repo.base.fetch(
+                origin="upstream",
+                strategy=git.REFERENCE,
+                cwd=str(src_path),
+                check=True,
+            )
             self.repo.base.checkout(ref=downstream_ref, cwd=str(src_path))
-            self.repo.base.merge(origin="upstream", ref=upstream_ref, cwd=str(src_path))
+            if self.repo.base.is_ancestor(
+                f"upstream/{upstream_ref}", cwd=str(src_path)
+            ):
+                return SyncStatus.UP_TO_DATE, f"{downstream_ref} has {upstream_ref}"
+            merged = self.repo.base.merge(
+                origin="upstream", ref=upstream_ref, cwd=str(src_path)
+            )
+            if merged.returncode != 0:
+                conflicts = [
+                    each["path"]
+                    for each in self.repo.base.status(cwd=str(src_path))
+                    if each["status"] in _CONFLICTED
+                ]
+                self.error(f"Merging {upstream_ref} conflicts in {conflicts}")
+                return SyncStatus.CONFLICT, ", ".join(conflicts) or "merge failed"
             self.repo.base.push(origin="origin", ref=downstream_ref, cwd=str(src_path))
+        return SyncStatus.SYNCED, f"{upstream_ref} -> {downstream_ref}"
@@ -8,24 +8,43 @@ import os
 import tempfile
 import semver
 import textwrap
+from dataclasses import dataclass
 from functools import cached_property
 from jinja2 import Template
 from pathlib import Path
 from pymacaroons import Macaroon
-from cilib import lp, idm, enums
+from cilib import lp, idm, enums, git
 from cilib.models.ppa import PPACollection
 from cilib.run import cmd_ok
 from cilib.log import DebugMixin
 from drypy.patterns import sham
+from typing import Iterator, List, Optional, Tuple
+
+
+@dataclass
+class DebBuild:
+    """A branch version of a deb package to build and upload to a ppa"""
+
+    package: str
+    ppa: str
+    version: str
+    published: Optional[str] = None
+
+    @property
+    def upload_to(self):
+        return enums.DEB_K8S_TRACK_MAP.get(self.ppa)
 
 
 class DebService(DebugMixin):
-    def __init__(self, deb_model, upstream_model, ppas, sign_key):
+    def __init__(self, deb_model, upstream_model, ppas, sign_key, work_dir="."):
         self.deb_model = deb_model
         self.name = self.deb_model.name
         self.upstream_model = upstream_model
-        self.ppas = PPACollection(ppas)
+        # a shared collection lists each ppa once for every package
+        self.ppas = ppas if isinstance(ppas, PPACollection) else PPACollection(ppas)
         self.sign_key = sign_key
+        # packages built at once each need their own upstream checkout
+        self.work_dir = Path(work_dir)
 
     @cached_property
     def missing_branches(self):
@@ -76,8 +95,8 @@ class DebService(DebugMixin):
                 )
                 self.deb_model.base.push(ref=branch, cwd=str(src_path))
 
-    def sync_debs(self, force=False):
-        """Builds latest deb from each major.minor and uploads to correct ppa"""
+    def _targets(self) -> Iterator[Tuple[str, str, bool]]:
+        """Yields each ppa with the major.minor of branches built into it"""
         for _version in self.supported_versions:
             exclude_pre = True
             if _version == enums.K8S_NEXT_VERSION:
@@ -86,13 +105,22 @@ class DebService(DebugMixin):
                 )
                 # Only pull in pre-releases if building for the next development version
                 exclude_pre = False
-            ppa = self.ppas.get_ppa_by_major_minor(_version)
+            yield _version, _version, exclude_pre
+
+    def plan_builds(self, force=False) -> List[DebBuild]:
+        """Finds the latest branch of each ppa newer than its published deb"""
+        builds = []
+        for ppa_name, major_minor, exclude_pre in self._targets():
+            ppa = self.ppas.get_ppa_by_major_minor(ppa_name)
+            if not ppa:
+                self.error(f"No ppa {ppa_name} to publish to, skipping")
+                continue
             latest_deb_version = ppa.get_source_semver(self.deb_model.name)
             latest_deb_version_mmp = None
             if latest_deb_version:
                 latest_deb_version_mmp = f"{latest_deb_version.major}.{latest_deb_version.minor}.{latest_deb_version.patch}"
             latest_branch_version = self.deb_model.base.latest_branch_from_major_minor(
-                _version, exclude_pre
+                major_minor, exclude_pre
             )
             if (
                 force
@@ -103,13 +131,29 @@ class DebService(DebugMixin):
                 self.log(
                     f"Found new branch {str(latest_branch_version)} > {str(latest_deb_version_mmp)}, building new deb"
                 )
-                self.build(latest_branch_version)
-                self.upload(enums.DEB_K8S_TRACK_MAP.get(_version))
-
+                builds.append(
+                    DebBuild(
+                        self.name,
+                        ppa_name,
+                        str(latest_branch_version),
+                        latest_deb_version_mmp,
+                    )
+                )
             else:
                 self.log(
                     f"> Versions match {str(latest_branch_version)} == {str(latest_deb_version_mmp)}, not building a new deb"
                 )
+        return builds
+
+    def run_builds(self, builds: List[DebBuild]):
+        """Builds and uploads planned debs one after another"""
+        for build in builds:
+            self.build(build.version)
+            self.upload(build.upload_to)
+
+    def sync_debs(self, force=False):
+        """Builds latest deb from each major.minor and uploads to correct ppa"""
+        self.run_builds(self.plan_builds(force))
 
     def render(self, tmpl_file, context):
         """Renders a jinja template with context"""
@@ -151,24 +195,34 @@ class DebService(DebugMixin):
     @sham
     def upload(self, ppa, **subprocess_kwargs):
         """Uploads source packages via dput"""
-        for changes in list(Path(".").glob("*changes")):
+        for changes in list(self.work_dir.glob("*changes")):
             cmd = f"dput {ppa} {str(changes)}"
             self.log(cmd)
             cmd_ok(cmd, **subprocess_kwargs)
-        self.cleanup_source()
-        self.cleanup_debian(cwd=self.upstream_model.name)
+        self.cleanup_source(cwd=self.work_dir)
+        self.cleanup_debian(cwd=self.upstream_path)
+
+    @property
+    def upstream_path(self):
+        return self.work_dir / self.upstream_model.name
 
     def build(self, latest_branch_version):
         """Builds the debian package for latest version"""
-        self.upstream_model.clone()
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        # later builds check out other tags of the same clone, fetching their blobs
+        self.upstream_model.clone(strategy=git.BLOBLESS, cwd=self.work_dir)
         self.upstream_model.checkout(
             ref=f"tags/v{str(latest_branch_version)}",
             force=True,
-            cwd=self.upstream_model.name,
+            cwd=self.upstream_path,
         )
         with tempfile.TemporaryDirectory() as tmpdir:
             self.log(f"Building {self.deb_model.name} debian package")
-            self.deb_model.base.clone(cwd=tmpdir)
+            self.deb_model.base.clone(
+                branch=f"v{str(latest_branch_version)}",
+                strategy=git.SHALLOW,
+                cwd=tmpdir,
+            )
             self.deb_model.base.checkout(
                 ref=f"v{str(latest_branch_version)}",
                 force=True,
@@ -180,10 +234,10 @@ class DebService(DebugMixin):
                 src_path=Path(tmpdir) / self.deb_model.name,
             )
             cmd_ok(
-                f"cp -a {tmpdir}/{self.deb_model.name}/* {self.upstream_model.name}/.",
+                f"cp -a {tmpdir}/{self.deb_model.name}/* {self.upstream_path}/.",
                 shell=True,
             )
-            self.source(cwd=self.upstream_model.name)
+            self.source(cwd=self.upstream_path)
             self.deb_model.base.add(
                 ["debian/changelog"], cwd=f"{tmpdir}/{self.deb_model.name}"
             )
@@ -206,35 +260,10 @@ class DebCNIService(DebService):
         deb_branches = self.deb_model.base.branches_from_semver_point("0.8.7")
         return list(set(upstream_tags) - set(deb_branches))
 
-    def sync_debs(self, force=False):
-        """Builds latest deb from each major.minor and uploads to correct ppa"""
+    def _targets(self):
+        """Every ppa gets the latest cni plugins release"""
         for ppa_name in self.ppas.names:
-            ppa = self.ppas.get_ppa_by_major_minor(ppa_name)
-            exclude_pre = True
-            latest_deb_version = ppa.get_source_semver(self.deb_model.name)
-            latest_deb_version_mmp = (
-                f"{latest_deb_version.major}.{latest_deb_version.minor}.{latest_deb_version.patch}"
-                if latest_deb_version
-                else None
-            )
-            latest_branch_version = self.deb_model.base.latest_branch_from_major_minor(
-                enums.K8S_CNI_SEMVER, exclude_pre
-            )
-            if (
-                force
-                or not latest_deb_version
-                or semver.compare(str(latest_branch_version), latest_deb_version_mmp)
-                > 0
-            ):
-                self.log(
-                    f"Found new branch {str(latest_branch_version)} > {str(latest_deb_version_mmp)}, building new deb"
-                )
-                self.build(latest_branch_version)
-                self.upload(enums.DEB_K8S_TRACK_MAP.get(ppa_name))
-            else:
-                self.log(
-                    f"> Versions match {str(latest_branch_version)} == {str(latest_deb_version_mmp)}, not building a new deb"
-                )
+            yield ppa_name, enums.K8S_CNI_SEMVER, True
 
 
 class DebCriToolsService(DebService):
@@ -247,32 +276,7 @@ class DebCriToolsService(DebService):
         deb_branches = self.deb_model.base.branches_from_semver_point("1.19.0")
         return list(set(upstream_tags) - set(deb_branches))
 
-    def sync_debs(self, force=False):
-        """Builds latest deb from each major.minor and uploads to correct ppa"""
+    def _targets(self):
+        """Every ppa gets the latest cri-tools release"""
         for ppa_name in self.ppas.names:
-            ppa = self.ppas.get_ppa_by_major_minor(ppa_name)
-            exclude_pre = True
-            latest_deb_version = ppa.get_source_semver(self.deb_model.name)
-            latest_deb_version_mmp = (
-                f"{latest_deb_version.major}.{latest_deb_version.minor}.{latest_deb_version.patch}"
-                if latest_deb_version
-                else None
-            )
-            latest_branch_version = self.deb_model.base.latest_branch_from_major_minor(
-                enums.K8S_CRI_TOOLS_SEMVER, exclude_pre
-            )
-            if (
-                force
-                or not latest_deb_version
-                or semver.compare(str(latest_branch_version), latest_deb_version_mmp)
-                > 0
-            ):
-                self.log(
-                    f"Found new branch {str(latest_branch_version)} > {str(latest_deb_version_mmp)}, building new deb"
-                )
-                self.build(latest_branch_version)
-                self.upload(enums.DEB_K8S_TRACK_MAP.get(ppa_name))
-            else:
-                self.log(
-                    f"> Versions match {str(latest_branch_version)} == {str(latest_deb_version_mmp)}, not building a new deb"
-                )
+            yield ppa_name, enums.K8S_CRI_TOOLS_SEMVER, True
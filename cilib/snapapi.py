@@ -2,103 +2,206 @@ import sh
 import re
 import semver
 import json
-from cilib.run import capture
-from functools import cached_property
+import threading
+from cilib import log
+from cilib.run import capture, concurrently
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class SnapChannelMap:
+    """Snap store channel map indexed for constant time lookups"""
+
+    def __init__(self, snap, channel_map):
+        self.snap = snap
+        self.raw = channel_map
+        if "channel-map" not in channel_map:
+            print(f"Invalid channel map: {channel_map}")
+        self.revisions: Dict[Tuple[str, str], int] = {}
+        for channel in channel_map["channel-map"]:
+            key = (channel["channel"], channel["architecture"])
+            self.revisions.setdefault(key, int(channel["revision"]))
+        self.versions: Dict[Tuple[int, str], str] = {}
+        for revision in channel_map.get("revisions", []):
+            for arch in revision["architectures"]:
+                key = (revision["revision"], arch)
+                self.versions.setdefault(key, revision["version"])
+
+    def max_rev(self, arch, track) -> Optional[int]:
+        """Returns max revision for snap by arch/track"""
+        return self.revisions.get((track, arch))
+
+    def version_from_rev(self, revision, arch) -> Optional[semver.Version]:
+        """Returns the version associated with revision and architecture of snap"""
+        version = self.versions.get((revision, arch))
+        return version and semver.VersionInfo.parse(version)
+
+
+class SnapStoreClient:
+    """Fetches channel maps from the snap store, shared by all SnapStore instances
+
+    surl_cli.py holds the store credentials, so maps are still fetched with one
+    subprocess per snap, but `prefetch` runs them in parallel and every map is
+    fetched and indexed only once per process.
+    """
+
+    API = "https://dashboard.snapcraft.io/api/v2/snaps"
+
+    def __init__(self, creds="production-creds", workers=8):
+        self.creds = creds
+        self.workers = workers
+        self._maps: Dict[str, SnapChannelMap] = {}
+        self._lock = threading.Lock()
+
+    def _fetch(self, snap) -> SnapChannelMap:
+        output = capture(
+            [
+                "surl_cli.py",
+                "-a",
+                self.creds,
+                "-X",
+                "GET",
+                f"{self.API}/{snap}/channel-map",
+            ]
+        ).stdout.decode()
+        channel_map = SnapChannelMap(snap, json.loads(output))
+        with self._lock:
+            return self._maps.setdefault(snap, channel_map)
+
+    def prefetch(self, snaps: Iterable[str]):
+        """Fetches the channel maps of many snaps at once"""
+        missing = [snap for snap in set(snaps) if snap not in self._maps]
+        _, failed = concurrently(self._fetch, missing, workers=self.workers)
+        for snap in failed:
+            log.error(f"Couldn't prefetch channel map of {snap}, will retry on use")
+
+    def channel_map(self, snap) -> SnapChannelMap:
+        """Gets the indexed channel map for a snap"""
+        return self._maps.get(snap) or self._fetch(snap)
+
+
+store_client = SnapStoreClient()
 
 
 class SnapStore:
-    def __init__(self, snap):
+    def __init__(self, snap, client=None):
         self.snap = snap
-        self.creds = "production-creds"
-        self.api = f"https://dashboard.snapcraft.io/api/v2/snaps/{snap}"
+        self.client = client or store_client
+        self.creds = self.client.creds
+        self.api = f"{self.client.API}/{snap}"
 
-    @cached_property
+    @property
     def channel_map(self):
         """Gets the channel map for a snap"""
-        output = capture(
-            ["surl_cli.py", "-a", self.creds, "-X", "GET", f"{self.api}/channel-map"]
-        ).stdout.decode()
-        return json.loads(output)
+        return self.client.channel_map(self.snap).raw
 
     def max_rev(self, arch, track):
         """Returns max revision for snap by arch/track"""
-        if "channel-map" not in self.channel_map:
-            print(f"Invalid channel map: {self.channel_map}")
-        for channel in self.channel_map["channel-map"]:
-            if channel["channel"] == track and channel["architecture"] == arch:
-                return int(channel["revision"])
-        return None
+        return self.client.channel_map(self.snap).max_rev(arch, track)
 
     def version_from_rev(self, revision, arch):
         """Returns the version associated with revision and architecture of snap"""
-        for channel in self.channel_map["revisions"]:
-            if arch in channel["architectures"] and revision == channel["revision"]:
-                return semver.VersionInfo.parse(channel["version"])
-        return None
+        return self.client.channel_map(self.snap).version_from_rev(revision, arch)
+
 
+@dataclass(frozen=True)
+class SnapRevision:
+    """A row of `snapcraft revisions` output"""
 
-def max_rev(revlist, version_filter):
+    revision: int
+    uploaded: str
+    arch: str
+    version: str
+    channels: Tuple[str, ...]
+    semver_version: Optional[semver.Version]
+
+    @property
+    def released(self) -> Tuple[str, ...]:
+        """Channels this revision is currently released to"""
+        return tuple(chan.rstrip("*") for chan in self.channels if chan.endswith("*"))
+
+
+def parse_revisions(lines: Iterable[str]) -> Iterator[SnapRevision]:
+    """Parses `snapcraft revisions` output line by line, skipping the header"""
+    re_comp = re.compile("[ \t+]{2,}")
+    lines = iter(lines)
+    next(lines, None)
+    for line in lines:
+        fields = re_comp.split(line.strip())
+        if len(fields) != 5:
+            log.debug(f"Skipping unexpected revision line: {line}")
+            continue
+        rev, uploaded, arch, version, channels = fields
+        try:
+            parsed = semver.VersionInfo.parse(version)
+        except ValueError:
+            parsed = None
+        yield SnapRevision(
+            revision=int(rev),
+            uploaded=uploaded,
+            arch=arch,
+            version=version,
+            channels=tuple(chan.strip() for chan in channels.split(",")),
+            semver_version=parsed,
+        )
+
+
+_revisions_cache: Dict[Tuple[str, Optional[str]], List[SnapRevision]] = {}
+
+
+def list_revisions(snap, arch=None) -> List[SnapRevision]:
+    """Lists the revisions of a snap, optionally for a single arch
+
+    Listings are cached per (snap, arch) for the life of the process, and a
+    cached listing of all arches also serves single arch queries.
+    """
+    if (snap, None) in _revisions_cache:
+        everything = _revisions_cache[(snap, None)]
+        return [rev for rev in everything if arch is None or rev.arch == arch]
+    if (snap, arch) not in _revisions_cache:
+        args = ["--arch", arch] if arch else []
+        output = sh.snapcraft.revisions(snap, *args, _iter=True)
+        _revisions_cache.setdefault((snap, arch), list(parse_revisions(output)))
+    return _revisions_cache[(snap, arch)]
+
+
+def max_rev(revlist: Iterable[SnapRevision], version_filter) -> Optional[int]:
     return max(
-        [
-            int(sublist[0])
-            for sublist in revlist
-            if sublist[-2].startswith(version_filter)
-        ]
+        (rev.revision for rev in revlist if rev.version.startswith(version_filter)),
+        default=None,
     )
 
 
 def all_published(snap):
     """Get all known published snap versions, tracks, arch"""
-    re_comp = re.compile("[ \t+]{2,}")
-    revision_list = capture(["snapcraft", "revisions", snap])
-    revision_list = revision_list.stdout.decode().splitlines()[1:]
-    revision_list = [re_comp.split(line) for line in revision_list]
     publish_map = {"arm64": {}, "ppc64el": {}, "amd64": {}, "s390x": {}}
-    for line in revision_list:
-        rev, uploaded, arch, version, channels = line
-        channels = channels.split(",")
-        for chan in channels:
-            if chan.endswith("*") and version in publish_map[arch]:
-                publish_map[arch][version].append(chan)
-            elif chan.endswith("*"):
-                publish_map[arch][version] = [chan]
+    for rev in list_revisions(snap):
+        for chan in rev.channels:
+            if chan.endswith("*"):
+                arch_map = publish_map.setdefault(rev.arch, {})
+                arch_map.setdefault(rev.version, []).append(chan)
     return publish_map
 
 
 def revisions(snap, version_filter_track, arch="amd64", exclude_pre=False):
-    """Get revisions of snap
+    """Get latest revision of snap released to a track
 
     snap: name of snap
     version_filter: snap version to filter on
     """
-
-    re_comp = re.compile("[ \t+]{2,}")
-    revision_list = sh.snapcraft.revisions(snap, "--arch", arch, _err_to_out=True)
-    revision_list = revision_list.stdout.decode().splitlines()[1:]
-
-    revisions_to_process = []
-    for line in revision_list:
-        line = re_comp.split(line)
-        try:
-            semver.parse(line[-2])
-            revisions_to_process.append(line)
-        except ValueError:
-            print(f"Skipping: {line}")
-            continue
-
     revision_list = [
-        line
-        for line in revisions_to_process
-        if exclude_pre
-        and semver.parse(line[-2])["prerelease"] is None
-        and any(version_filter_track in item for item in line)
+        rev
+        for rev in list_revisions(snap, arch)
+        if rev.semver_version
+        and not (exclude_pre and rev.semver_version.prerelease)
+        and any(version_filter_track in chan for chan in rev.channels)
     ]
     rev = max_rev(revision_list, version_filter_track.split("/")[0])
-    rev_map = [line for line in revision_list if rev == int(line[0])]
+    rev_map = [line for line in revision_list if rev == line.revision]
 
     if rev_map:
         return rev_map[0]
-    return []
+    return None
 
 
 def latest(snap, version_track, arch="amd64", exclude_pre=False):
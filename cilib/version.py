@@ -1,5 +1,7 @@
+from bisect import bisect_left
 from dataclasses import dataclass
-from typing import Optional, Mapping, Union
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Mapping, Tuple, Union
 import semver
 from cilib import log
 
@@ -43,6 +45,78 @@ def lesser(version_a, version_b):
     return compare(version_a, version_b) <= 0
 
 
+class SemverRefIndex:
+    """Index of the semantic versions found in a listing of git refs.
+
+    Every ref is parsed once. Parsed versions are kept sorted overall and
+    bucketed by (major, minor), with pre-releases tracked separately, and any
+    `+patch.N` build metadata is recorded per version so the latest patch
+    level can be looked up without rescanning the listing.
+
+    Usage:
+        index = SemverRefIndex(["v1.28.0", "v1.28.1-rc.0", "v1.28.1+patch.2"])
+        index.latest("1.28", exclude_pre=True)  # 1.28.1
+        index.patch(parse("1.28.1"))            # 2
+        index.from_point("1.28.1")              # ["v1.28.1+patch.2"]
+    """
+
+    def __init__(self, refs: Iterable[str]):
+        parsed = []
+        self._patches: Dict[semver.Version, int] = {}
+        for ref in refs:
+            try:
+                ver = parse(ref)
+            except ValueError:
+                log.debug(f"Ignoring non-semver ref: {ref}")
+                continue
+            parsed.append((ver, ref))
+            if ver.build and ver.build.startswith("patch."):
+                base, level = ver.replace(build=None), ver.build.split(".", 1)[1]
+                if level.isdigit():
+                    self._patches[base] = max(self._patches.get(base, 0), int(level))
+        parsed.sort(key=lambda item: item[0])
+
+        self._versions: List[semver.Version] = [ver for ver, _ in parsed]
+        self._refs: List[str] = [ref for _, ref in parsed]
+        self._minors: Dict[Tuple[int, int], List[semver.Version]] = {}
+        self._releases: Dict[Tuple[int, int], List[semver.Version]] = {}
+        for ver in self._versions:
+            key = (ver.major, ver.minor)
+            self._minors.setdefault(key, []).append(ver)
+            if ver.prerelease is None:
+                self._releases.setdefault(key, []).append(ver)
+
+    def __len__(self):
+        return len(self._refs)
+
+    def latest(self, major_minor: str, exclude_pre=False) -> Optional[semver.Version]:
+        """Latest version within a major.minor, ignoring build metadata."""
+        key = tuple(map(int, major_minor.split(".")))
+        bucket = (self._releases if exclude_pre else self._minors).get(key)
+        if not bucket:
+            return None
+        return bucket[-1].replace(build=None)
+
+    def patch(self, ver: semver.Version) -> Optional[int]:
+        """Highest `+patch.N` level recorded for a version, if any."""
+        return self._patches.get(ver.replace(build=None))
+
+    def from_point(self, starting_semver: str) -> List[str]:
+        """All refs at or above a starting semantic version."""
+        start = bisect_left(self._versions, parse(starting_semver))
+        return self._refs[start:]
+
+
+@lru_cache(maxsize=64)
+def _ref_index(refs: Tuple[str, ...]) -> SemverRefIndex:
+    return SemverRefIndex(refs)
+
+
+def ref_index(refs: Iterable[str]) -> SemverRefIndex:
+    """Returns the SemverRefIndex of a ref listing, built once per listing."""
+    return _ref_index(tuple(refs))
+
+
 RISKS = ["stable", "candidate", "beta", "edge"]
 
 
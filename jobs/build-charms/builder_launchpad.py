@@ -1,19 +1,22 @@
 """ Launchpad Charm Builder
 """
 
+import codecs
 import hashlib
 import os
 import re
+import threading
 import time
 import urllib.request
 import zipfile
 import zlib
 
+from concurrent.futures import Future
 from configparser import ConfigParser
 from datetime import datetime
 from functools import cached_property
 from pathlib import Path
-from typing import List
+from typing import Callable, Iterator, List
 
 from launchpadlib.launchpad import Launchpad
 from lazr.restfulclient.errors import NotFound
@@ -21,6 +24,144 @@ from lazr.restfulclient.resource import Resource
 
 from builder_local import Artifact, BuildEntity, BuildException
 
+CHUNK_SIZE = 1 << 16
+
+
+class _Watch:
+    """A launchpad resource polled by the LaunchpadBuildWatcher."""
+
+    def __init__(self, poll: Callable, interval: float):
+        self.poll = poll  # returns (state, done, result)
+        self.future = Future()
+        self.interval = interval
+        self.due = time.monotonic()
+        self.state = None
+
+
+class LaunchpadBuildWatcher:
+    """Polls every pending launchpad build request and build from one thread.
+
+    Each watch is refreshed on its own adaptive schedule, polled again after
+    min_interval when its state changed and backing off towards max_interval
+    while it doesn't. Callers receive a Future resolved when the watch
+    completes, to block on or to attach completion callbacks to.
+    """
+
+    def __init__(self, min_interval=2.0, max_interval=30.0, backoff=1.5):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self._watches: List[_Watch] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def _add(self, poll) -> Future:
+        watch = _Watch(poll, self.min_interval)
+        with self._lock:
+            self._watches.append(watch)
+            if not self._thread:
+                self._thread = threading.Thread(
+                    target=self._run, name="lp-build-watcher", daemon=True
+                )
+                self._thread.start()
+        self._wake.set()
+        return watch.future
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._watches:
+                    self._thread = None
+                    return
+                watch = min(self._watches, key=lambda w: w.due)
+            delay = watch.due - time.monotonic()
+            if delay > 0:
+                self._wake.wait(delay)
+                self._wake.clear()
+                continue
+            self._poll(watch)
+
+    def _poll(self, watch: _Watch):
+        try:
+            state, done, result = watch.poll()
+        except Exception as e:
+            done, result = True, e
+        if not done:
+            if state != watch.state:
+                watch.interval = self.min_interval
+            else:
+                watch.interval = min(watch.interval * self.backoff, self.max_interval)
+            watch.state = state
+            watch.due = time.monotonic() + watch.interval
+            return
+        with self._lock:
+            self._watches.remove(watch)
+        if isinstance(result, Exception):
+            watch.future.set_exception(result)
+        else:
+            watch.future.set_result(result)
+
+    def request(self, entity: BuildEntity, req: Resource, timeout=5 * 60) -> Future:
+        """Watch a charm recipe build request until its builds are created."""
+        deadline = time.monotonic() + timeout
+
+        def _poll():
+            req.lp_refresh()
+            if (status := req.status) == "Failed":
+                err_msg = f"Failed requesting launchpad build {entity.entity}, aborting"
+                raise BuildException(err_msg)
+            if status == "Completed":
+                return status, True, list(req.builds)
+            if time.monotonic() > deadline:
+                err_msg = f"Timed out requesting launchpad build {entity.entity}"
+                raise BuildException(err_msg)
+            return status, False, None
+
+        return self._add(_poll)
+
+    def builds(self, entity: "LPBuildEntity", builds: List[Resource]) -> Future:
+        """Watch a charm's builds until all succeed or any one fails.
+
+        Once a build fails its pending siblings are cancelled, the Future
+        resolves with every build either way.
+        """
+        pending = {_.self_link: None for _ in builds}
+        start_time = datetime.now()
+
+        def _poll():
+            for build in builds:
+                if build.self_link not in pending:
+                    continue
+                build.lp_refresh()
+                dt = datetime.now() - start_time
+                if (state := build.buildstate) in entity.BUILD_STATES_PENDING:
+                    if pending[build.self_link] != state:
+                        pending[build.self_link] = state
+                        entity.echo(
+                            f"Waiting for {build.title} status='{state}' elapsed={dt}"
+                        )
+                    continue
+                entity.echo(f"Completed {build.title} status='{state}' elapsed={dt}")
+                del pending[build.self_link]
+                if state not in entity.BUILD_STATES_SUCCESS:
+                    # If one build fails, cancel the others first
+                    self._cancel(entity, builds, pending)
+                    return None, True, builds
+            return tuple(pending.values()), not pending, builds
+
+        return self._add(_poll)
+
+    @staticmethod
+    def _cancel(entity: BuildEntity, builds: List[Resource], pending):
+        for build in builds:
+            if build.self_link in pending and build.can_be_cancelled:
+                entity.echo(f"Cancelling {build.title}...")
+                build.cancel()
+
+
+build_watcher = LaunchpadBuildWatcher()
+
 
 class LPBuildEntity(BuildEntity):
     """The launchpad builder entity class.
@@ -45,13 +186,14 @@ class LPBuildEntity(BuildEntity):
         subbed = re.sub(r"[^0-9a-zA-Z\+\-\.]+", "-", branch)
         return f"{self.name}-{subbed.lower()}"
 
-    def __init__(self, *args, **kwargs) -> None:
+    def __init__(self, *args, watcher=None, **kwargs) -> None:
         super().__init__(*args, **kwargs)
+        self._lp_watcher = watcher or build_watcher
         self._lp_bugs = self.opts.get("bugs", "")
         self._lp_branch = self.branch
         self._lp_project_name = self._lp_bugs.rsplit("/")[-1]
         self._lp_recipe_name = self._lp_recipe_from_branch(self._lp_branch)
-        self._lp_build_log_cache = {}
+        self._lp_charm_file_cache = {}
 
         assert self.type == "Charm", "Only supports charm builds"
         assert "launchpad.net" in self._lp_bugs, "No associated with launchpad"
@@ -129,63 +271,32 @@ class LPBuildEntity(BuildEntity):
         rec.lp_save()
         return rec
 
-    def _lp_build_log(self, build: Resource) -> str:
-        """Request the build log of a completed build."""
+    def _lp_build_log(self, build: Resource) -> Iterator[str]:
+        """Stream the lines of a completed build's gzipped build log."""
         if build.buildstate in self.BUILD_STATES_PENDING:
-            return ""
-        if cache := self._lp_build_log_cache.get(build.self_link):
-            return cache
-
+            return
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        partial = ""
         with urllib.request.urlopen(build.build_log_url) as f:
-            contents = zlib.decompress(f.read(), 16 + zlib.MAX_WBITS)
-        self._lp_build_log_cache[build.self_link] = c_str = contents.decode()
-        return c_str
+            while chunk := f.read(CHUNK_SIZE):
+                text = decoder.decode(decompressor.decompress(chunk))
+                *lines, partial = (partial + text).split("\n")
+                yield from lines
+        text = decoder.decode(decompressor.flush(), final=True)
+        yield from (partial + text).split("\n")
 
     def _lp_request_builds(self) -> List[Resource]:
         """Request a charm build for this charm."""
         req = self._lp_recipe.requestBuilds(channels=self._lp_channels)
         self.echo("Waiting for charm recipe request")
-        timeout = 5 * 60
-        for _ in range(timeout):
-            status = req.status
-            if status == "Failed":
-                err_msg = f"Failed requesting launchpad build {self.entity}, aborting"
-                raise BuildException(err_msg)
-            if status == "Completed":
-                self.echo(f"Build recipe started @ {self._lp_recipe.web_link}")
-                break
-            time.sleep(1.0)
-            req.lp_refresh()
-        return [build for build in req.builds]
+        builds = self._lp_watcher.request(self, req).result()
+        self.echo(f"Build recipe started @ {self._lp_recipe.web_link}")
+        return builds
 
     def _lp_complete_builds(self, builds: List[Resource]):
         """Ensure that all the builds of a specified charm are completed."""
-        pending_builds = {_.self_link for _ in builds}
-        failed_builds = set()
-        start_time = datetime.now()
-        while pending_builds and not failed_builds:
-            for build in builds:
-                if build.self_link not in pending_builds:
-                    continue
-                build.lp_refresh()
-                dt = datetime.now() - start_time
-                if (state := build.buildstate) in self.BUILD_STATES_PENDING:
-                    status = f"Waiting for {build.title} status='{state}' elapsed={dt}"
-                else:
-                    status = f"Completed {build.title} status='{state}' elapsed={dt}"
-                    pending_builds.remove(build.self_link)
-                    if state not in self.BUILD_STATES_SUCCESS:
-                        failed_builds.add(build.self_link)
-                self.echo(status)
-
-            if pending_builds and not failed_builds:
-                time.sleep(30.0)
-        for build_link in pending_builds:
-            # If one build fails, cancel the others first
-            build = next(_ for _ in builds if _.self_link == build_link)
-            if build.can_be_cancelled:
-                self.echo(f"Cancelling {build.title}...")
-                build.cancel()
+        builds = self._lp_watcher.builds(self, builds).result()
         for build in builds:
             if build.buildstate not in self.BUILD_STATES_SUCCESS:
                 err_msg = (
@@ -193,7 +304,9 @@ class LPBuildEntity(BuildEntity):
                     f"unsuccessful build state '{build.buildstate}'."
                 )
 
-                self.echo(err_msg + "\n" + self._lp_build_log(build))
+                self.echo(err_msg)
+                for line in self._lp_build_log(build):
+                    self.echo(line)
                 raise BuildException(err_msg)
         return builds
 
@@ -206,11 +319,15 @@ class LPBuildEntity(BuildEntity):
         replace once LP#2028406 is fixed
         """
 
-        content = self._lp_build_log(build)
-        charm_file_matches = re.findall(
-            r"\s([\w\-\.@]+\.charm)\s", content, re.MULTILINE
-        )
-        uniq = set(charm_file_matches)
+        if cache := self._lp_charm_file_cache.get(build.self_link):
+            return cache
+
+        charm_file_re = re.compile(r"(?:^|\s)([\w\-\.@]+\.charm)(?:\s|$)")
+        uniq = {
+            match
+            for line in self._lp_build_log(build)
+            for match in charm_file_re.findall(line)
+        }
         if not uniq:
             err_msg = (
                 f"Failed launchpad build {self.entity} due to "
@@ -225,21 +342,23 @@ class LPBuildEntity(BuildEntity):
             )
             raise BuildException(err_msg)
 
-        return uniq.pop()
+        self._lp_charm_file_cache[build.self_link] = charm_file = uniq.pop()
+        return charm_file
 
     def _lp_build_download(self, build, dst_target: Path) -> Artifact:
         """Download charm file for a launchpad build."""
         charm_file = self._lp_charm_filename_from_build(build)
         dl_link = build.web_link + f"/+files/{charm_file}"
-        with urllib.request.urlopen(dl_link) as src:
-            buffer = src.read()
-
-        sha256sum = hashlib.sha256(buffer).hexdigest()
         target = dst_target / charm_file
-        with target.open("wb") as dst:
-            dst.write(buffer)
-
-        self.echo(f"Downloaded {build.title} sha256sum={sha256sum}")
+        partial = target.with_name(target.name + ".part")
+        sha256 = hashlib.sha256()
+        with urllib.request.urlopen(dl_link) as src, partial.open("wb") as dst:
+            while chunk := src.read(CHUNK_SIZE):
+                sha256.update(chunk)
+                dst.write(chunk)
+        partial.replace(target)
+
+        self.echo(f"Downloaded {build.title} sha256sum={sha256.hexdigest()}")
         return Artifact.from_charm(target)
 
     def _lp_amend_git_version(self):
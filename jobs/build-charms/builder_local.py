@@ -17,10 +17,11 @@ Usage:
   tox -e py -- python3 jobs/build-charms/main.py --help
 """
 
+import io
 import os
+import hashlib
 import inspect
-import traceback
-from io import BytesIO
+import threading
 import zipfile
 from pathlib import Path
 from collections import defaultdict
@@ -28,18 +29,18 @@ from cilib.ch import ensure_charm_track
 from cilib.github_api import Repository
 from enum import Enum, unique
 from sh.contrib import git
-from cilib.git import default_gh_branch
+from cilib.git import REFERENCE, default_gh_branch, mirror_cache
 from cilib.enums import SNAP_K8S_TRACK_MAP, K8S_CHARM_SUPPORT_ARCHES
 from cilib.service.aws import Store
-from cilib.run import script
+from cilib.run import concurrently, script
+from cilib.table import format_table
 from cilib.version import ChannelRange, Release, RISKS
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
 from functools import partial
 from datetime import datetime
 from types import SimpleNamespace
-from typing import Any, Iterable, List, Mapping, Optional, Set, Tuple
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
 
-from multiprocessing.pool import ThreadPool
 from pprint import pformat
 import click
 import shutil
@@ -248,55 +249,139 @@ class TrackStatus:
         return cls(track, mappings)
 
 
-class _CharmHub(Charmcraft):
-    STATUS_RESOURCE = re.compile(r"(\S+) \(r(\d+)\)")
-    BASE_RE = re.compile(r"(\S+) (\S+) \((\S+)\)")
+@dataclass
+class PlannedRelease:
+    """A `charmcraft release` call promoting one charm revision."""
 
-    @staticmethod
-    def _table_to_list(header, body) -> List[Mapping[str, str]]:
-        if not body:
-            return []
-        rows = []
-        titles = [title for title in re.split(r"\s{2,}", header) if title]
-        for line in body:
-            row, head = {}, line
-            for key in reversed(titles):
-                head, *value = head.strip().rsplit("  ", 1)
-                head, value = (head, value[0]) if value else ("", head.strip())
-                row[key] = value or rows[-1].get(key)
-            rows.append(row)
-        return rows
+    charm: str
+    revision: str
+    resources: List[str]
+    channels: List[str]
+    bases: List[str] = field(default_factory=list)
+
+    @property
+    def args(self) -> Tuple[str, ...]:
+        return (
+            self.charm,
+            f"--revision={self.revision}",
+            *(f"--resource={rsc}" for rsc in self.resources),
+            *(f"--channel={chan}" for chan in self.channels),
+        )
+
+    def __str__(self) -> str:
+        return " ".join(["charmcraft", "release", *self.args])
+
+
+def format_plan(plan: List[PlannedRelease]) -> str:
+    """Render planned releases as a table."""
+    header = ("Charm", "Revision", "Bases", "Resources", "Channels")
+    rows = [
+        (
+            p.charm,
+            str(p.revision),
+            ", ".join(p.bases),
+            ", ".join(p.resources),
+            ", ".join(p.channels),
+        )
+        for p in plan
+    ]
+    return format_table(header, rows)
+
+
+class CharmhubState:
+    """A charm's tracks, revisions and resources in charmhub.
+
+    Each is read once through charmcraft's json output when first needed,
+    then shared by promote, release and assemble_resources for the rest of
+    the run. Changes made by the run invalidate what they affect.
+    """
+
+    def __init__(self, charmhub: "_CharmHub", charm: str):
+        self.charm = charm
+        self._charmhub = charmhub
+        self._lock = threading.Lock()
+        self._cache = {}
+
+    def _get(self, key, fetch):
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = fetch()
+            return self._cache[key]
+
+    def invalidate(self, *keys):
+        """Forget some, or with no keys all, of the fetched state."""
+        with self._lock:
+            for key in keys or list(self._cache):
+                self._cache.pop(key, None)
 
+    @property
+    def status(self) -> List[TrackStatus]:
+        return self._get("status", partial(self._charmhub.status, self.charm))
+
+    @property
+    def revisions(self) -> List[Mapping[str, Any]]:
+        return self._get("revisions", partial(self._charmhub.revisions, self.charm))
+
+    @property
+    def resources(self) -> List[Mapping[str, Any]]:
+        return self._get("resources", partial(self._charmhub.resources, self.charm))
+
+    def resource_revisions(self, resource: str) -> List[Mapping[str, Any]]:
+        fetch = partial(self._charmhub.resource_revisions, self.charm, resource)
+        return self._get(("resource-revisions", resource), fetch)
+
+
+_charmhub_states: Dict[str, CharmhubState] = {}
+_charmhub_states_lock = threading.Lock()
+
+# pulling an image for any platform retags it, whichever entity pulls it
+_image_locks: Dict[str, threading.Lock] = {}
+_image_locks_lock = threading.Lock()
+
+
+def _image_lock(upstream_source: str) -> threading.Lock:
+    """Lock shared by every pull of the same upstream image."""
+    with _image_locks_lock:
+        return _image_locks.setdefault(upstream_source, threading.Lock())
+
+
+class _CharmHub(Charmcraft):
     @staticmethod
     def info(name, **query):
         url = f"https://api.charmhub.io/v2/charms/info/{name}"
         resp = requests.get(url, params=query)
         return resp.json()
 
+    def state(self, charm_entity) -> CharmhubState:
+        """Shared snapshot of a charm's state in charmhub."""
+        with _charmhub_states_lock:
+            if charm_entity not in _charmhub_states:
+                _charmhub_states[charm_entity] = CharmhubState(self, charm_entity)
+            return _charmhub_states[charm_entity]
+
     def status(self, charm_entity) -> List[TrackStatus]:
-        """Read CLI Table output from charmcraft status and parse."""
+        """Read json output from charmcraft status and parse."""
         charm_status_str = self.charmcraft.status(
             charm_entity, format="json", _out=None
         )
         return [TrackStatus.from_dict(**_) for _ in json.loads(charm_status_str)]
 
-    def revisions(self, charm_entity):
-        """Read CLI Table output from charmcraft revisions and parse."""
-        charm_status = self.charmcraft.revisions(charm_entity)
-        header, *body = charm_status.splitlines()
-        return self._table_to_list(header, body)
+    def revisions(self, charm_entity) -> List[Mapping[str, Any]]:
+        """Read json output from charmcraft revisions."""
+        out = self.charmcraft.revisions(charm_entity, format="json", _out=None)
+        return json.loads(out)
 
-    def resources(self, charm_entity):
-        """Read CLI Table output from charmcraft resources and parse."""
-        charmcraft_out = self.charmcraft.resources(charm_entity)
-        header, *body = charmcraft_out.splitlines()
-        return self._table_to_list(header, body)
+    def resources(self, charm_entity) -> List[Mapping[str, Any]]:
+        """Read json output from charmcraft resources."""
+        out = self.charmcraft.resources(charm_entity, format="json", _out=None)
+        return json.loads(out)
 
-    def resource_revisions(self, charm_entity, resource):
-        """Read CLI Table output from charmcraft resource-revisions and parse."""
-        charmcraft_out = self.charmcraft("resource-revisions", charm_entity, resource)
-        header, *body = charmcraft_out.splitlines()
-        return self._table_to_list(header, body)
+    def resource_revisions(self, charm_entity, resource) -> List[Mapping[str, Any]]:
+        """Read json output from charmcraft resource-revisions."""
+        out = self.charmcraft(
+            "resource-revisions", charm_entity, resource, format="json", _out=None
+        )
+        return json.loads(out)
 
     def _unpublished_revisions(self, charm_entity):
         """
@@ -309,22 +394,24 @@ class _CharmHub(Charmcraft):
         This also gathers the most recently published resource, whether
         it is associated with a particular prior release or not.
         """
+        state = self.state(charm_entity)
         charm_status = []
         unpublished_rev = _next_match(
-            self.revisions(charm_entity),
-            predicate=lambda rev: rev["Status"] != "released",
+            state.revisions,
+            predicate=lambda rev: rev["status"] != "released",
         )
         if unpublished_rev:
             charm_resources = [
                 rsc
-                for rsc in self.resources(charm_entity)
-                if rsc["Charm Rev"] == unpublished_rev["Revision"]
+                for rsc in state.resources
+                if rsc["charm_revision"] == unpublished_rev["revision"]
             ]
-            unpublished_rev["Resources"] = {
-                resource["Resource"]: _next_match(
-                    self.resource_revisions(charm_entity, resource["Resource"]),
+            unpublished_rev = dict(unpublished_rev)
+            unpublished_rev["resources"] = {
+                resource["name"]: _next_match(
+                    state.resource_revisions(resource["name"]),
                     default=dict(),
-                ).get("Revision")
+                ).get("revision")
                 for resource in charm_resources
             }
             charm_status = [unpublished_rev]
@@ -341,20 +428,17 @@ class _CharmHub(Charmcraft):
         ]
         args = [entity, rev_args] + channel_args + resource_rev_args
         self.charmcraft.release(*args)
+        self.state(entity).invalidate("status")
 
-    def promote(self, charm_entity, from_channel, to_channels, dry_run):
-        self._echo(
-            f"Promoting :: {charm_entity:^35} :: from:{from_channel} to: {to_channels}"
-        )
-        if not to_channels:
-            self._echo("No to_channels specified, skipping")
-            return
-
+    def plan_promotion(
+        self, charm_entity, from_channel, to_channels
+    ) -> List["PlannedRelease"]:
+        """Plan the releases promoting a charm from one channel to others."""
         charm_status = [
             # Get all the releases and associated bases
             (release, mapping.base)
             # where the track matches the from_channel
-            for track in self.status(charm_entity)
+            for track in self.state(charm_entity).status
             if from_channel.startswith(track.track)
             # when that track has a base mapping
             for mapping in track.mappings
@@ -365,20 +449,17 @@ class _CharmHub(Charmcraft):
             if release.channel == from_channel and release.status != "tracking"
         ]
 
-        calls = defaultdict(list)
+        calls = {}
         for release, base in charm_status:
             if release.revision is None:
                 continue
-            resource_args = (
-                f"--resource={rsc.name}:{rsc.revision}" for rsc in release.resources
-            )
-            args = (
+            planned = PlannedRelease(
                 charm_entity,
-                f"--revision={release.revision}",
-                *resource_args,
-                *(f"--channel={chan}" for chan in to_channels),
+                release.revision,
+                [f"{rsc.name}:{rsc.revision}" for rsc in release.resources],
+                list(to_channels),
             )
-            calls[args].append(base)
+            calls.setdefault(planned.args, planned).bases.append(str(base))
 
         # So, its very likely there could be multiple charms in this
         # from_channel which need to be promoted to the to_channels.
@@ -386,13 +467,30 @@ class _CharmHub(Charmcraft):
         # due to different charm revisions for a different base
         # for example coredns could have a different charm revision
         # for arm64 and amd64 -- each should be promoted
+        return list(calls.values())
 
-        for args, bases in calls.items():
-            base_str = "# " + ", ".join(map(str, bases))
-            debug_cmd = " ".join(map(str, ["charmcraft", "release", *args]))
-            self._echo(f"\n{base_str}\n{debug_cmd}")
-            if not dry_run:
-                self.charmcraft.release(*args)
+    def execute(self, plan: List["PlannedRelease"]):
+        """Run the planned releases of a charm in order."""
+        for planned in plan:
+            self._echo(f"\n# {', '.join(planned.bases)}\n{planned}")
+            self.charmcraft.release(*planned.args)
+            self.state(planned.charm).invalidate("status")
+
+    def promote(self, charm_entity, from_channel, to_channels, dry_run):
+        self._echo(
+            f"Promoting :: {charm_entity:^35} :: from:{from_channel} to: {to_channels}"
+        )
+        if not to_channels:
+            self._echo("No to_channels specified, skipping")
+            return []
+
+        plan = self.plan_promotion(charm_entity, from_channel, to_channels)
+        if dry_run:
+            for planned in plan:
+                self._echo(f"\n# {', '.join(planned.bases)}\n{planned}")
+        else:
+            self.execute(plan)
+        return plan
 
     def upload(self, dst_path) -> int:
         out = self.charmcraft.upload(dst_path)
@@ -405,6 +503,9 @@ class _CharmHub(Charmcraft):
         out = self.charmcraft("upload-resource", charm_entity, resource.name, **kwargs)
         self._echo(f"Upload Resource   :: returns {out}")
         (revision,) = re.findall(r"Revision (\d+) ", out, re.MULTILINE)
+        self.state(charm_entity).invalidate(
+            "resources", ("resource-revisions", resource.name)
+        )
         return int(revision)
 
 
@@ -420,10 +521,217 @@ def apply_channel_bounds(opts: Mapping[str, Any], to_channels: List[str]) -> Lis
     return [channel for channel in to_channels if channel in channel_range]
 
 
+class RemoteZipFile(io.RawIOBase):
+    """Seekable read-only view of a remote file, fetched with HTTP Range requests.
+
+    ZipFile only reads the central directory at the end of the archive and
+    then the members it's asked for, so wrapping a published charm in this
+    transfers a few KB rather than the whole file. Servers ignoring the Range
+    header get the file downloaded whole instead.
+    """
+
+    BLOCK_SIZE = 1 << 16
+
+    def __init__(self, url: str):
+        super().__init__()
+        self.url = url
+        self._pos = 0
+        # the tail holds the end of central directory record and usually
+        # the whole central directory
+        resp = requests.get(url, headers={"Range": f"bytes=-{self.BLOCK_SIZE}"})
+        resp.raise_for_status()
+        if resp.status_code == 206:
+            self.size = int(resp.headers["Content-Range"].rsplit("/", 1)[-1])
+        else:
+            self.size = len(resp.content)
+        self._segments = [(self.size - len(resp.content), resp.content)]
+
+    def _read_range(self, start: int, end: int) -> bytes:
+        for seg_start, data in self._segments:
+            if seg_start <= start and end <= seg_start + len(data):
+                lo, hi = start - seg_start, end - seg_start
+                return data[lo:hi]
+        fetch_end = min(max(end, start + self.BLOCK_SIZE), self.size)
+        resp = requests.get(
+            self.url, headers={"Range": f"bytes={start}-{fetch_end - 1}"}
+        )
+        resp.raise_for_status()
+        self._segments.append((start, resp.content))
+        return resp.content[: end - start]
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self._pos = max(offset, 0)
+        return self._pos
+
+    def readinto(self, b) -> int:
+        end = min(self._pos + len(b), self.size)
+        if end <= self._pos:
+            return 0
+        data = self._read_range(self._pos, end)
+        b[: len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+
+def _layer_includes(layer_yaml: Path) -> List[str]:
+    """Layers and interfaces a layer.yaml includes."""
+    if not layer_yaml.exists():
+        return []
+    return list((yaml.safe_load(layer_yaml.read_text()) or {}).get("includes", []))
+
+
+def _sha256(path: Path) -> str:
+    """Hash a file without reading it into memory at once."""
+    sha256 = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(1 << 16):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+# Size of the built charms kept in the workspace between builds
+ARTIFACT_CACHE_MAX_BYTES = 4 * 1024 * 1024 * 1024
+
+
+class ArtifactCache:
+    """Content addressed store of built charms and their charmhub revisions.
+
+    A build is keyed by the charm, its commit, the layers it includes and the
+    architectures and bases it is built for. Each of its artifacts is stored by sha256 along with its
+    arch, series and the revision it was uploaded as, so rebuilding the same
+    sources can reuse the charm, and once uploaded, its revision. Charms are
+    evicted least recently used first once they take more than `max_bytes`,
+    along with the builds referring to them.
+    """
+
+    def __init__(self, path: Path, max_bytes=ARTIFACT_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(
+        name: str,
+        commit: str,
+        layers: List[Mapping[str, str]],
+        targets: Mapping[str, Any],
+    ) -> str:
+        manifest = json.dumps(layers, sort_keys=True).encode()
+        manifest_hash = hashlib.sha256(manifest).hexdigest()
+        target = json.dumps(targets, sort_keys=True).encode()
+        target_hash = hashlib.sha256(target).hexdigest()
+        return hashlib.sha256(
+            f"{name}:{commit}:{manifest_hash}:{target_hash}".encode()
+        ).hexdigest()
+
+    def _index(self, key: str) -> Path:
+        return self.path / f"{key}.json"
+
+    def _blob(self, sha256sum: str) -> Path:
+        return self.path / "blobs" / sha256sum
+
+    def get(self, key: str, dst_path: Path) -> List["Artifact"]:
+        """Copy a build's cached artifacts to dst_path, if all are intact."""
+        index = self._index(key)
+        if not index.exists():
+            return []
+        entries = json.loads(index.read_text())
+        if not all(
+            self._blob(e["sha256"]).exists()
+            and _sha256(self._blob(e["sha256"])) == e["sha256"]
+            for e in entries
+        ):
+            return []
+        artifacts = []
+        for e in entries:
+            target = dst_path / e["file"]
+            self._blob(e["sha256"]).touch()
+            shutil.copyfile(self._blob(e["sha256"]), target)
+            artifact = Artifact(
+                target, Arch(e["arch"]), CharmSeries(e["series"]), e["rev"]
+            )
+            artifacts.append(artifact)
+        return artifacts
+
+    def put(self, key: str, artifacts: List["Artifact"]):
+        """Store a build's artifacts, along with any uploaded revisions."""
+        entries = []
+        for artifact in artifacts:
+            sha256sum = _sha256(artifact.charm_or_bundle)
+            blob = self._blob(sha256sum)
+            if blob.exists():
+                blob.touch()
+            else:
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                tmp = blob.with_suffix(f".{threading.get_ident()}")
+                shutil.copyfile(artifact.charm_or_bundle, tmp)
+                tmp.replace(blob)
+            entries.append(
+                {
+                    "file": artifact.charm_or_bundle.name,
+                    "sha256": sha256sum,
+                    "arch": artifact.arch.value,
+                    "series": artifact.series.value,
+                    "rev": artifact.rev,
+                }
+            )
+        index = self._index(key)
+        with self._lock:
+            tmp = index.with_suffix(".tmp")
+            tmp.write_text(json.dumps(entries))
+            tmp.replace(index)
+            self._evict()
+
+    def _evict(self):
+        blobs = []
+        for blob in self.path.glob("blobs/*"):
+            try:
+                stat = blob.stat()
+            except FileNotFoundError:
+                continue
+            blobs.append((stat.st_mtime, stat.st_size, blob))
+        total = sum(size for _, size, _ in blobs)
+        if total <= self.max_bytes:
+            return
+        for _, size, blob in sorted(blobs):
+            if total <= self.max_bytes:
+                break
+            blob.unlink(missing_ok=True)
+            total -= size
+        # builds missing any of their charms can't be restored anymore
+        for index in self.path.glob("*.json"):
+            try:
+                entries = json.loads(index.read_text())
+            except (OSError, ValueError):
+                entries = None
+            if not entries or not all(
+                self._blob(e["sha256"]).exists() for e in entries
+            ):
+                index.unlink(missing_ok=True)
+
+
 class BuildEnv:
     """Charm or Bundle build data class."""
 
     REV = re.compile("rev: ([a-zA-Z0-9]+)")
+    # layer index endpoint and optional name prefix of each kind of layer
+    LAYER_INDEX_KINDS = {
+        "layer": ("layers", "juju-layer-"),
+        "interface": ("interfaces", "juju-relation-"),
+    }
 
     def __new__(cls, *args, **kwargs):
         """Initialize class variables used during the build from the CI environment."""
@@ -451,6 +759,7 @@ class BuildEnv:
         self.build_type = build_type
         self.db = {}
         self.clean_dirs = tuple()
+        self.artifact_cache = ArtifactCache(self.work_dir / "cache" / "charms")
 
         # poison base_dir to prevent `git rev-parse` from working in this subdirectory
         (self.base_dir / ".git").touch(0o664, exist_ok=True)
@@ -559,8 +868,20 @@ class BuildEnv:
     def track(self):
         return self.db["build_args"].get("track") or "latest"
 
-    def promote_all(self, from_channel="beta", to_channels=("edge",), dry_run=True):
-        """Promote set of charms in charmhub."""
+    def promote_all(
+        self,
+        from_channel="beta",
+        to_channels=("edge",),
+        dry_run=True,
+        workers=8,
+        plan_path=None,
+    ):
+        """Promote set of charms in charmhub.
+
+        Every charm's releases are planned concurrently first, shown as a
+        table and saved as json to plan_path. Unless this is a dry run, each
+        charm's releases are then run in order, concurrently across charms.
+        """
         if from_channel.lower() in RISKS:
             from_channel = f"{self.track}/{from_channel.lower()}"
         assert (
@@ -570,20 +891,55 @@ class BuildEnv:
             f"{self.track}/{chan.lower()}" if (chan.lower() in RISKS) else chan
             for chan in to_channels
         ]
-        failed_entities = []
-        for charm_map in self.job_list:
-            for charm_name, charm_opts in charm_map.items():
-                if not any(tag in self.filter_by_tag for tag in charm_opts["tags"]):
-                    continue
-                ch_channels = apply_channel_bounds(charm_opts, to_channels)
-                try:
-                    _CharmHub(self).promote(
-                        charm_name, from_channel, ch_channels, dry_run
-                    )
-                except Exception:
-                    self.echo(traceback.format_exc())
-                    failed_entities.append(charm_name)
+        charms = [
+            (charm_name, apply_channel_bounds(charm_opts, to_channels))
+            for charm_map in self.job_list
+            for charm_name, charm_opts in charm_map.items()
+            if any(tag in self.filter_by_tag for tag in charm_opts["tags"])
+        ]
+
+        def _plan(charm):
+            charm_name, ch_channels = charm
+            if not ch_channels:
+                self.echo(f"No channels to promote {charm_name} to, skipping")
+                return []
+            return _CharmHub(self).plan_promotion(charm_name, from_channel, ch_channels)
+
+        plans, failed = concurrently(
+            _plan, charms, workers=workers, name=lambda charm: charm[0]
+        )
+        plan = {
+            charm_name: releases
+            for (charm_name, _), releases in zip(charms, plans)
+            if charm_name not in failed
+        }
+        all_releases = [planned for releases in plan.values() for planned in releases]
+        self.echo(
+            f"Promotion plan from {from_channel}"
+            + (" (dry-run)" if dry_run else "")
+            + f"\n{format_plan(all_releases)}"
+        )
+        if plan_path:
+            Path(plan_path).write_text(
+                json.dumps(
+                    {
+                        name: [asdict(p) for p in releases]
+                        for name, releases in plan.items()
+                    },
+                    indent=2,
+                )
+            )
 
+        if not dry_run:
+            to_release = [name for name, releases in plan.items() if releases]
+            _, release_failed = concurrently(
+                lambda name: _CharmHub(self).execute(plan[name]),
+                to_release,
+                workers=workers,
+            )
+            failed.update(release_failed)
+
+        failed_entities = [name for name, _ in charms if name in failed]
         if any(failed_entities):
             count = len(failed_entities)
             plural = "s" if count > 1 else ""
@@ -592,27 +948,53 @@ class BuildEnv:
                 + ", ".join(failed_entities)
             )
 
+    def _layer_index_entry(self, layer_name) -> Optional[Mapping[str, str]]:
+        """Look up a layer or interface in the layer index like charm-tools."""
+        kind, _, name = layer_name.partition(":")
+        endpoint, prefix = self.LAYER_INDEX_KINDS.get(kind, (None, None))
+        if not endpoint:
+            return None
+        choices = [name]
+        if name.startswith(prefix):
+            choices.append(name.replace(prefix, "", 1))
+        for choice in choices:
+            resp = requests.get(f"{self.layer_index}{endpoint}/{choice}.json")
+            if resp.ok and resp.json().get("repo"):
+                return resp.json()
+        return None
+
     def download(self, layer_name):
-        """Pull layer source from the charm store."""
-        out = Charm(self).pull_source(
-            "-i", self.layer_index, "-b", self.layer_branch, layer_name
-        )
-        layer_manifest = {
-            "rev": self.REV.search(out).group(1),
-            "url": layer_name,
-        }
-        return layer_manifest
+        """Check out layer source from a mirror of its repo.
 
-    def pull_layers(self):
-        """Clone all downstream layers to be processed locally when doing charm builds."""
+        Falls back to `charm pull-source` for anything the mirror can't
+        reproduce, such as layers kept in a subdirectory of their repo.
+        """
+        entry = self._layer_index_entry(layer_name)
+        if not entry or "subdir" in entry:
+            out = Charm(self).pull_source(
+                "-i", self.layer_index, "-b", self.layer_branch, layer_name
+            )
+            return {"rev": self.REV.search(out).group(1), "url": layer_name}
+
+        kind, _, name = layer_name.partition(":")
+        base = self.layers_dir if kind == "layer" else self.interfaces_dir
+        dest = base / name
+        rev = mirror_cache.worktree(entry["repo"], self.layer_branch or "HEAD", dest)
+        (dest / ".pull-source-rev").write_text(rev)
+        self.echo(f"Checked out {layer_name} (rev: {rev}) to {dest}")
+        return {"rev": rev, "url": layer_name}
+
+    def pull_layers(self, workers=8):
+        """Check out all downstream layers to be processed locally when doing charm builds."""
         layers_to_pull = [
             layer_name
             for layer in self.layers
             for layer_name, layer_ops in layer.items()
             if layer_ops.get("build_cache") is not False
         ]
-        pool = ThreadPool()
-        results = pool.map(self.download, layers_to_pull)
+        results, failed = concurrently(self.download, layers_to_pull, workers=workers)
+        if failed:
+            raise BuildException("Failed to pull " + ", ".join(sorted(failed)))
 
         self.db["pull_layer_manifest"] = list(results)
 
@@ -793,6 +1175,10 @@ class BuildEntity:
         # Entity path with new revision (from pushing)
         self.new_entity = None
 
+        # Results shared between artifacts of this entity, see _once
+        self._once_locks = defaultdict(threading.Lock)
+        self._once_results = {}
+
     def __str__(self):
         """Represent build entity as a string."""
         return f"<BuildEntity: {self.name} ({self.full_entity}) (reactive charm: {self.reactive})>"
@@ -801,6 +1187,13 @@ class BuildEntity:
         """Click echo wrapper."""
         click.echo(f"[{self.name}] {msg}", **kwds)
 
+    def _once(self, key, func):
+        """Run func only once per key, sharing the result between threads."""
+        with self._once_locks[key]:
+            if key not in self._once_results:
+                self._once_results[key] = func()
+            return self._once_results[key]
+
     def _get_full_entity(self):
         """Grab identifying revision for charm's channel."""
         return f"{self.entity}:{self.channel}"
@@ -817,16 +1210,16 @@ class BuildEntity:
         except (KeyError, TypeError):
             self.echo(f"Failed to find in charmhub.io \n{info}")
             return None
-        self.echo(f"Downloading {fname or ''} from {url}")
-        resp = requests.get(url, stream=True)
-        if resp.ok:
-            zip_entity = zipfile.ZipFile(BytesIO(resp.content))
-            if fname:
-                yaml_file = zipfile.Path(zip_entity) / fname
-                return yaml.safe_load(yaml_file.read_text())
-            elif fname is None:
-                return zip_entity
-        self.echo(f"Failed to read {fname} due to {resp.status_code} - {resp.content}")
+        self.echo(f"Reading {fname or 'contents'} from {url}")
+        try:
+            zip_entity = zipfile.ZipFile(RemoteZipFile(url))
+        except (requests.RequestException, zipfile.BadZipFile) as e:
+            self.echo(f"Failed to read {fname} due to {e}")
+            return None
+        if fname:
+            yaml_file = zipfile.Path(zip_entity) / fname
+            return yaml.safe_load(yaml_file.read_text())
+        return zip_entity
 
     def version_identification(self, source):
         comparisons = ["rev", "url"]
@@ -899,6 +1292,71 @@ class BuildEntity:
             git_commit = git("rev-parse", "HEAD", _cwd=self.src_path)
         return git_commit.strip()
 
+    def _included_layers(self) -> List[Mapping[str, str]]:
+        """Pulled layers and interfaces this charm includes, directly or not."""
+        manifest = {
+            entry["url"]: entry
+            for entry in self.build.db.get("pull_layer_manifest", [])
+        }
+        included, pending = set(), _layer_includes(self.layer_path)
+        while pending:
+            layer_name = pending.pop()
+            if layer_name in included:
+                continue
+            included.add(layer_name)
+            kind, _, name = layer_name.partition(":")
+            if kind == "layer":
+                layer_yaml = self.build.layers_dir / name / "layer.yaml"
+                pending.extend(_layer_includes(layer_yaml))
+        return [manifest[name] for name in sorted(included) if name in manifest]
+
+    def _build_targets(self) -> Dict[str, Any]:
+        """Architectures and bases the charm is built for."""
+        src_path = Path(self.src_path)
+        targets: Dict[str, Any] = {"host": os.uname().machine}
+        if self.reactive:
+            metadata_path = src_path / "metadata.yaml"
+            metadata = (
+                yaml.safe_load(metadata_path.read_text())
+                if metadata_path.exists()
+                else None
+            )
+            targets["architectures"] = (
+                self.opts.get("architectures") or K8S_CHARM_SUPPORT_ARCHES
+            )
+            targets["series"] = (metadata or {}).get("series", [])
+        else:
+            charmcraft_path = src_path / "charmcraft.yaml"
+            charmcraft = (
+                yaml.safe_load(charmcraft_path.read_text())
+                if charmcraft_path.exists()
+                else None
+            )
+            for field_name in ("bases", "base", "platforms"):
+                targets[field_name] = (charmcraft or {}).get(field_name)
+        return targets
+
+    @property
+    def _artifact_key(self) -> str:
+        layers = self._included_layers() if self.reactive else []
+        return ArtifactCache.key(
+            self.name, self.commit(), layers, self._build_targets()
+        )
+
+    def restore_artifacts(self) -> bool:
+        """Reuse artifacts already built from this commit and layers."""
+        artifacts = self.build.artifact_cache.get(
+            self._artifact_key, Path(self.src_path)
+        )
+        for artifact in artifacts:
+            self.echo(f"Reusing cached {artifact} rev={artifact.rev}")
+        self.artifacts = artifacts
+        return bool(artifacts)
+
+    def store_artifacts(self):
+        """Save artifacts and any revisions they were uploaded as."""
+        self.build.artifact_cache.put(self._artifact_key, self.artifacts)
+
     def _read_metadata_resources(self, artifact: Artifact):
         search_path = artifact.charm_or_bundle
         if search_path.suffix == ".charm":
@@ -915,14 +1373,11 @@ class BuildEntity:
 
         os.makedirs(self.checkout_path)
         try:
-            git(
-                "clone",
-                repository,
-                self.checkout_path,
-                branch=self.branch,
-                _tee=True,
-                _out=self.echo,
+            # objects are borrowed from a mirror only fetched for new commits
+            clone_args = REFERENCE.clone_args(
+                repository, self.checkout_path, self.branch
             )
+            git(*clone_args, _tee=True, _out=self.echo)
         except sh.ErrorReturnCode as ex:
             raise BuildException("Clone failed") from ex
 
@@ -1002,10 +1457,15 @@ class BuildEntity:
             script(self.opts["override-push"], **args)
             return
 
-        self.echo(
-            f"Uploading {self.type}({self.name}) from {artifact} to {self.entity}"
-        )
-        artifact.rev = _CharmHub(self).upload(artifact.charm_or_bundle)
+        if artifact.rev is not None:
+            self.echo(f"Already uploaded {artifact} to {self.entity} as {artifact.rev}")
+        else:
+            self.echo(
+                f"Uploading {self.type}({self.name}) from {artifact} to {self.entity}"
+            )
+            charmhub = _CharmHub(self)
+            artifact.rev = charmhub.upload(artifact.charm_or_bundle)
+            charmhub.state(self.entity).invalidate("revisions")
         self.tag(f"{self.name}-{artifact.rev}")
 
     def tag(self, tag: str) -> bool:
@@ -1059,11 +1519,69 @@ class BuildEntity:
             if not ret.ok:
                 raise BuildException("Failed to build custom resources")
 
+    def _pull_image(self, upstream_source: str, platform: str) -> str:
+        """Pull an image for a platform, returning its local image-id."""
+        # pulls of the same image for other platforms, by this or any other
+        # entity, retag it, so they can't overlap with reading back the image-id
+        with _image_lock(upstream_source):
+            self.echo(f"Pulling {upstream_source} for {platform}...")
+            docker = Docker(self)
+            docker.pull(upstream_source, platform=platform)
+            # Use the local image-id from `docker images <upstream-source> -q`
+            return docker.images(upstream_source, "-q").strip()
+
+    def _assemble_resource(self, artifact, name, details, ch_channels, context):
+        """Resolve one charm resource of an artifact, uploading it if needed."""
+        channel_range = ChannelRange()  # The resource is unbound by a charm channel
+        if resource_fmt := self._resource_spec.get(name):
+            if isinstance(resource_fmt, dict):
+                channel_range = ChannelRange.from_dict(resource_fmt)
+                resource_fmt = resource_fmt["format"]
+        if not all(chan in channel_range for chan in ch_channels):
+            self.echo(
+                f"Skipping resource {name} as at least one channel"
+                f"in {ch_channels} was out of the range of {channel_range}"
+            )
+
+        if not resource_fmt:
+            # Reuse most recently uploaded resource
+            self.echo(f"Reuse current resource {name} ...")
+            revs = _CharmHub(self).state(self.entity).resource_revisions(name)
+            latest = max(revs, key=lambda rev: rev["revision"])
+            resource = CharmResource(name, rev=latest["revision"])
+        elif details["type"] == "oci-image":
+            if upstream_source := details.get("upstream-source"):
+                # Pull any `upstream-image` annotated resources.
+                platform = artifact.arch_docker
+                resource_fmt = self._once(
+                    ("image", upstream_source, platform),
+                    partial(self._pull_image, upstream_source, platform),
+                )
+            resource = CharmResource(name, ResourceKind.IMAGE, resource_fmt)
+        elif details["type"] == "file":
+            resource = CharmResource(
+                name, ResourceKind.FILEPATH, resource_fmt.format(**context)
+            )
+
+        if resource.rev is None and resource.value:
+
+            def _upload():
+                self.echo(f"Uploading resource:\n{pformat(resource)}")
+                return _CharmHub(self).upload_resource(self.entity, resource)
+
+            # identical images or files of several artifacts upload only once
+            key = ("upload", name, resource.kind, str(resource.value))
+            resource.rev = self._once(key, _upload)
+        return resource
+
     def assemble_resources(self, artifact: Artifact, to_channels=("latest/edge",)):
         """Assemble charm's resources and associate in charmhub.
 
         Upload oci-images and any built-resource, gathering their revision
         Use the latest available for any other charm resource
+
+        Resources are pulled and uploaded concurrently, and are safe to
+        assemble for several artifacts of this entity at once.
         """
         context = dict(
             src_path=self.src_path,
@@ -1072,44 +1590,22 @@ class BuildEntity:
         )
         ch_channels = apply_channel_bounds(self.opts, to_channels)
 
-        for name, details in self._read_metadata_resources(artifact).items():
-            channel_range = ChannelRange()  # The resource is unbound by a charm channel
-            if resource_fmt := self._resource_spec.get(name):
-                if isinstance(resource_fmt, dict):
-                    channel_range = ChannelRange.from_dict(resource_fmt)
-                    resource_fmt = resource_fmt["format"]
-            if not all(chan in channel_range for chan in ch_channels):
-                self.echo(
-                    f"Skipping resource {name} as at least one channel"
-                    f"in {ch_channels} was out of the range of {channel_range}"
-                )
-
-            if not resource_fmt:
-                # Reuse most recently uploaded resource
-                self.echo(f"Reuse current resource {name} ...")
-                revs = _CharmHub(self).resource_revisions(self.entity, name)
-                resource = CharmResource(name, rev=revs[0]["Revision"])
-            elif details["type"] == "oci-image":
-                if upstream_source := details.get("upstream-source"):
-                    # Pull any `upstream-image` annotated resources.
-                    self.echo(
-                        f"Pulling {upstream_source} for {artifact.series}/{artifact.arch}..."
-                    )
-                    docker = Docker(self)
-                    docker.pull(upstream_source, platform=artifact.arch_docker)
-                    # Use the local image-id from `docker images <upstream-source> -q`
-                    resource_fmt = docker.images(upstream_source, "-q").strip()
-                resource = CharmResource(name, ResourceKind.IMAGE, resource_fmt)
-            elif details["type"] == "file":
-                resource = CharmResource(
-                    name, ResourceKind.FILEPATH, resource_fmt.format(**context)
-                )
-            artifact.resources.append(resource)
+        def _assemble(item):
+            name, details = item
+            return self._assemble_resource(
+                artifact, name, details, ch_channels, context
+            )
 
-        for resource in artifact.resources:
-            if resource.rev is None and resource.value:
-                self.echo(f"Uploading resource:\n{pformat(resource)}")
-                resource.rev = _CharmHub(self).upload_resource(self.entity, resource)
+        metadata_resources = self._read_metadata_resources(artifact).items()
+        resources, failed = concurrently(
+            _assemble, list(metadata_resources), name=lambda item: item[0]
+        )
+        if failed:
+            raise BuildException(
+                f"Failed to assemble resources for {artifact}: "
+                + ", ".join(sorted(failed))
+            )
+        artifact.resources.extend(resources)
 
     def release(self, artifact: Artifact, to_channels=("edge",)):
         """Release charm and its resources to channels."""
@@ -1,12 +1,84 @@
 import click
+import threading
 import traceback
+from functools import partial
 from sh.contrib import git
 
-from builder_local import BundleBuildEntity, BuildEnv, BuildEntity, BuildType
+from builder_local import (
+    BundleBuildEntity,
+    BuildEnv,
+    BuildEntity,
+    BuildException,
+    BuildType,
+)
 from builder_launchpad import LPBuildEntity
+from cilib.github_api import bulk_resolve
+from cilib.run import concurrently
 from cilib.version import RISKS
 
 
+class BuildSlots:
+    """Bounds how many entities may be in each stage of a charm build at once.
+
+    launchpad: builds waiting on launchpad, which mostly sleep while polling
+    local:     builds on this host, which share one charmcraft container
+    charmhub:  uploads, resource assembly and releases to charmhub
+    """
+
+    def __init__(self, launchpad=8, local=1, charmhub=4):
+        self._slots = {
+            "launchpad": threading.BoundedSemaphore(launchpad),
+            "local": threading.BoundedSemaphore(local),
+            "charmhub": threading.BoundedSemaphore(charmhub),
+        }
+
+    def __call__(self, stage):
+        return self._slots[stage]
+
+
+def _build_entity(entity, build_env, to_channels, slots):
+    """Build, push and release one charm, returns False when it failed."""
+    entity.echo("Starting")
+    try:
+        if not entity.within_channel_bounds(to_channels=to_channels):
+            entity.echo("Skipped due to channel boundaries")
+            return True
+        entity.setup()
+        entity.echo(f"Details: {entity}")
+
+        if not build_env.force:
+            if not entity.charm_changes:
+                return True
+        else:
+            entity.echo("Build forced.")
+
+        stage = "launchpad" if isinstance(entity, LPBuildEntity) else "local"
+        with slots(stage):
+            if not entity.restore_artifacts():
+                entity.charm_build()
+                entity.store_artifacts()
+            entity.resource_build()
+        with slots("charmhub"):
+            for each in entity.artifacts:
+                entity.push(each)
+            # resources of every arch are pulled and uploaded at once
+            assemble = partial(entity.assemble_resources, to_channels=to_channels)
+            _, failed = concurrently(assemble, entity.artifacts)
+            if failed:
+                raise BuildException(
+                    "Failed to assemble resources for " + ", ".join(sorted(failed))
+                )
+            for each in entity.artifacts:
+                entity.release(each, to_channels=to_channels)
+            entity.store_artifacts()
+    except Exception:
+        entity.echo(traceback.format_exc())
+        return False
+    finally:
+        entity.echo("Stopping")
+    return True
+
+
 @click.group()
 def cli():
     """Define click group."""
@@ -45,6 +117,21 @@ def cli():
     "--to-channel", required=True, help="channel to promote charm to", default="edge"
 )
 @click.option("--force", is_flag=True)
+@click.option(
+    "--workers", default=16, help="number of charms processed at once", type=int
+)
+@click.option(
+    "--launchpad-workers", default=8, help="concurrent launchpad builds", type=int
+)
+@click.option(
+    "--build-workers", default=1, help="concurrent builds on this host", type=int
+)
+@click.option(
+    "--charmhub-workers",
+    default=4,
+    help="charms concurrently uploading and releasing to charmhub",
+    type=int,
+)
 def build(
     charm_list,
     layer_list,
@@ -56,6 +143,10 @@ def build(
     track,
     to_channel,
     force,
+    workers,
+    launchpad_workers,
+    build_workers,
+    charmhub_workers,
 ):
     """Build a set of charms and publish with their resources."""
     # sh.which.charm(_tee=True, _out=lambda m: click.echo(f"charm -> {m}"))
@@ -78,6 +169,14 @@ def build(
     build_env.clean()
     build_env.pull_layers()
 
+    # resolve every downstream's default branch at once rather than one by one
+    bulk_resolve(
+        charm_opts["downstream"]
+        for charm_map in build_env.job_list
+        for charm_opts in charm_map.values()
+        if "downstream" in charm_opts
+    )
+
     entities = []
     for charm_map in build_env.job_list:
         for charm_name, charm_opts in charm_map.items():
@@ -91,38 +190,19 @@ def build(
                 entities.append(charm_entity)
                 build_env.echo(f"Queued {charm_entity.entity} for building")
 
-    failed_entities = []
     to_channels = [
         f"{build_env.track}/{chan.lower()}" if (chan.lower() in RISKS) else chan
         for chan in build_env.to_channels
     ]
 
-    for entity in entities:
-        entity.echo("Starting")
-        try:
-            if not entity.within_channel_bounds(to_channels=to_channels):
-                entity.echo("Skipped due to channel boundaries")
-                continue
-            entity.setup()
-            entity.echo(f"Details: {entity}")
-
-            if not build_env.force:
-                if not entity.charm_changes:
-                    continue
-            else:
-                entity.echo("Build forced.")
-
-            entity.charm_build()
-            entity.resource_build()
-            for each in entity.artifacts:
-                entity.push(each)
-                entity.assemble_resources(each, to_channels=to_channels)
-                entity.release(each, to_channels=to_channels)
-        except Exception:
-            entity.echo(traceback.format_exc())
-            failed_entities.append(entity)
-        finally:
-            entity.echo("Stopping")
+    slots = BuildSlots(launchpad_workers, build_workers, charmhub_workers)
+    pipeline = partial(
+        _build_entity, build_env=build_env, to_channels=to_channels, slots=slots
+    )
+    results, _ = concurrently(
+        pipeline, entities, workers=workers, name=lambda e: e.name
+    )
+    failed_entities = [entity for entity, ok in zip(entities, results) if not ok]
 
     if any(failed_entities):
         count = len(failed_entities)
@@ -243,7 +323,17 @@ def build_bundles(
 )
 @click.option("--to-channel", required=True, help="Charm channel to publish to")
 @click.option("--dry-run", is_flag=True)
-def promote(charm_list, filter_by_tag, track, from_channel, to_channel, dry_run):
+@click.option(
+    "--workers", default=8, help="number of charms promoted at once", type=int
+)
+@click.option(
+    "--plan",
+    default="promote-plan.json",
+    help="path to save the planned releases as json",
+)
+def promote(
+    charm_list, filter_by_tag, track, from_channel, to_channel, dry_run, workers, plan
+):
     """
     Promote channel for a set of charms filtered by tag.
     """
@@ -257,7 +347,11 @@ def promote(charm_list, filter_by_tag, track, from_channel, to_channel, dry_run)
     }
     build_env.clean()
     return build_env.promote_all(
-        from_channel=from_channel, to_channels=build_env.to_channels, dry_run=dry_run
+        from_channel=from_channel,
+        to_channels=build_env.to_channels,
+        dry_run=dry_run,
+        workers=workers,
+        plan_path=plan,
     )
 
 
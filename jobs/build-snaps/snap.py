@@ -33,11 +33,16 @@ def _promote_snaps(snap_list, arch, from_track, to_track, exclude_pre, dry_run):
     ]
     for _snap in snaps_to_promote:
         _snap_name = next(iter(_snap))
-        rev, uploaded, arch, version, channels = _snap[_snap_name]
+        latest = _snap[_snap_name]
+        if not latest:
+            click.echo(f"Problem: no revision of {_snap_name} found in {from_track}")
+            sys.exit(1)
         for track in to_track.split(" "):
-            click.echo(f"Promoting ({rev}) {_snap} {version} -> {track}")
+            click.echo(
+                f"Promoting ({latest.revision}) {_snap_name} {latest.version} -> {track}"
+            )
             try:
-                str(sh.snapcraft.release(_snap_name, rev, track))
+                str(sh.snapcraft.release(_snap_name, latest.revision, track))
             except sh.ErrorReturnCode as error:
                 click.echo(f"Problem: {error}")
                 sys.exit(1)
@@ -9,13 +9,12 @@ import os
 import pytest
 import requests
 import sh
-import shlex
 import subprocess
 import uuid
 import yaml
 
 from contextlib import contextmanager, asynccontextmanager
-from functools import cached_property
+from functools import cached_property, partial
 
 from cilib.lp import Client as LPClient
 from cilib.enums import Series
@@ -23,17 +22,22 @@ from datetime import datetime
 from juju.model import Model
 from pathlib import Path
 from py.xml import html
+from pytest_metadata.plugin import metadata_key
 from tempfile import NamedTemporaryFile
+from typing import Dict
 from .utils import (
     asyncify,
+    fetch_kubeconfig,
     upgrade_charms,
     upgrade_snaps,
     log_snap_versions,
-    juju_run,
     juju_crashdump,
+    run_on_units,
 )
 
+from .jujuwait import ModelWaiter
 from .logger import log
+from .scheduler import SideEffectScheduler
 
 
 # Quiet the noise
@@ -141,6 +145,14 @@ def pytest_addoption(parser):
         help="Run ceph tests against existing ceph apps in the model",
     )
 
+    parser.addoption(
+        "--read-only-concurrency",
+        action="store",
+        type=int,
+        default=4,
+        help="Number of read only tests run at once, 1 runs them one by one",
+    )
+
 
 class Tools:
     """Utility class for accessing juju related tools"""
@@ -149,6 +161,8 @@ class Tools:
         self._config = config
         self.requests = requests
         self.requests_get = asyncify(requests.get)
+        # connected models juju_wait follows, by connection name
+        self.models: Dict[str, Model] = {}
 
     def _load(self):
         whoami = subprocess.check_output(["juju", "whoami", "--format=yaml"])
@@ -277,26 +291,33 @@ class Tools:
             )
         return str(stdout, "utf8"), str(stderr, "utf8")
 
-    async def juju_wait(self, **kwargs):
-        """Run juju-wait command with provided arguments.
+    async def juju_wait(
+        self, m=None, max_wait=None, retry_errors=0, x=None, workload=True
+    ):
+        """Wait for every unit of a model to settle.
 
-        if kwargs contains `m`: juju-wait is executed on a different model
-        if kwargs contains `max_wait`: a timeout value is set
-        see juju-wait --help for other supported arguments
+        if `m` is given: wait on a different model than the one under test
+        if `max_wait` is given: seconds before raising JujuWaitError
+        if `retry_errors` is given: times a unit in error is resolved
+        if `x` is given: application(s) whose units aren't waited for
         """
-        if "m" not in kwargs:
-            kwargs["m"] = self.connection
-
-        # max_wait and retry_errors are special
-        # kwargs that shouldn't be hyphenated when calling `juju-wait`
-        # swap the long form arg for its shortened version
-        for arg, short in [("max_wait", "t"), ("retry_errors", "r")]:
-            if arg in kwargs:
-                kwargs[short] = kwargs.pop(arg)
-        kwargs.update(dict(w=True, v=True))  # workload + verbose
-        juju_wait = sh.Command("/snap/bin/juju-wait")
-        command = shlex.split(str(juju_wait.bake(**kwargs)))
-        return await self.run(*command, _tee="err")
+        connection = m or self.connection
+        waiter = partial(
+            ModelWaiter, workload=workload, exclude=x, retry_errors=retry_errors
+        )
+        model = self.models.get(connection)
+        if model:
+            return await waiter(model).wait(max_wait)
+        model = Model()
+        await model.connect(connection)
+        try:
+            await waiter(model).wait(max_wait)
+        finally:
+            await model.disconnect()
+
+    def record_metadata(self, key, value):
+        """Add a value to the job metadata shown in the test reports."""
+        self._config.stash[metadata_key][key] = value
 
     @asynccontextmanager
     async def fast_forward(
@@ -330,6 +351,7 @@ async def tools(request):
 async def model(request, tools):
     model = Model()
     await model.connect(tools.connection)
+    tools.models[tools.connection] = model
     if request.config.getoption("--is-upgrade"):
         await tools.juju_wait()
         upgrade_snap_channel = request.config.getoption("--upgrade-snap-channel")
@@ -346,17 +368,14 @@ async def model(request, tools):
     if request.config.getoption("--snapd-upgrade"):
         snapd_channel = request.config.getoption("--snapd-channel")
         await log_snap_versions(model, prefix="Before")
-        for unit in model.units.values():
-            if unit.dead:
-                continue
-            await juju_run(
-                unit, f"sudo snap refresh core --{snapd_channel}", check=False
-            )
-            await juju_run(
-                unit, f"sudo snap refresh snapd --{snapd_channel}", check=False
+        units = [unit for unit in model.units.values() if not unit.dead]
+        for snap in ["core", "snapd"]:
+            await run_on_units(
+                units, f"sudo snap refresh {snap} --{snapd_channel}", check=False
             )
         await log_snap_versions(model, prefix="After")
     yield model
+    tools.models.pop(tools.connection, None)
     await model.disconnect()
 
 
@@ -414,9 +433,11 @@ async def k8s_model(k8s_cloud, tools):
 
         _model_created = Model()
         await _model_created.connect(tools.k8s_connection)
+        tools.models[tools.k8s_connection] = _model_created
         yield _model_created
     finally:
         if _model_created:
+            tools.models.pop(tools.k8s_connection, None)
             await juju_crashdump(tools, tools.k8s_connection)
             click.echo("Cleaning up k8s model")
 
@@ -734,18 +755,20 @@ def pytest_runtest_setup(item):
 def pytest_configure(config):
     config.test_tools = Tools(config)
     config.test_tools._load()
+    config.pluginmanager.register(
+        SideEffectScheduler(config.getoption("--read-only-concurrency")),
+        "side-effect-scheduler",
+    )
 
 
 @pytest.fixture(scope="module")
 async def kubeconfig(model):
-    control_planes = model.applications["kubernetes-control-plane"].units
-    (unit,) = [u for u in control_planes if await u.is_leader_from_status()]
-    action = await juju_run(unit, "cat /home/ubuntu/config")
+    config = await fetch_kubeconfig(model)
     # kubeconfig needs to be somewhere the juju confined snap client can access it
     path = Path.home() / ".local/share/juju"
     with NamedTemporaryFile(dir=path) as f:
         local = Path(f.name)
-        local.write_text(action.stdout)
+        local.write_text(config)
         os.environ["KUBECONFIG"] = str(local)
         yield local
         del os.environ["KUBECONFIG"]
@@ -0,0 +1,180 @@
+"""Waits for a juju model to settle by following its delta stream.
+
+This replaces the juju-wait plugin, which polled `juju status` from a second
+client. The already connected libjuju `Model` keeps every unit's status up to
+date, so waiters are only woken when a unit changes and report each unit's
+progress as it happens.
+"""
+
+import asyncio
+import time
+import weakref
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from cilib import log
+
+# the single observer of each model, shared by all of its waiters
+_model_events: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+class JujuWaitError(Exception):
+    """Units failed, or the model didn't settle within max_wait."""
+
+
+class _ModelEvents:
+    """Wakes every waiter of a model whenever one of its units changes"""
+
+    def __init__(self, model):
+        self.waiters: Set[asyncio.Event] = set()
+        model.add_observer(self._on_change, entity_type="unit")
+
+    async def _on_change(self, delta, old, new, model):
+        for event in list(self.waiters):
+            event.set()
+
+
+def _events(model) -> _ModelEvents:
+    events = _model_events.get(model)
+    if events is None:
+        events = _model_events[model] = _ModelEvents(model)
+    return events
+
+
+UnitState = Tuple[str, str, str]
+
+
+def unit_state(unit) -> UnitState:
+    """agent status, workload status and message of a unit"""
+    return (
+        unit.agent_status,
+        unit.workload_status,
+        unit.workload_status_message or "",
+    )
+
+
+def is_error(state: UnitState) -> bool:
+    agent, workload, _ = state
+    return "error" in (agent, workload)
+
+
+def is_ready(state: UnitState, workload=True) -> bool:
+    """Whether a unit has settled
+
+    In workload mode a unit is ready once its charm reports active. Charms
+    which never set a status are ready once their agent is idle, as are all
+    units outside of workload mode.
+    """
+    agent, status, _ = state
+    if workload and status != "unknown":
+        return status == "active"
+    return agent == "idle"
+
+
+class ModelWaiter:
+    """Waits until every unit of a model is ready for `settle` seconds
+
+    model:        a connected libjuju Model
+    workload:     wait for workload status rather than agent idleness
+    exclude:      applications whose units aren't waited for
+    retry_errors: times each unit in error is resolved before failing
+    """
+
+    def __init__(
+        self,
+        model,
+        workload=True,
+        exclude: Union[str, Iterable[str], None] = None,
+        retry_errors=0,
+        settle=10.0,
+        poll=60.0,
+    ):
+        self.model = model
+        self.workload = workload
+        if isinstance(exclude, str):
+            exclude = [exclude]
+        self.exclude = set(exclude or [])
+        self.retry_errors = retry_errors or 0
+        self.settle = settle
+        self.poll = poll
+        self._seen: Dict[str, UnitState] = {}
+        self._retries: Dict[str, int] = {}
+        self._resolving: Set[str] = set()
+
+    def _units(self):
+        return [
+            unit
+            for name, unit in sorted(self.model.units.items())
+            if unit.application not in self.exclude
+        ]
+
+    def _report(self, unit, state: UnitState):
+        if self._seen.get(unit.name) != state:
+            self._seen[unit.name] = state
+            agent, workload, message = state
+            log.info(f"[juju-wait] {unit.name} [{agent}] {workload}: {message}")
+
+    async def _resolve(self, unit, state: UnitState):
+        if unit.name in self._resolving:
+            return
+        retries = self._retries.get(unit.name, 0)
+        if retries >= self.retry_errors:
+            raise JujuWaitError(f"{unit.name} is in error: {state[2]}")
+        self._retries[unit.name] = retries + 1
+        self._resolving.add(unit.name)
+        log.info(
+            f"[juju-wait] Resolving {unit.name}, "
+            f"retry {retries + 1} of {self.retry_errors}"
+        )
+        await unit.resolved(retry=True)
+
+    async def pending(self) -> List[str]:
+        """Names of the units not ready yet, resolving or raising on errors"""
+        pending = []
+        for unit in self._units():
+            state = unit_state(unit)
+            self._report(unit, state)
+            if is_error(state):
+                await self._resolve(unit, state)
+            else:
+                self._resolving.discard(unit.name)
+            if not is_ready(state, self.workload):
+                pending.append(unit.name)
+        return pending
+
+    async def wait(self, max_wait: Optional[float] = None):
+        """Returns once the model settled, raises JujuWaitError otherwise"""
+        start = time.monotonic()
+        deadline = max_wait and start + max_wait
+        events = _events(self.model)
+        event = asyncio.Event()
+        events.waiters.add(event)
+        ready_since = None
+        try:
+            while True:
+                event.clear()
+                pending = await self.pending()
+                now = time.monotonic()
+                if pending:
+                    ready_since = None
+                    timeout = self.poll
+                else:
+                    ready_since = ready_since or now
+                    if now - ready_since >= self.settle:
+                        break
+                    timeout = self.settle - (now - ready_since)
+                if deadline and now >= deadline:
+                    if not pending:
+                        # ready, just not for the whole settling period
+                        break
+                    raise JujuWaitError(
+                        f"Timed out after {max_wait}s waiting for " + ", ".join(pending)
+                    )
+                if deadline:
+                    timeout = min(timeout, deadline - now)
+                try:
+                    await asyncio.wait_for(event.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            events.waiters.discard(event)
+        log.info(f"[juju-wait] Settled after {time.monotonic() - start:.0f}s")
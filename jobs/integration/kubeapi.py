@@ -0,0 +1,309 @@
+"""In-process kubernetes api client for the integration tests.
+
+Rather than running `kubectl get` on a unit for every poll, objects are
+listed once and then kept current from a watch stream. Every informer is
+shared by all the tests reading the same kind, namespace and selectors, and
+waiters are woken by the events instead of sleeping out a retry interval.
+"""
+
+import asyncio
+import contextvars
+import copy
+import shlex
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from kubernetes import config, watch
+from kubernetes.client.exceptions import ApiException
+from kubernetes.dynamic import DynamicClient
+from kubernetes.dynamic.exceptions import ResourceNotFoundError
+from kubernetes.dynamic.resource import Resource, ResourceList
+from urllib3.exceptions import HTTPError
+
+from cilib import log
+
+# informers read within a `Changes` context, and their revision when read
+_informers_read: contextvars.ContextVar = contextvars.ContextVar("_informers_read")
+
+
+class UnsupportedQuery(ValueError):
+    """The kubectl arguments can't be answered from an informer."""
+
+
+Selector = Tuple[Optional[str], Optional[str], Optional[str]]
+
+
+def parse_selector(extra_args="") -> Selector:
+    """namespace, label and field selectors of kubectl style arguments"""
+    namespace, labels, fields = "default", None, None
+    args = iter(shlex.split(extra_args))
+    for arg in args:
+        flag, eq, value = arg.partition("=")
+        if flag in ("-A", "--all-namespaces"):
+            namespace = None
+            continue
+        if flag not in ("-n", "--namespace", "-l", "--selector", "--field-selector"):
+            raise UnsupportedQuery(f"Unsupported kubectl argument {arg}")
+        if not eq:
+            value = next(args, None)
+            if value is None:
+                raise UnsupportedQuery(f"kubectl argument {arg} needs a value")
+        if flag in ("-n", "--namespace"):
+            namespace = value
+        elif flag in ("-l", "--selector"):
+            labels = value
+        else:
+            fields = value
+    return namespace, labels, fields
+
+
+class Informer:
+    """Keeps every object of a resource matching a selector up to date.
+
+    A daemon thread lists the objects, then follows a watch from the listed
+    resourceVersion, relisting whenever the watch expires. Informers that
+    nobody read for `idle` seconds stop themselves.
+    """
+
+    def __init__(self, resource, selector: Selector, idle=300.0, watch_timeout=60):
+        self.resource = resource
+        self.namespace, self.labels, self.fields = selector
+        self.idle = idle
+        self.watch_timeout = watch_timeout
+        self.revision = 0
+        self.error: Optional[Exception] = None
+        self._objects: Dict[Tuple[str, str], dict] = {}
+        self._synced = threading.Event()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._waiters: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+        self._last_read = time.monotonic()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __str__(self):
+        return f"{self.resource.kind}/{self.namespace or '*'}"
+
+    @property
+    def alive(self):
+        return not self._stopped.is_set()
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._notify()
+
+    def _query(self):
+        query = {"namespace": self.namespace}
+        if self.labels:
+            query["label_selector"] = self.labels
+        if self.fields:
+            query["field_selector"] = self.fields
+        return query
+
+    def _key(self, obj) -> Tuple[str, str]:
+        meta = obj["metadata"]
+        return meta.get("namespace", ""), meta["name"]
+
+    def _normalize(self, obj) -> dict:
+        # list items don't say what they are, unlike `kubectl get` output
+        obj.setdefault("kind", self.resource.kind)
+        obj.setdefault("apiVersion", self.resource.group_version)
+        obj.setdefault("status", {})
+        return obj
+
+    def _notify(self):
+        with self._lock:
+            self.revision += 1
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def _list(self) -> str:
+        listed = self.resource.get(**self._query()).to_dict()
+        with self._lock:
+            self._objects = {
+                self._key(obj): self._normalize(obj) for obj in listed["items"]
+            }
+        self.error = None
+        self._synced.set()
+        self._notify()
+        return listed["metadata"]["resourceVersion"]
+
+    def _watch(self, resource_version):
+        stream = self.resource.watch(
+            resource_version=resource_version,
+            timeout=self.watch_timeout,
+            watcher=watch.Watch(),
+            **self._query(),
+        )
+        for event in stream:
+            obj = event["raw_object"]
+            if event["type"] == "ERROR":
+                # most likely 410 Gone, the resourceVersion is too old
+                log.debug(f"[{self}] watch ended: {obj.get('message')}")
+                return
+            key = self._key(obj)
+            with self._lock:
+                if event["type"] == "DELETED":
+                    self._objects.pop(key, None)
+                else:
+                    self._objects[key] = self._normalize(obj)
+            self._notify()
+            if self._stopped.is_set():
+                return
+
+    def _run(self):
+        backoff = 1.0
+        while not self._stopped.is_set():
+            if time.monotonic() - self._last_read > self.idle:
+                log.debug(f"[{self}] idle, stopping")
+                break
+            try:
+                self._watch(self._list())
+                backoff = 1.0
+            except (ApiException, HTTPError, OSError) as e:
+                # the api server restarts during some tests, keep trying but
+                # don't answer from a listing which may have gone stale
+                self.error = e
+                self._synced.clear()
+                self._notify()
+                self._stopped.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+        self._stopped.set()
+        self._notify()
+
+    async def _wait(self, check, timeout):
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        waiter = (loop, event)
+        with self._lock:
+            self._waiters.add(waiter)
+        try:
+            if not check():
+                await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+    async def items(self, timeout=60.0) -> List[dict]:
+        """Objects currently known, after the first listing completed"""
+        self._last_read = time.monotonic()
+        reads = _informers_read.get(None)
+        if reads is not None:
+            reads.setdefault(self, self.revision)
+        if not self._synced.is_set():
+            await self._wait(lambda: self._synced.is_set() or self.error, timeout)
+        if not self._synced.is_set():
+            raise self.error or asyncio.TimeoutError(f"[{self}] never listed")
+        with self._lock:
+            return list(self._objects.values())
+
+    async def changed(self, since, timeout):
+        """Waits until the objects change after revision `since`"""
+        await self._wait(lambda: self.revision > since or not self.alive, timeout)
+
+
+class KubeClient:
+    """Resolves kubectl resource names and shares informers between callers"""
+
+    def __init__(self, kubeconfig: Union[Path, dict]):
+        if isinstance(kubeconfig, dict):
+            api_client = config.new_client_from_config_dict(kubeconfig)
+        else:
+            api_client = config.new_client_from_config(config_file=str(kubeconfig))
+        self.dynamic = DynamicClient(api_client)
+        self._resources: Dict[str, object] = {}
+        self._informers: Dict[tuple, Informer] = {}
+        self._lock = threading.Lock()
+
+    def resource(self, entity_type):
+        """Finds the api resource kubectl would by plural, singular or short name"""
+        with self._lock:
+            if entity_type in self._resources:
+                return self._resources[entity_type]
+        name = entity_type.split(".")[0].lower()
+        matches = [
+            res
+            for res in self.dynamic.resources.search()
+            if isinstance(res, Resource)
+            and not isinstance(res, ResourceList)
+            and "/" not in res.name
+            and name
+            in (res.name, res.singular_name, res.kind.lower(), *(res.short_names or []))
+        ]
+        if not matches:
+            raise ResourceNotFoundError(f"No resource type {entity_type}")
+        # kubectl prefers the core group, then each group's preferred version
+        matches.sort(key=lambda res: (res.group != "", not res.preferred))
+        with self._lock:
+            return self._resources.setdefault(entity_type, matches[0])
+
+    def informer(self, entity_type, selector: Selector) -> Informer:
+        resource = self.resource(entity_type)
+        key = (resource.group_version, resource.kind, *selector)
+        with self._lock:
+            informer = self._informers.get(key)
+            if not informer or not informer.alive:
+                informer = Informer(resource, selector).start()
+                self._informers[key] = informer
+        return informer
+
+    async def get(self, entity_types, extra_args="") -> List[dict]:
+        """Objects of comma separated types matching kubectl style arguments"""
+        selector = parse_selector(extra_args)
+        loop = asyncio.get_running_loop()
+        items = []
+        for entity_type in entity_types.split(","):
+            # discovering the resource the first time is a blocking request
+            informer = await loop.run_in_executor(
+                None, self.informer, entity_type, selector
+            )
+            items += await informer.items()
+        return items
+
+    def close(self):
+        with self._lock:
+            informers, self._informers = list(self._informers.values()), {}
+        for informer in informers:
+            informer.stop()
+
+
+class Changes:
+    """Records the informers read in its context, to wait for their events"""
+
+    def __enter__(self):
+        self.revisions: Dict[Informer, int] = {}
+        self._token = _informers_read.set(self.revisions)
+        return self
+
+    def __exit__(self, *exc):
+        _informers_read.reset(self._token)
+
+    async def wait(self, timeout) -> bool:
+        """Waits for any change of what was read, returns False if nothing was"""
+        if not self.revisions:
+            return False
+        waits = [
+            asyncio.ensure_future(informer.changed(rev, timeout))
+            for informer, rev in self.revisions.items()
+        ]
+        _, pending = await asyncio.wait(waits, return_when=asyncio.FIRST_COMPLETED)
+        for each in pending:
+            each.cancel()
+        return True
+
+
+def matching(items: Iterable[dict], names: List[str]) -> List[dict]:
+    """Copies of the objects whose name contains any of names"""
+    return [
+        copy.deepcopy(item)
+        for item in items
+        if any(n in item["metadata"]["name"] for n in names)
+    ]
@@ -0,0 +1,216 @@
+"""Schedules the tests of a module by their side effects on the deployment.
+
+Tests are marked by what they do to the shared deployment:
+
+    read_only:        only inspects the deployment
+    mutates_config:   changes charm or model config, and restores it
+    mutates_topology: adds, removes, upgrades or re-addresses machines
+
+Unmarked tests are assumed to mutate config. Topology mutating tests stay
+where they are, and nothing moves across them, as the tests after them are
+meant to validate the changed deployment, unless they're skipped outright.
+Between them, read only tests run before the config mutating ones, so they
+don't wait on the deployment to resettle after every config change. The
+tests of a class are kept together, as if they were one config mutating
+test, so its class fixtures are only set up once.
+
+Consecutive read only tests which only need module or wider scoped fixtures
+are started at once on the event loop when the first one runs, setting up
+any of those fixtures the first one didn't need. Each one's outcome is
+still reported in its own turn. Autouse guard fixtures only act on tests
+carrying their mark, and tests with such marks are never started early, so
+guards don't hold tests back.
+"""
+
+import asyncio
+import functools
+import inspect
+from typing import Any, Dict, List, Set
+
+import pytest
+
+SIDE_EFFECTS = ["read_only", "mutates_config", "mutates_topology"]
+UNMARKED = "mutates_config"
+
+# marks which may skip, rerun or expect a test to fail from its setup on
+SETUP_MARKS = {
+    "skip",
+    "skipif",
+    "xfail",
+    "flaky",
+    "on_model",
+    "clouds",
+    "skip_arch",
+    "skip_if_apps",
+    "skip_unless_all_charms",
+    "skip_if_version",
+    "xfail_if_open_bugs",
+}
+
+# autouse fixtures named after the mark they act on, doing nothing without it
+GUARD_FIXTURES = {
+    "skip_if_apps",
+    "skip_unless_all_charms",
+    "skip_if_version",
+    "xfail_if_open_bugs",
+}
+
+
+def side_effect(item) -> str:
+    """The most disruptive side effect a test is marked with"""
+    marked = [name for name in SIDE_EFFECTS if item.get_closest_marker(name)]
+    return marked[-1] if marked else UNMARKED
+
+
+def _setup_marked(item) -> bool:
+    return any(mark.name in SETUP_MARKS for mark in item.iter_markers())
+
+
+def _needed_fixtures(item) -> Set[str]:
+    """Fixtures an item needs, leaving out guards which do nothing for it"""
+    fixturedefs = item._fixtureinfo.name2fixturedefs
+    needed: Set[str] = set()
+    names = [
+        name
+        for name in item._fixtureinfo.initialnames
+        if name not in GUARD_FIXTURES or item.get_closest_marker(name)
+    ]
+    while names:
+        name = names.pop()
+        if name in needed or name == "request":
+            continue
+        needed.add(name)
+        if name in fixturedefs:
+            names.extend(fixturedefs[name][-1].argnames)
+    return needed
+
+
+def _awaiting(started: asyncio.Future):
+    async def test_started_earlier(*args, **kwargs):
+        return await started
+
+    test_started_earlier.scheduled = True
+    return test_started_earlier
+
+
+class SideEffectScheduler:
+    """Orders tests by side effect and runs read only ones concurrently
+
+    concurrency: read only tests started at once, 1 runs them one by one
+    """
+
+    def __init__(self, concurrency=4):
+        self.concurrency = concurrency
+        self._started: Dict[str, asyncio.Future] = {}
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_collection_modifyitems(self, items):
+        rank = {name: index for index, name in enumerate(SIDE_EFFECTS)}
+        keys, segment, module, classes = {}, 0, None, {}
+        for index, item in enumerate(items):
+            effect = side_effect(item)
+            barrier = effect == "mutates_topology" and not item.get_closest_marker(
+                "skip"
+            )
+            if item.module is not module or barrier:
+                segment += 1
+            if item.cls is None:
+                group = (rank[effect], index)
+            else:
+                group = classes.setdefault(
+                    (segment, item.parent.nodeid), (rank[UNMARKED], index)
+                )
+            keys[item.nodeid] = (segment, *group, rank[effect], index)
+            if barrier:
+                segment += 1
+            module = item.module
+        items.sort(key=lambda item: keys[item.nodeid])
+
+    def _concurrent(self, head, item) -> bool:
+        """Whether item can start with head, sharing head's fixtures"""
+        if side_effect(item) != "read_only" or item.parent is not head.parent:
+            return False
+        if not inspect.iscoroutinefunction(item.obj):
+            return False
+        if _setup_marked(item) or "request" in item._fixtureinfo.argnames:
+            return False
+        fixturedefs = item._fixtureinfo.name2fixturedefs
+        return all(
+            name in fixturedefs and fixturedefs[name][-1].scope != "function"
+            for name in _needed_fixtures(item)
+        )
+
+    @staticmethod
+    def _funcargs(head, item) -> Dict[str, Any]:
+        """Sets up the fixtures of item head lacks, returning item's arguments
+
+        Only module or wider scoped fixtures are set up here, so they're
+        cached and torn down as if item had set them up itself.
+        """
+        for name in sorted(_needed_fixtures(item)):
+            head._request.getfixturevalue(name)
+        return {
+            name: head._request.getfixturevalue(name)
+            for name in item._fixtureinfo.argnames
+        }
+
+    def _starting(self, head, batch):
+        func = head.obj
+
+        @functools.wraps(func)
+        async def start_batch(*args, **kwargs):
+            for item, funcargs in batch:
+                self._started[item.nodeid] = asyncio.ensure_future(item.obj(**funcargs))
+            return await func(*args, **kwargs)
+
+        start_batch.scheduled = True
+        return start_batch
+
+    def candidates(self, head) -> List[pytest.Item]:
+        """The tests following head which may start along with it"""
+        if self.concurrency < 2 or side_effect(head) != "read_only":
+            return []
+        # reruns call a test again, which mustn't start its batch twice
+        if getattr(head.obj, "scheduled", False) or _setup_marked(head):
+            return []
+        if not inspect.iscoroutinefunction(head.obj):
+            return []
+        items = head.session.items
+        following = items.index(head) + 1
+        candidates = []
+        for other in items[following:]:
+            if len(candidates) + 1 >= self.concurrency:
+                break
+            if not self._concurrent(head, other):
+                break
+            candidates.append(other)
+        return candidates
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtest_call(self, item):
+        started = self._started.pop(item.nodeid, None)
+        if started is not None:
+            item.obj = _awaiting(started)
+            return
+        batch = []
+        for other in self.candidates(item):
+            try:
+                funcargs = self._funcargs(item, other)
+            except (Exception, pytest.skip.Exception, pytest.fail.Exception):
+                # cached by the fixture, its own setup reports it in its turn
+                break
+            batch.append((other, funcargs))
+        if batch:
+            item.obj = self._starting(item, batch)
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_sessionfinish(self, session):
+        # tests started early but never reached, e.g. after --exitfirst
+        pending = [started for started in self._started.values() if not started.done()]
+        self._started.clear()
+        if not pending or pending[0].get_loop().is_closed():
+            return
+        for started in pending:
+            started.cancel()
+        loop = pending[0].get_loop()
+        loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
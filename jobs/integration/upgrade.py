@@ -0,0 +1,64 @@
+"""Plans upgrades of a deployment as tiers of applications.
+
+The applications of a tier are upgraded at once, and each tier only once the
+one before it settled, in the order the charmed kubernetes upgrade notes
+give: datastores and certificates first, then everything else the control
+plane relies on, then the control plane and finally its workers.
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Iterable, List, Optional, Set, Tuple
+
+from cilib import log
+
+# None collects every application no other tier names
+UPGRADE_TIERS: List[Tuple[str, Optional[Set[str]]]] = [
+    ("datastore", {"etcd", "easyrsa"}),
+    ("supporting", None),
+    ("control-plane", {"kubernetes-control-plane"}),
+    ("workers", {"kubernetes-worker", "kubernetes-e2e"}),
+]
+
+
+@dataclass
+class UpgradeTier:
+    name: str
+    apps: List[str] = field(default_factory=list)
+    seconds: Optional[float] = None
+
+
+def plan_upgrade(app_names: Iterable[str], tiers=UPGRADE_TIERS) -> List[UpgradeTier]:
+    """Tiers of the applications to upgrade, leaving out empty tiers"""
+    planned = [UpgradeTier(name) for name, _ in tiers]
+    rest = next(tier for tier, (_, apps) in zip(planned, tiers) if apps is None)
+    for app_name in sorted(app_names):
+        tier = next(
+            (
+                tier
+                for tier, (_, apps) in zip(planned, tiers)
+                if app_name in (apps or ())
+            ),
+            rest,
+        )
+        tier.apps.append(app_name)
+    return [tier for tier in planned if tier.apps]
+
+
+async def run_tiers(
+    tiers: List[UpgradeTier], upgrade: Callable[[UpgradeTier], Awaitable]
+) -> List[UpgradeTier]:
+    """Upgrades tier after tier, timing each of them"""
+    for tier in tiers:
+        log.info(f"Upgrading {tier.name} tier: {', '.join(tier.apps)}")
+        start = time.monotonic()
+        await upgrade(tier)
+        tier.seconds = time.monotonic() - start
+        log.info(f"Upgraded {tier.name} tier in {tier.seconds:.0f}s")
+    return tiers
+
+
+def format_timings(tiers: List[UpgradeTier]) -> str:
+    return ", ".join(
+        f"{tier.name} {tier.seconds:.0f}s" for tier in tiers if tier.seconds is not None
+    )
@@ -14,6 +14,7 @@ from contextlib import contextmanager
 from typing import Mapping, Any, Union, Sequence, TYPE_CHECKING
 
 import jinja2
+import yaml
 from juju.unit import Unit
 from juju.model import Model
 from juju.controller import Controller
@@ -22,8 +23,10 @@ from juju.errors import JujuError
 from juju.utils import block_until_with_coroutine
 from tempfile import TemporaryDirectory
 from subprocess import check_output, check_call
-from typing import List
+from typing import Dict, List, Optional
 from cilib import log
+from .kubeapi import Changes, KubeClient, UnsupportedQuery, matching
+from .upgrade import format_timings, plan_upgrade, run_tiers
 from cilib.enums import Series
 import click
 
@@ -115,17 +118,45 @@ def asyncify(f):
 
 async def upgrade_charms(model, channel, tools):
     model_name = model.info.name
-    for app_name, app in model.applications.items():
+    juju_2 = model.connection().info["server-version"].startswith("2.")
+    command = "upgrade-charm" if juju_2 else "refresh"
+
+    async def refresh(app_name):
+        app = model.applications[app_name]
         log.info(f"Upgrading {app_name} from {app.charm_url} to --channel={channel}")
-        juju_2 = model.connection().info["server-version"].startswith("2.")
-        command = "upgrade-charm" if juju_2 else "refresh"
         await tools.run(
-            "juju", command, "-m", model_name, app.name, "--channel", channel
+            "juju", command, "-m", model_name, app_name, "--channel", channel
         )
-    await tools.juju_wait()
+
+    async def upgrade(tier):
+        await asyncio.gather(*map(refresh, tier.apps))
+        await tools.juju_wait()
+
+    tiers = await run_tiers(plan_upgrade(model.applications), upgrade)
+    tools.record_metadata("Charm upgrade", format_timings(tiers))
+
+
+async def _upgrade_blocked_unit(unit):
+    # Upgrade any application that is blocked due to snap changes
+    message = "{} [{}] {}: {}".format(
+        unit.name,
+        unit.agent_status,
+        unit.workload_status,
+        unit.workload_status_message,
+    )
+    log.info(message)
+    if (
+        unit.workload_status == "blocked"
+        and "Needs manual upgrade, run the upgrade action"
+        in unit.workload_status_message
+    ):
+        # run upgrade action
+        log.info(f"{unit.name} starting upgrade action")
+        await juju_run_action(unit, "upgrade")
 
 
 async def upgrade_snaps(model: Model, channel, tools):
+    outdated = []
     for app_name in [
         "kubernetes-control-plane",
         "kubernetes-worker",
@@ -143,27 +174,19 @@ async def upgrade_snaps(model: Model, channel, tools):
             continue
 
         log.info(f"Upgrading {app_name} snaps from {current_channel} to {channel}")
-        await app.set_config({"channel": channel})
-        await model.wait_for_idle(apps=[app_name])
-
-        for unit in app.units:
-            # Upgrade any application that is blocked due to snap changes
-            message = "{} [{}] {}: {}".format(
-                unit.name,
-                unit.agent_status,
-                unit.workload_status,
-                unit.workload_status_message,
-            )
-            log.info(message)
-            if (
-                unit.workload_status == "blocked"
-                and "Needs manual upgrade, run the upgrade action"
-                in unit.workload_status_message
-            ):
-                # run upgrade action
-                log.info(f"{unit.name} starting upgrade action")
-                await juju_run_action(unit, "upgrade")
+        outdated.append(app_name)
+
+    async def upgrade(tier):
+        apps = [model.applications[app_name] for app_name in tier.apps]
+        await asyncio.gather(*(app.set_config({"channel": channel}) for app in apps))
+        await model.wait_for_idle(apps=tier.apps)
+        await asyncio.gather(
+            *(_upgrade_blocked_unit(unit) for app in apps for unit in app.units)
+        )
 
+    tiers = await run_tiers(plan_upgrade(outdated), upgrade)
+    if tiers:
+        tools.record_metadata("Snap upgrade", format_timings(tiers))
     await tools.juju_wait()
 
 
@@ -239,9 +262,13 @@ async def retry_async_with_timeout(
     deadline = time.time() + timeout_insec
     results = None
     while time.time() < deadline:
-        if results := await func(*args, **(kwds or {})):
+        with Changes() as changes:
+            results = await func(*args, **(kwds or {}))
+        if results:
             return results
-        await asyncio.sleep(retry_interval_insec)
+        # retry as soon as anything func read from the kubernetes api changes
+        if not await changes.wait(retry_interval_insec):
+            await asyncio.sleep(retry_interval_insec)
     else:
         raise asyncio.TimeoutError(timeout_msg.format(results))
 
@@ -261,6 +288,52 @@ async def disable_source_dest_check(model_name):
     await asyncify(check_call)(cmd, env=env)
 
 
+_kubeconfigs: Dict[str, "asyncio.Future[str]"] = {}
+_kube_clients: Dict[str, "asyncio.Future[Optional[KubeClient]]"] = {}
+
+
+async def _read_kubeconfig(model) -> str:
+    control_planes = model.applications["kubernetes-control-plane"].units
+    (unit,) = [u for u in control_planes if await u.is_leader_from_status()]
+    action = await juju_run(unit, "cat /home/ubuntu/config")
+    return action.stdout
+
+
+async def fetch_kubeconfig(model) -> str:
+    """The admin kubeconfig of a model, read from the control-plane leader.
+
+    It is read once per model, and read again next time if that failed.
+    """
+    uuid = model.info.uuid
+    if uuid not in _kubeconfigs:
+        _kubeconfigs[uuid] = asyncio.ensure_future(_read_kubeconfig(model))
+    try:
+        return await asyncio.shield(_kubeconfigs[uuid])
+    except Exception:
+        _kubeconfigs.pop(uuid, None)
+        raise
+
+
+async def _connect_kube_client(model) -> Optional[KubeClient]:
+    try:
+        config = yaml.safe_load(await fetch_kubeconfig(model))
+        return await asyncify(KubeClient)(config)
+    except Exception:
+        log.exception("Unable to reach the kubernetes api, using kubectl on units")
+        return None
+
+
+async def kube_client(model) -> Optional[KubeClient]:
+    """Client of the model's kubernetes api, None when it can't be reached.
+
+    It shares the kubeconfig the kubeconfig fixture reads for the model.
+    """
+    uuid = model.info.uuid
+    if uuid not in _kube_clients:
+        _kube_clients[uuid] = asyncio.ensure_future(_connect_kube_client(model))
+    return await asyncio.shield(_kube_clients[uuid])
+
+
 async def find_entities(unit, entity_type, names: List[str], extra_args=""):
     """Find kubernetes entities that match by type and partial name.
 
@@ -268,7 +341,21 @@ async def find_entities(unit, entity_type, names: List[str], extra_args=""):
         and partial matches work. If you have a pod with characters at
         the end due to being in a deployment, just add the name of the
         deployment and it still matches
+
+    Entities are read from the kubernetes api's shared watch caches, falling
+    back to running kubectl on the unit.
     """
+    client = await kube_client(unit.model)
+    if client:
+        try:
+            return matching(await client.get(entity_type, extra_args), names)
+        except UnsupportedQuery:
+            pass
+        except Exception as e:
+            # the api server may be restarting, don't assume this means ready
+            log.info(f"Unable to get {entity_type}: {e}")
+            return False
+
     cmd = "/snap/bin/kubectl --kubeconfig /root/.kube/config {} --output json get {}"
     output = await juju_run(unit, cmd.format(extra_args, entity_type), check=False)
     if output.code != 0:
@@ -347,11 +434,10 @@ async def verify_completed(unit, entity_type, names: List[str], extra_args=""):
 
 async def log_snap_versions(model, prefix="before"):
     click.echo("Logging snap versions")
-    for unit in model.units.values():
-        if unit.dead:
-            continue
-        action = await juju_run(unit, "snap list")
-        snap_versions = action.stdout.strip() or "No snaps found"
+    units = [unit for unit in model.units.values() if not unit.dead]
+    results = await run_on_units(units, "snap list")
+    for unit in units:
+        snap_versions = results[unit.name].stdout.strip() or "No snaps found"
         click.echo(f"{prefix} {unit.name} {snap_versions}")
 
 
@@ -793,6 +879,59 @@ async def juju_run_retry(
     return action
 
 
+class UnitResults(Dict[str, JujuRunResult]):
+    """Results of a command run on many units, keyed by unit name"""
+
+    @property
+    def failed(self) -> Dict[str, JujuRunResult]:
+        return {name: result for name, result in self.items() if not result.success}
+
+    @property
+    def success(self) -> bool:
+        return not self.failed
+
+
+async def run_on_units(
+    units: Sequence[Unit],
+    cmd: str,
+    check=True,
+    tries: int = 1,
+    delay: int = 5,
+    timeout: Optional[float] = None,
+    concurrency: int = 10,
+    **kwargs,
+) -> UnitResults:
+    """Run the command on many units at once.
+
+    @param bool check: raise JujuRunError for the first unit where it failed
+    @param int tries: times the command is tried on each unit, see juju_run_retry
+    @param int delay: seconds to wait between tries on a unit
+    @param float timeout: seconds each unit may take before asyncio.TimeoutError
+    @param int concurrency: number of units running the command at once
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _run(unit):
+        async with semaphore:
+            if tries > 1:
+                run = juju_run_retry(unit, cmd, tries, delay, **kwargs)
+            else:
+                run = juju_run(unit, cmd, check=False, **kwargs)
+            try:
+                return await asyncio.wait_for(run, timeout)
+            except asyncio.TimeoutError as e:
+                raise asyncio.TimeoutError(
+                    f"`{cmd}` timed out on {unit.name} after {timeout}s"
+                ) from e
+
+    results = await asyncio.gather(*map(_run, units))
+    if check:
+        for unit, result in zip(units, results):
+            if not result.success:
+                raise JujuRunError(unit, cmd, result)
+    return UnitResults((unit.name, result) for unit, result in zip(units, results))
+
+
 async def juju_run_action(unit, action, _check=True, **kwargs) -> JujuRunResult:
     action = await unit.run_action(action, **kwargs)
     action = await action.wait()
@@ -45,6 +45,7 @@ from .utils import (
     render_and_apply,
     render_and_delete,
     retry_async_with_timeout,
+    run_on_units,
     scp_to,
     supports_series_upgrade,
     timeout_for_current_task,
@@ -174,6 +175,7 @@ async def reset_audit_config(control_plane_app, tools):
     await set_config_and_wait(control_plane_app, defaults, tools)
 
 
+@pytest.mark.mutates_topology
 async def test_series_upgrade(model, tools):
     if not tools.is_series_upgrade:
         pytest.skip("No series upgrade argument found")
@@ -251,7 +253,7 @@ async def test_auth_file_propagation(model, tools):
         await tools.juju_wait(max_wait=max_wait)
 
 
-@pytest.mark.flaky(max_runs=5, min_passes=1)
+@pytest.mark.read_only
 async def test_status_messages(model):
     """Validate that the status messages are correct."""
     expected_messages = {
@@ -263,6 +265,7 @@ async def test_status_messages(model):
             assert message in unit.workload_status_message
 
 
+@pytest.mark.read_only
 async def test_snap_versions(model, tools):
     """Validate that the installed snap versions are consistent with channel
     config on the charms.
@@ -352,6 +355,7 @@ async def test_snap_versions(model, tools):
                     assert snap_version.startswith(track + "."), msg
 
 
+@pytest.mark.read_only
 async def test_rbac(model):
     """When RBAC is enabled, validate kubelet creds cannot get ClusterRoles"""
     app = model.applications["kubernetes-control-plane"]
@@ -484,11 +488,11 @@ async def test_dashboard(model, kubeconfig, tools):
     )
 
 
+@pytest.mark.mutates_config
 async def test_kubelet_anonymous_auth_disabled(model, tools):
     """Validate that kubelet has anonymous auth disabled"""
 
     async def validate_unit(unit):
-        await juju_run(unit, "open-port 10250")
         address = unit.public_address
         url = "https://%s:10250/pods/" % address
         for attempt in range(0, 120):  # 2 minutes
@@ -528,6 +532,7 @@ async def test_kubelet_anonymous_auth_disabled(model, tools):
                 )
 
     units = model.applications["kubernetes-worker"].units
+    await run_on_units(units, "open-port 10250")
     await asyncio.gather(*(validate_unit(unit) for unit in units))
 
 
@@ -763,6 +768,7 @@ spec:
 
 
 @pytest.mark.skip("Unskip when this can be speed up considerably")
+@pytest.mark.mutates_topology
 async def test_worker_control_plane_removal(model, tools):
     # Add a second control-plane
     control_plane = model.applications["kubernetes-control-plane"]
@@ -897,11 +903,13 @@ async def test_gpu_support(model, k8s_model, tools):
 
 async def test_extra_args(model, tools):
     async def get_filtered_service_args(app, service):
-        results = []
+        found = {}
+        pending = list(app.units)
 
-        for unit in app.units:
-            while True:
-                action = await juju_run(unit, "pgrep -a " + service, check=False)
+        while pending:
+            actions = await run_on_units(pending, "pgrep -a " + service, check=False)
+            for unit in list(pending):
+                action = actions[unit.name]
                 assert action.status == "completed"
                 pids = []
 
@@ -910,12 +918,16 @@ async def test_extra_args(model, tools):
 
                 if len(pids) == 1:
                     arg_string = pids[0].split(" ", 2)[-1]
-                    args = {arg.strip() for arg in arg_string.split("--")[1:]}
-                    results.append(args)
-                    break
+                    found[unit.name] = {
+                        arg.strip() for arg in arg_string.split("--")[1:]
+                    }
+                    pending.remove(unit)
 
+            if pending:
                 await asyncio.sleep(5)
 
+        results = [found[unit.name] for unit in app.units]
+
         # charms sometimes choose the master randomly, filter out the master
         # arg so we can do comparisons reliably
         results = [
@@ -1099,6 +1111,7 @@ async def test_kubelet_extra_config(model, tools):
 
 
 @pytest.mark.skip("https://bugs.launchpad.net/bugs/2045696")
+@pytest.mark.mutates_topology
 async def test_service_cidr_expansion(model, tools):
     """Expand the service cidr by 1 and verify if kubernetes service is
     updated with the new cluster IP.
@@ -1625,6 +1638,7 @@ async def keystone_deployment(
 
 @pytest.mark.usefixtures("ceph_apps")
 class TestCeph:
+    @pytest.mark.read_only
     async def test_plugins_installed(self, model):
         log.info("waiting for csi to settle")
         unit = model.applications["kubernetes-control-plane"].units[0]
@@ -2066,9 +2080,9 @@ async def test_sysctl(model, tools):
         for name, val in desired_values.items():
             cmd = cmd + " " + name
             desired_results.append(str(val))
+        results = await run_on_units(units, cmd)
         for unit in units:
-            action = await juju_run(unit, cmd)
-            raw_output = action.stdout
+            raw_output = results[unit.name].stdout
             lines = raw_output.splitlines()
             assert len(lines) == len(desired_results)
             if not lines == desired_results:
@@ -2106,6 +2120,7 @@ async def test_sysctl(model, tools):
         await app.set_config({"sysctl": config["sysctl"]["value"]})
 
 
+@pytest.mark.read_only
 async def test_cloud_node_labels(cloud, model, tools):
     unit = model.applications["kubernetes-control-plane"].units[0]
     cmd = "/snap/bin/kubectl --kubeconfig /root/.kube/config get no -o json"
@@ -2696,6 +2711,7 @@ async def test_octavia(model, tools):
 
 
 @pytest.mark.skip("Getting further")
+@pytest.mark.mutates_topology
 async def test_containerd_to_docker(model, tools):
     """
     Assume we're starting with containerd, replace
@@ -2742,6 +2758,7 @@ async def test_containerd_to_docker(model, tools):
     await tools.juju_wait()
 
 
+@pytest.mark.read_only
 async def test_sriov_cni(model, tools, addons_model):
     if "sriov-cni" not in addons_model.applications:
         pytest.skip("sriov-cni is not deployed")
@@ -2756,6 +2773,7 @@ async def test_sriov_cni(model, tools, addons_model):
     assert not failures, "\n".join(failures)
 
 
+@pytest.mark.read_only
 async def test_sriov_network_device_plugin(model, tools, addons_model):
     if "sriov-network-device-plugin" not in addons_model.applications:
         pytest.skip("sriov-network-device-plugin is not deployed")
@@ -2,11 +2,13 @@
 """
 
 import click
+import json
 import yaml
+from dataclasses import asdict
 from pathlib import Path
-from requests.exceptions import HTTPError
-from cilib.github_api import Repository
-from cilib import log, enums, lp
+from typing import List
+from cilib.github_api import Repository, bulk_resolve
+from cilib import git, log, enums, lp, run, snapapi
 from cilib.enums import SNAP_K8S_TRACK_LIST
 from cilib.models.repos.kubernetes import (
     UpstreamKubernetesRepoModel,
@@ -36,12 +38,22 @@ from cilib.models.repos.debs import (
 )
 from cilib.models.repos.charms import CharmRepoModel
 from cilib.service.snap import SnapService
-from cilib.service.deb import DebService, DebCNIService, DebCriToolsService
+from cilib.models.ppa import PPACollection
+from cilib.service.deb import (
+    DebBuild,
+    DebService,
+    DebCNIService,
+    DebCriToolsService,
+)
 from cilib.service.ppa import PPAService
-from cilib.service.charm import CharmService
+from cilib.service.charm import CharmService, SyncResult, SyncStatus
+from cilib.table import format_table
 from cilib.version import ChannelRange
 from drypy import dryrun
 
+# GitHub repos processed at once by the release commands
+REPO_WORKERS = 8
+
 
 def channel_range(entity):
     range_def = entity.get("channel-range", {})
@@ -50,6 +62,28 @@ def channel_range(entity):
     return ChannelRange(*definitions)
 
 
+def format_summary(results: List[SyncResult]) -> str:
+    """Render fork sync results as a table, problems first."""
+    order = list(SyncStatus)
+    rows = [
+        (r.downstream, r.status.value, f"{r.seconds:.1f}", r.detail)
+        for r in sorted(results, key=lambda r: (order.index(r.status), r.name))
+    ]
+    totals = ", ".join(
+        f"{sum(r.status == status for r in results)} {status.value}" for status in order
+    )
+    table = format_table(("Repo", "Status", "Seconds", "Detail"), rows)
+    return f"{table}\n{totals}"
+
+
+def format_deb_plan(builds: List[DebBuild]) -> str:
+    """Render planned deb builds as a table."""
+    if not builds:
+        return "All debs are published, nothing to build."
+    rows = [(b.package, b.ppa, b.published or "-", b.version) for b in builds]
+    return format_table(("Package", "PPA", "Published", "Build"), rows)
+
+
 @click.group()
 def cli():
     pass
@@ -83,10 +117,9 @@ def cut_stable_release(
         stable_release, _ = SNAP_K8S_TRACK_LIST[-1]
     new_branch = f"release_{stable_release}"
 
-    failed = []
+    to_release = []
     for layer_map in layer_list + charm_list + ancillary_list:
         for layer_name, params in layer_map.items():
-            downstream = params["downstream"]
             if not params.get("needs_stable", True):
                 log.info(
                     f"Skipping  :: {layer_name:^40} :: does not require stable branch"
@@ -104,26 +137,30 @@ def cut_stable_release(
                 )
                 continue
 
-            repo = Repository.with_session(*downstream.split("/"), read_only=dry_run)
-            default_branch = params.get("branch") or repo.default_branch
+            to_release.append((layer_name, params))
 
-            if new_branch in repo.branches:
-                log.info(
-                    f"Skipping  :: {layer_name:^40} :: {new_branch} already exists"
-                )
-                continue
+    def _release(item):
+        layer_name, params = item
+        downstream = params["downstream"]
+        repo = Repository.with_session(*downstream.split("/"), read_only=dry_run)
+        default_branch = params.get("branch") or repo.default_branch
+
+        if new_branch in repo.branches:
+            log.info(f"Skipping  :: {layer_name:^40} :: {new_branch} already exists")
+            return
+
+        log.info(
+            f"Releasing :: {layer_name:^40} :: from: {default_branch} to:{new_branch}"
+        )
 
-            log.info(
-                f"Releasing :: {layer_name:^40} :: from: {default_branch} to:{new_branch}"
-            )
+        repo.copy_branch(default_branch, new_branch)
 
-            try:
-                repo.copy_branch(default_branch, new_branch)
-            except HTTPError:
-                log.error("Failed to copy branch")
-                failed.append(layer_name)
+    bulk_resolve(params["downstream"] for _, params in to_release)
+    _, failed = run.concurrently(
+        _release, to_release, workers=REPO_WORKERS, name=lambda item: item[0]
+    )
     if failed:
-        raise RuntimeError("Couldn't create branch for " + ", ".join(failed))
+        raise RuntimeError("Couldn't create branch for " + ", ".join(sorted(failed)))
 
 
 @cli.command()
@@ -159,11 +196,9 @@ def _rename_branch(
     charm_list = yaml.safe_load(Path(charm_list).read_text(encoding="utf8"))
     ancillary_list = yaml.safe_load(Path(ancillary_list).read_text(encoding="utf8"))
     filter_by_tag = filter_by_tag.split(",")
-    failed = []
+    to_rename = []
     for layer_map in layer_list + charm_list + ancillary_list:
         for layer_name, params in layer_map.items():
-            downstream = params["downstream"]
-
             tags = params.get("tags", None)
             if tags:
                 if not any(match in filter_by_tag for match in tags):
@@ -175,25 +210,32 @@ def _rename_branch(
                 )
                 continue
 
-            repo = Repository.with_session(*downstream.split("/"), read_only=dry_run)
+            to_rename.append((layer_name, params))
 
-            if from_name not in repo.branches:
-                log.info(f"Skipping  :: {layer_name:^40} :: {from_name} doesn't exist")
-                continue
+    def _rename(item):
+        layer_name, params = item
+        downstream = params["downstream"]
+        repo = Repository.with_session(*downstream.split("/"), read_only=dry_run)
+        branches = repo.branches
 
-            if to_name in repo.branches:
-                log.info(f"Skipping  :: {layer_name:^40} :: {to_name} already exists")
-                continue
+        if from_name not in branches:
+            log.info(f"Skipping  :: {layer_name:^40} :: {from_name} doesn't exist")
+            return
 
-            log.info(f"Renaming  :: {layer_name:^40} :: from: {from_name} to:{to_name}")
+        if to_name in branches:
+            log.info(f"Skipping  :: {layer_name:^40} :: {to_name} already exists")
+            return
 
-            try:
-                repo.rename_branch(from_name, to_name)
-            except HTTPError:
-                log.error("Failed to rename branch")
-                failed.append(layer_name)
+        log.info(f"Renaming  :: {layer_name:^40} :: from: {from_name} to:{to_name}")
+
+        repo.rename_branch(from_name, to_name)
+
+    bulk_resolve(params["downstream"] for _, params in to_rename)
+    _, failed = run.concurrently(
+        _rename, to_rename, workers=REPO_WORKERS, name=lambda item: item[0]
+    )
     if failed:
-        raise RuntimeError("Couldn't create branch for " + ", ".join(failed))
+        raise RuntimeError("Couldn't create branch for " + ", ".join(sorted(failed)))
 
 
 def _tag_stable_forks(
@@ -213,7 +255,7 @@ def _tag_stable_forks(
     filter_by_tag = filter_by_tag.split(",")
     stable_branch = f"release_{k8s_version}"
 
-    failed = []
+    to_tag = []
     for layer_map in layer_list + charm_list:
         for layer_name, params in layer_map.items():
             tags = params.get("tags", None)
@@ -231,25 +273,31 @@ def _tag_stable_forks(
                 )
                 continue
 
-            downstream = params["downstream"]
-            if bugfix:
-                tag = f"{k8s_version}+{bundle_rev}"
-            else:
-                tag = f"ck-{k8s_version}-{bundle_rev}"
-            repo = Repository.with_session(*downstream.split("/"), read_only=dry_run)
+            to_tag.append((layer_name, params))
 
-            if tag in repo.tags:
-                log.info(f"Skipping  :: {layer_name:^40} :: {tag} already exists")
-                continue
+    if bugfix:
+        tag = f"{k8s_version}+{bundle_rev}"
+    else:
+        tag = f"ck-{k8s_version}-{bundle_rev}"
+
+    def _tag(item):
+        layer_name, params = item
+        downstream = params["downstream"]
+        repo = Repository.with_session(*downstream.split("/"), read_only=dry_run)
+
+        if tag in repo.tags:
+            log.info(f"Skipping  :: {layer_name:^40} :: {tag} already exists")
+            return
 
-            log.info(f"Tagging   :: {layer_name:^40} :: {downstream} ({tag})")
-            try:
-                repo.tag_branch(stable_branch, tag)
-            except HTTPError:
-                log.error(f"Problem tagging {layer_name}, skipping..")
-                failed.append(layer_name)
+        log.info(f"Tagging   :: {layer_name:^40} :: {downstream} ({tag})")
+        repo.tag_branch(stable_branch, tag)
+
+    bulk_resolve(params["downstream"] for _, params in to_tag)
+    _, failed = run.concurrently(
+        _tag, to_tag, workers=REPO_WORKERS, name=lambda item: item[0]
+    )
     if failed:
-        raise RuntimeError("Couldn't create tag for " + ", ".join(failed))
+        raise RuntimeError("Couldn't create tag for " + ", ".join(sorted(failed)))
 
 
 @cli.command()
@@ -293,40 +341,79 @@ def ppas(dry_run):
 @click.option("--sign-key", help="GPG Sign key ID", required=True)
 @click.option("--dry-run", is_flag=True)
 @click.option("--force", is_flag=True)
-def debs(sign_key, dry_run, force):
+@click.option(
+    "--workers", default=4, show_default=True, help="Number of packages built at once"
+)
+def debs(sign_key, dry_run, force, workers):
     """Syncs debs"""
     dryrun(dry_run)
 
     client = lp.Client()
     client.login()
-    ppas = client.ppas("k8s-maintainers")
+    ppas = PPACollection(client.ppas("k8s-maintainers"))
 
-    debs_to_process = [
-        DebKubeadmRepoModel(),
-        DebKubectlRepoModel(),
-        DebKubeletRepoModel(),
-    ]
     kubernetes_repo = InternalKubernetesRepoModel()
+    services = [
+        DebService(_deb, kubernetes_repo, ppas, sign_key, work_dir=f"debs/{_deb.name}")
+        for _deb in (
+            DebKubeadmRepoModel(),
+            DebKubectlRepoModel(),
+            DebKubeletRepoModel(),
+        )
+    ]
+    services.append(
+        DebCriToolsService(
+            DebCriToolsRepoModel(),
+            InternalCriToolsRepoModel(),
+            ppas,
+            sign_key,
+            work_dir="debs/cri-tools",
+        )
+    )
+    services.append(
+        DebCNIService(
+            DebKubernetesCniRepoModel(),
+            InternalCNIPluginsRepoModel(),
+            ppas,
+            sign_key,
+            work_dir="debs/kubernetes-cni",
+        )
+    )
 
-    # Sync all deb branches
-    for _deb in debs_to_process:
-        deb_service_obj = DebService(_deb, kubernetes_repo, ppas, sign_key)
-        deb_service_obj.sync_from_upstream()
-        deb_service_obj.sync_debs(force)
-
-    cri_tools = DebCriToolsRepoModel()
-    cri_tools_service_obj = DebCriToolsService(
-        cri_tools, InternalCriToolsRepoModel(), ppas, sign_key
+    # Gather every ppa's publications and every repo's refs once, up front
+    ppas.prefetch()
+    git.ref_cache.prefetch(
+        (repo.repo for s in services for repo in (s.deb_model, s.upstream_model)),
+        workers=REPO_WORKERS,
     )
-    cri_tools_service_obj.sync_from_upstream()
-    cri_tools_service_obj.sync_debs(force)
 
-    kubernetes_cni = DebKubernetesCniRepoModel()
-    kubernetes_cni_service_obj = DebCNIService(
-        kubernetes_cni, InternalCNIPluginsRepoModel(), ppas, sign_key
+    def _name(service):
+        return service.name
+
+    # Sync all deb branches, then plan which of them need building
+    _, failed = run.concurrently(
+        lambda s: s.sync_from_upstream(), services, workers=workers, name=_name
+    )
+    services = [s for s in services if s.name not in failed]
+    plans, plan_failed = run.concurrently(
+        lambda s: s.plan_builds(force), services, workers=workers, name=_name
     )
-    kubernetes_cni_service_obj.sync_from_upstream()
-    kubernetes_cni_service_obj.sync_debs(force)
+    failed.update(plan_failed)
+    plan = {
+        s.name: builds
+        for s, builds in zip(services, plans)
+        if s.name not in plan_failed and builds
+    }
+    click.echo(format_deb_plan([b for builds in plan.values() for b in builds]))
+
+    # packages build independently, each one's ppas one after another
+    to_build = [s for s in services if s.name in plan]
+    _, build_failed = run.concurrently(
+        lambda s: s.run_builds(plan[s.name]), to_build, workers=workers, name=_name
+    )
+    failed.update(build_failed)
+    if failed:
+        raise RuntimeError("Couldn't sync debs for " + ", ".join(sorted(failed)))
 
 
 @cli.command()
@@ -368,7 +455,14 @@ def sync_internal_tags(dry_run):
 
 @cli.command()
 @click.option("--dry-run", is_flag=True)
-def forks(dry_run):
+@click.option(
+    "--workers",
+    default=REPO_WORKERS,
+    show_default=True,
+    help="Number of forks synced at once",
+)
+@click.option("--summary", help="path to save the sync results as json")
+def forks(dry_run, workers, summary):
     """Syncs all upstream forks"""
     # Try auto-merge; if conflict: update_readme.py && git add README.md && git
     # commit. If that fails, too, then it was a JSON conflict that will have to
@@ -378,13 +472,35 @@ def forks(dry_run):
         CharmService(repo)
         for repo in CharmRepoModel.load_repos(enums.CHARM_LAYERS_MAP + enums.CHARM_MAP)
     ]
-    for repo in repos_to_process:
-        repo.sync()
+    bulk_resolve(
+        path
+        for repo in repos_to_process
+        for path in (repo.upstream_normalized, repo.downstream_normalized)
+    )
+    results, _ = run.concurrently(
+        CharmService.sync, repos_to_process, workers=workers, name=lambda r: r.name
+    )
+    click.echo(format_summary(results))
+    if summary:
+        Path(summary).write_text(
+            json.dumps([asdict(result) for result in results], indent=2)
+        )
+
+    failed = [
+        result.name
+        for result in results
+        if result.status in (SyncStatus.CONFLICT, SyncStatus.ERROR)
+    ]
+    if failed:
+        raise RuntimeError("Couldn't sync forks for " + ", ".join(sorted(failed)))
 
 
 @cli.command()
 @click.option("--dry-run", is_flag=True)
-def snaps(dry_run):
+@click.option(
+    "--workers", default=4, show_default=True, help="Number of snaps synced at once"
+)
+def snaps(dry_run, workers):
     """Syncs the snap branches, keeps snap builds in sync, and makes sure the latest snaps are published into snap store"""
     dryrun(dry_run)
     snaps_to_process = [
@@ -400,17 +516,22 @@ def snaps(dry_run):
 
     kubernetes_repo = InternalKubernetesRepoModel()
 
-    # Sync all snap branches
-    for _snap in snaps_to_process:
-        snap_service_obj = SnapService(_snap, kubernetes_repo)
-        snap_service_obj.sync_from_upstream()
-        snap_service_obj.sync_all_track_snaps()
+    def _sync(snap_service_obj):
+        # cdk-addons only keeps its stable track in sync
+        if snap_service_obj.name != "cdk-addons":
+            snap_service_obj.sync_from_upstream()
+            snap_service_obj.sync_all_track_snaps()
         snap_service_obj.sync_stable_track_snaps()
 
-    # Handle cdk-addons sync separetely
-    cdk_addons = SnapCdkAddonsRepoModel()
-    cdk_addons_service_obj = SnapService(cdk_addons, kubernetes_repo)
-    cdk_addons_service_obj.sync_stable_track_snaps()
+    # Sync all snap branches
+    services = [SnapService(_snap, kubernetes_repo) for _snap in snaps_to_process]
+    services.append(SnapService(SnapCdkAddonsRepoModel(), kubernetes_repo))
+    snapapi.store_client.prefetch(service.name for service in services)
+    _, failed = run.concurrently(
+        _sync, services, workers=workers, name=lambda s: s.name
+    )
+    if failed:
+        raise RuntimeError("Couldn't sync snaps for " + ", ".join(sorted(failed)))
 
 
 @cli.command()
@@ -27,3 +27,15 @@ def main():
     sys.path.remove("jobs/build-charms")
     del sys.modules["main"]
     del main
+
+
+@pytest.fixture(scope="package")
+def builder_launchpad():
+    sys.path.append("jobs/build-charms")
+    builder_launchpad = importlib.import_module("builder_launchpad")
+
+    yield builder_launchpad
+
+    sys.path.remove("jobs/build-charms")
+    del sys.modules["builder_launchpad"]
+    del builder_launchpad
@@ -1,17 +1,22 @@
 """Tests to verify jobs/build-charms/charms."""
 
+import json
 import os
 import shutil
+import threading
+import time
 from pathlib import Path
 from zipfile import ZipFile
 import yaml
 
 import pytest
-from unittest.mock import patch, call, Mock, MagicMock
+from unittest.mock import patch, call, Mock, MagicMock, PropertyMock
 from functools import partial
 
 from click.testing import CliRunner
 
+from cilib.run import concurrently
+
 TEST_PATH = Path(__file__).parent.parent.parent
 STATIC_TEST_PATH = TEST_PATH / "data"
 K8S_CI_CHARM = STATIC_TEST_PATH / "charms" / "k8s-ci-charm"
@@ -137,6 +142,14 @@ def charmhub_info():
         yield mock_info
 
 
+@pytest.fixture(autouse=True)
+def charmhub_states(builder_local):
+    """Start each test without charmhub state memoized by another."""
+    builder_local._charmhub_states.clear()
+    yield builder_local._charmhub_states
+    builder_local._charmhub_states.clear()
+
+
 @pytest.fixture(autouse=True)
 def charmcraft_cmd():
     """Create a fixture defining mock for `charmcraft` cli command."""
@@ -183,13 +196,17 @@ def charm_environment(test_environment, builder_local):
     yield charm_env
 
 
-def test_build_env_promote_all_charmhub(charm_environment, charmcraft_cmd):
+def test_build_env_promote_all_charmhub(charm_environment, charmcraft_cmd, tmpdir):
     """Tests promote_all to charmhub."""
+    plan_path = Path(tmpdir / "plan.json")
     charm_environment.promote_all(
         from_channel="latest/edge",
         to_channels=["latest/beta", "1.99/beta"],
         dry_run=False,
+        plan_path=plan_path,
     )
+    plan = json.loads(plan_path.read_text())
+    assert [p["revision"] for p in plan["k8s-ci-charm"]] == ["845"]
     resource_args = [
         "--resource=test-file:994",
         "--resource=test-file-2:993",
@@ -203,7 +220,124 @@ def test_build_env_promote_all_charmhub(charm_environment, charmcraft_cmd):
     )
 
 
+def test_build_env_promote_all_dry_run(
+    charm_environment, charmcraft_cmd, tmpdir, capsys
+):
+    """A dry run shows and saves the plan without releasing."""
+    plan_path = Path(tmpdir / "plan.json")
+    charm_environment.promote_all(
+        from_channel="latest/edge",
+        to_channels=["latest/beta"],
+        dry_run=True,
+        plan_path=plan_path,
+    )
+    charmcraft_cmd.release.assert_not_called()
+    out = capsys.readouterr().out
+    assert "Charm         Revision  Bases" in out
+    assert "k8s-ci-charm  845" in out
+    (planned,) = json.loads(plan_path.read_text())["k8s-ci-charm"]
+    assert planned["channels"] == ["latest/beta"]
+    assert planned["resources"] == ["test-file:994", "test-file-2:993"]
+
+
+def test_build_env_promote_all_failures(charm_environment, charmcraft_cmd):
+    """Charms failing to promote are reported together."""
+    charmcraft_cmd.release.side_effect = RuntimeError("release failed")
+    with pytest.raises(SystemExit, match="1 Promote All Failure:\n\tk8s-ci-charm"):
+        charm_environment.promote_all(
+            from_channel="latest/edge", to_channels=["latest/beta"], dry_run=False
+        )
+
+
+def test_charmhub_state_memoized(charm_environment, charmcraft_cmd, builder_local):
+    """Charmhub state is fetched once per charm until a release changes it."""
+    charmhub = builder_local._CharmHub(charm_environment)
+    for _ in range(2):
+        charmhub.promote("k8s-ci-charm", "latest/edge", ["latest/beta"], True)
+    assert charmcraft_cmd.status.call_count == 1
+    charmcraft_cmd.release.assert_not_called()
+
+    charmhub.promote("k8s-ci-charm", "latest/edge", ["latest/beta"], False)
+    charmhub.promote("k8s-ci-charm", "latest/edge", ["latest/beta"], True)
+    assert charmcraft_cmd.status.call_count == 2
+
+    state = charmhub.state("k8s-ci-charm")
+    assert state is builder_local._CharmHub(charm_environment).state("k8s-ci-charm")
+    assert charmhub._unpublished_revisions("k8s-ci-charm") == [
+        dict(
+            state.revisions[0],
+            resources={"test-file": 3, "test-image": 4},
+        )
+    ]
+    assert charmcraft_cmd.revisions.call_count == 1
+    assert charmcraft_cmd.resources.call_count == 1
+
+
+@patch("builder_local.mirror_cache")
+@patch("builder_local.requests.get")
+def test_build_env_pull_layers(
+    mock_get, mock_mirror_cache, charm_environment, charm_cmd, tmpdir
+):
+    """Layers are checked out from mirrors, subdir layers with pull-source."""
+    layer_list = Path(tmpdir / "layers.inc")
+    layer_list.write_text(
+        yaml.safe_dump(
+            [
+                {"layer:basic": {}},
+                {"interface:juju-relation-http": {}},
+                {"layer:nested": {}},
+                {"charm-lib:skipped": {"build_cache": False}},
+            ]
+        )
+    )
+    charm_environment.db["build_args"].update(
+        layer_list=str(layer_list),
+        layer_index="https://index/",
+        layer_branch="main",
+    )
+    index = {
+        "https://index/layers/basic.json": {"repo": "https://repo/basic"},
+        "https://index/interfaces/http.json": {"repo": "https://repo/http"},
+        "https://index/layers/nested.json": {"repo": "https://repo/x", "subdir": "y"},
+    }
+
+    def _get(url):
+        return MagicMock(ok=url in index, json=MagicMock(return_value=index.get(url)))
+
+    def _worktree(url, ref, dest):
+        Path(dest).mkdir(parents=True)
+        return f"{url.rsplit('/', 1)[-1]}-sha"
+
+    mock_get.side_effect = _get
+    mock_mirror_cache.worktree.side_effect = _worktree
+    charm_cmd.return_value = "Downloaded layer:nested (rev: abc123)"
+    charm_environment.pull_layers()
+
+    assert charm_environment.db["pull_layer_manifest"] == [
+        {"rev": "basic-sha", "url": "layer:basic"},
+        {"rev": "http-sha", "url": "interface:juju-relation-http"},
+        {"rev": "abc123", "url": "layer:nested"},
+    ]
+    mock_mirror_cache.worktree.assert_has_calls(
+        [
+            call("https://repo/basic", "main", charm_environment.layers_dir / "basic"),
+            call(
+                "https://repo/http",
+                "main",
+                charm_environment.interfaces_dir / "juju-relation-http",
+            ),
+        ],
+        any_order=True,
+    )
+    charm_cmd.assert_called_once_with(
+        "pull-source", "-i", "https://index/", "-b", "main", "layer:nested"
+    )
+    basic_rev = charm_environment.layers_dir / "basic" / ".pull-source-rev"
+    assert basic_rev.read_text() == "basic-sha"
+
+
 @patch("builder_local.os.makedirs", Mock())
+@patch("cilib.git.mirror_cache.update", Mock(return_value=Path("/mirror.git")))
 @patch("builder_local.git")
 def test_build_entity_setup(git, charm_environment, tmpdir, builder_local):
     """Tests build entity setup."""
@@ -215,9 +349,12 @@ def test_build_entity_setup(git, charm_environment, tmpdir, builder_local):
     assert charm_entity.reactive is True, "test charm requires legacy builds"
     git.assert_called_once_with(
         "clone",
+        "--reference-if-able",
+        "/mirror.git",
+        "--branch",
+        "main",
         "https://github.com/charmed-kubernetes/jenkins.git",
-        charm_entity.checkout_path,
-        branch="main",
+        str(charm_entity.checkout_path),
         _tee=True,
         _out=charm_entity.echo,
     )
@@ -242,6 +379,60 @@ def test_build_entity_charm_changes(charm_environment, charm_cmd, builder_local)
         assert charm_entity.charm_changes is True
 
 
+@pytest.fixture()
+def remote_charm(tmpdir):
+    """Serve a published charm honouring Range requests, counting bytes sent."""
+    charm = Path(tmpdir / "remote.charm")
+    with ZipFile(charm, "w") as zf:
+        zf.writestr("payload.bin", os.urandom(1 << 20))
+        zf.writestr(".build.manifest", yaml.safe_dump({"layers": []}))
+    content = charm.read_bytes()
+    served = {"bytes": 0, "ranges": True}
+
+    def _get(url, headers=None):
+        resp = MagicMock(status_code=200, headers={})
+        body = content
+        if served["ranges"] and headers and "Range" in headers:
+            start, end = headers["Range"].split("=")[1].split("-")
+            if not start:
+                start, end = len(content) - int(end), len(content) - 1
+            lo, hi = int(start), int(end) + 1
+            body = content[lo:hi]
+            resp.status_code = 206
+            resp.headers["Content-Range"] = f"bytes {start}-{end}/{len(content)}"
+        resp.content = body
+        served["bytes"] += len(body)
+        return resp
+
+    with patch("builder_local.requests.get", side_effect=_get):
+        yield content, served
+
+
+@pytest.mark.parametrize("ranges", [True, False])
+def test_build_entity_download_remote_zip(
+    remote_charm, charm_environment, charmhub_info, ranges, builder_local
+):
+    """Reads members of a published charm without downloading all of it."""
+    content, served = remote_charm
+    served["ranges"] = ranges
+    charmhub_info.side_effect = lambda *_a, **_kw: {
+        "default-release": {"revision": {"download": {"url": "https://charm"}}}
+    }
+    charms = charm_environment.job_list
+    charm_name, charm_opts = next(iter(charms[0].items()))
+    charm_entity = builder_local.BuildEntity(charm_environment, charm_name, charm_opts)
+    assert charm_entity.download(".build.manifest") == {"layers": []}
+    remote = charm_entity.download(None)
+    assert {i.filename for i in remote.infolist()} == {
+        "payload.bin",
+        ".build.manifest",
+    }
+    if ranges:
+        assert served["bytes"] < len(content) // 4
+    else:
+        assert served["bytes"] == 2 * len(content)
+
+
 @patch("builder_local.script")
 def test_build_entity_charm_build(
     mock_script, charm_environment, charm_cmd, charmcraft_cmd, tmpdir, builder_local
@@ -327,7 +518,7 @@ def test_build_entity_upload(
 
     charm_entity = builder_local.BuildEntity(charm_environment, charm_name, charm_opts)
     charm_entity.tag = MagicMock()
-    artifact = MagicMock()
+    artifact = MagicMock(rev=None)
     charm_entity.push(artifact)
     charm_cmd.push.assert_not_called()
     charmcraft_cmd.upload.assert_called_once_with(artifact.charm_or_bundle)
@@ -335,6 +526,106 @@ def test_build_entity_upload(
     assert artifact.rev == 845
 
 
+def test_build_entity_reuses_cached_artifacts(
+    charm_environment, charmcraft_cmd, tmpdir, builder_local
+):
+    """Artifacts built from the same commit are restored with their revision."""
+    charms = charm_environment.job_list
+    charm_name, charm_opts = next(iter(charms[0].items()))
+    charm_entity = builder_local.BuildEntity(charm_environment, charm_name, charm_opts)
+    src_path = Path(tmpdir / "src")
+    src_path.mkdir()
+    charm_entity.src_path = str(src_path)
+    charm_file = src_path / "k8s-ci-charm_ubuntu-22.04-amd64.charm"
+    charm_file.write_bytes(b"charm contents")
+    charm_entity.commit = MagicMock(return_value="abc123")
+    charm_entity.tag = MagicMock()
+
+    assert not charm_entity.restore_artifacts()
+    charm_entity.artifacts = [builder_local.Artifact.from_charm(charm_file)]
+    charm_entity.store_artifacts()
+    charm_entity.artifacts[0].rev = 845
+    charm_entity.store_artifacts()
+
+    charm_file.unlink()
+    assert charm_entity.restore_artifacts()
+    (artifact,) = charm_entity.artifacts
+    assert artifact.charm_or_bundle.read_bytes() == b"charm contents"
+    assert artifact.arch == builder_local.Arch.AMD64
+    assert artifact.series == builder_local.CharmSeries.JAMMY
+    assert artifact.rev == 845
+
+    charm_entity.push(artifact)
+    charmcraft_cmd.upload.assert_not_called()
+    charm_entity.tag.assert_called_once_with("k8s-ci-charm-845")
+
+    charm_entity.commit.return_value = "def456"
+    assert not charm_entity.restore_artifacts()
+
+
+def test_build_entity_artifact_key(charm_environment, tmpdir, builder_local):
+    """Keys cover the layers a charm includes and the bases it's built for."""
+    charms = charm_environment.job_list
+    charm_name, charm_opts = next(iter(charms[0].items()))
+    charm_entity = builder_local.BuildEntity(charm_environment, charm_name, charm_opts)
+    src_path = Path(tmpdir / "src")
+    src_path.mkdir()
+    charm_entity.src_path = str(src_path)
+    charm_entity.commit = MagicMock(return_value="abc123")
+    charmcraft_yaml = src_path / "charmcraft.yaml"
+    charmcraft_yaml.write_text("bases: [{name: ubuntu, channel: '22.04'}]")
+    jammy = charm_entity._artifact_key
+    charmcraft_yaml.write_text("bases: [{name: ubuntu, channel: '24.04'}]")
+    assert charm_entity._artifact_key != jammy
+
+    charm_entity.reactive = True
+    charm_entity.layer_path = src_path / "layer.yaml"
+    charm_entity.layer_path.write_text("includes: ['layer:basic']")
+    basic = charm_environment.layers_dir / "basic"
+    basic.mkdir(parents=True)
+    (basic / "layer.yaml").write_text("includes: ['interface:http']")
+    manifest = [
+        {"rev": "basic-sha", "url": "layer:basic"},
+        {"rev": "http-sha", "url": "interface:http"},
+        {"rev": "other-sha", "url": "layer:other"},
+    ]
+    charm_environment.db["pull_layer_manifest"] = manifest
+    assert charm_entity._included_layers() == [manifest[1], manifest[0]]
+    key = charm_entity._artifact_key
+    # layers the charm doesn't include leave its key alone
+    manifest[2]["rev"] = "other-sha-2"
+    assert charm_entity._artifact_key == key
+    manifest[1]["rev"] = "http-sha-2"
+    assert charm_entity._artifact_key != key
+
+    (src_path / "metadata.yaml").write_text("series: [jammy]")
+    key = charm_entity._artifact_key
+    charm_entity.opts = {**charm_opts, "architectures": ["amd64"]}
+    assert charm_entity._artifact_key != key
+
+
+def test_artifact_cache_evicts_least_recently_used(tmpdir, builder_local):
+    """Charms beyond max_bytes are evicted along with the builds using them."""
+    cache = builder_local.ArtifactCache(Path(tmpdir / "cache"), max_bytes=25)
+    dst_path = Path(tmpdir / "restored")
+    dst_path.mkdir()
+    builds = {}
+    for name in ["old", "used", "new"]:
+        if name == "new":
+            # restoring a build makes its charms the most recently used
+            assert cache.get(builds["old"], dst_path)
+        charm_file = Path(tmpdir / f"{name}_ubuntu-22.04-amd64.charm")
+        charm_file.write_bytes(name.encode() * 3)
+        builds[name] = cache.key(name, "abc123", [], {})
+        cache.put(builds[name], [builder_local.Artifact.from_charm(charm_file)])
+
+    assert not cache.get(builds["used"], dst_path)
+    assert not cache._index(builds["used"]).exists()
+    assert cache.get(builds["old"], dst_path)
+    assert cache.get(builds["new"], dst_path)
+    assert sum(blob.stat().st_size for blob in cache.path.glob("blobs/*")) <= 25
+
+
 @pytest.fixture()
 def build_entity_tag(charm_environment, builder_local):
     artifacts = charm_environment.job_list
@@ -419,11 +710,85 @@ def test_build_entity_assemble_resources(
                 image="test-image",
             ),
         ],
-        any_order=False,
+        any_order=True,
     )
+    assert [r.name for r in artifact.resources] == ["test-file", "test-image"]
     charm_cmd.assert_not_called()
 
 
+@patch("builder_local.Docker")
+def test_build_entity_assemble_resources_dedup(
+    mock_docker, charm_environment, charmcraft_cmd, tmpdir, builder_local
+):
+    """Images are pulled once per platform and identical uploads happen once."""
+    charms = charm_environment.job_list
+    charm_name, charm_opts = next(iter(charms[0].items()))
+    charm_entity = builder_local.BuildEntity(charm_environment, charm_name, charm_opts)
+    charm_entity._read_metadata_resources = MagicMock(
+        return_value={
+            "test-image": {"type": "oci-image", "upstream-source": "k8s/pause:3.9"},
+            "test-file": {"type": "file"},
+        }
+    )
+    docker = mock_docker.return_value
+    docker.images.side_effect = lambda _src, _q: "sha256:same-on-all-arches\n"
+    artifacts = [
+        builder_local.Artifact(K8S_CI_CHARM, arch)
+        for arch in (builder_local.Arch.AMD64, builder_local.Arch.ARM64)
+    ]
+    artifacts.append(builder_local.Artifact(K8S_CI_CHARM, builder_local.Arch.AMD64))
+    spec = PropertyMock(return_value={"test-image": "unused"})
+    with patch.object(builder_local.BuildEntity, "_resource_spec", spec):
+        for artifact in artifacts:
+            charm_entity.assemble_resources(artifact)
+
+    assert sorted(c.kwargs["platform"] for c in docker.pull.mock_calls) == [
+        "amd64",
+        "arm64",
+    ]
+    upload_calls = [
+        c for c in charmcraft_cmd.mock_calls if c.args[:1] == ("upload-resource",)
+    ]
+    assert len(upload_calls) == 1
+    revisions_calls = [
+        c for c in charmcraft_cmd.mock_calls if c.args[:1] == ("resource-revisions",)
+    ]
+    assert len(revisions_calls) == 1
+    for artifact in artifacts:
+        assert [(r.name, r.rev) for r in artifact.resources] == [
+            ("test-image", 4),
+            ("test-file", 3),
+        ]
+
+
+@patch("builder_local.Docker")
+def test_build_entity_pull_image_across_entities(
+    mock_docker, charm_environment, builder_local
+):
+    """Entities pulling the same image never interleave pull and image-id reads."""
+    charms = charm_environment.job_list
+    charm_name, charm_opts = next(iter(charms[0].items()))
+    entities = [
+        builder_local.BuildEntity(charm_environment, charm_name, charm_opts)
+        for _ in range(2)
+    ]
+    pulled = []
+
+    def pull(_src, platform):
+        pulled.append(platform)
+        time.sleep(0.05)
+
+    docker = mock_docker.return_value
+    docker.pull.side_effect = pull
+    docker.images.side_effect = lambda _src, _q: f"sha256:{pulled[-1]}\n"
+    args = [(entities[0], "amd64"), (entities[1], "arm64")]
+    ids, failed = concurrently(
+        lambda arg: arg[0]._pull_image("k8s/pause:3.9", arg[1]), args, workers=2
+    )
+    assert not failed
+    assert ids == ["sha256:amd64", "sha256:arm64"]
+
+
 @pytest.fixture
 def ensure_track(builder_local):
     with patch.object(builder_local, "ensure_charm_track") as mocked:
@@ -513,7 +878,7 @@ def test_bundle_build_entity_push(
     bundle_entity = builder_local.BundleBuildEntity(
         bundle_environment, bundle_name, bundle_opts
     )
-    artifact = MagicMock()
+    artifact = MagicMock(rev=None)
     bundle_entity.tag = MagicMock()
     bundle_entity.push(artifact)
     charm_cmd.push.assert_not_called()
@@ -657,11 +1022,14 @@ def test_promote_command(mock_build_env, main):
         from_channel="latest/edge",
         to_channels=mock_build_env.to_channels,
         dry_run=False,
+        workers=8,
+        plan_path="promote-plan.json",
     )
 
 
 @patch("builder_local.sh", MagicMock())
-def test_build_command(mock_build_env, mock_build_entity, main):
+@patch("main.bulk_resolve")
+def test_build_command(mock_bulk_resolve, mock_build_env, mock_build_entity, main):
     """Tests cli build command which is run by jenkins job."""
     runner = CliRunner()
     mock_build_env.job_list = [
@@ -680,6 +1048,7 @@ def test_build_command(mock_build_env, mock_build_entity, main):
     artifact = MagicMock()
     entity = mock_build_entity.return_value
     entity.artifacts = [artifact]
+    entity.restore_artifacts.return_value = False
     result = runner.invoke(
         main.build,
         [
@@ -694,6 +1063,8 @@ def test_build_command(mock_build_env, mock_build_entity, main):
     if result.exception:
         raise result.exception
 
+    (downstreams,), _ = mock_bulk_resolve.call_args
+    assert list(downstreams) == ["charmed-kubernetes/layer-k8s-ci-charm.git"]
     assert mock_build_env.db["build_args"] == {
         "job_list": "tests/data/ci-testing-charms.inc",
         "layer_list": "jobs/includes/charm-layer-list.inc",
@@ -720,6 +1091,7 @@ def test_build_command(mock_build_env, mock_build_entity, main):
     )
     entity.setup.assert_called_once_with()
     entity.charm_build.assert_called_once_with()
+    assert entity.store_artifacts.call_count == 2
     entity.push.assert_called_once_with(artifact)
     entity.assemble_resources.assert_called_once_with(
         artifact, to_channels=["latest/edge", "1.18/edge"]
@@ -729,6 +1101,57 @@ def test_build_command(mock_build_env, mock_build_entity, main):
     )
 
 
+@patch("main.bulk_resolve", MagicMock())
+def test_build_command_concurrent(mock_build_env, mock_build_entity, main):
+    """Charms build concurrently, bounded per stage, failures are aggregated."""
+    mock_build_env.job_list = [
+        {f"charm-{i}": dict(tags=["k8s"]) for i in range(4)},
+    ]
+    mock_build_env.track = "latest"
+    mock_build_env.filter_by_tag = ["k8s"]
+    mock_build_env.to_channels = ["edge"]
+    lock, running = threading.Lock(), []
+    peak = {"local": 0}
+
+    def _charm_build():
+        with lock:
+            running.append(1)
+            peak["local"] = max(peak["local"], len(running))
+        time.sleep(0.05)
+        with lock:
+            running.pop()
+
+    def create_entity(build, name, opts):
+        entity = MagicMock()
+        entity.name = name
+        entity.artifacts = []
+        entity.restore_artifacts.return_value = False
+        entity.charm_build.side_effect = _charm_build
+        if name == "charm-2":
+            entity.resource_build.side_effect = RuntimeError("boom")
+        return entity
+
+    mock_build_entity.side_effect = create_entity
+    result = CliRunner().invoke(
+        main.build,
+        [
+            "--charm-list=tests/data/ci-testing-charms.inc",
+            "--resource-spec=jobs/build-charms/resource-spec.yaml",
+            "--filter-by-tag=k8s",
+            "--layer-index=https://charmed-kubernetes.github.io/layer-index/",
+            "--layer-list=jobs/includes/charm-layer-list.inc",
+            "--force",
+            "--workers=4",
+            "--build-workers=1",
+        ],
+    )
+    assert isinstance(result.exception, SystemExit)
+    assert "Encountered 1 Charm Build Failure:\n\tcharm-2" in str(result.exception)
+    assert mock_build_entity.call_count == 4
+    assert peak["local"] == 1
+    mock_build_env.save.assert_not_called()
+
+
 @patch("main.git")
 def test_bundle_build_command(
     git, mock_build_env, mock_bundle_build_entity, tmpdir, main
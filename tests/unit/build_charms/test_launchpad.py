@@ -0,0 +1,141 @@
+"""Tests to verify jobs/build-charms/builder_launchpad."""
+
+import gzip
+import hashlib
+from io import BytesIO
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+
+def _build(link, *states):
+    """Mock a launchpad build stepping through states on each refresh."""
+    build = MagicMock()
+    build.self_link = build.title = link
+    build.buildstate = states[0]
+    remaining = iter(states[1:])
+
+    def _refresh():
+        build.buildstate = next(remaining, build.buildstate)
+
+    build.lp_refresh.side_effect = _refresh
+    return build
+
+
+@pytest.fixture
+def watcher(builder_launchpad):
+    return builder_launchpad.LaunchpadBuildWatcher(min_interval=0.01, max_interval=0.02)
+
+
+@pytest.fixture
+def lp_entity(builder_launchpad):
+    entity = MagicMock()
+    entity.entity = "k8s-ci-charm"
+    entity.BUILD_STATES_PENDING = builder_launchpad.LPBuildEntity.BUILD_STATES_PENDING
+    entity.BUILD_STATES_SUCCESS = builder_launchpad.LPBuildEntity.BUILD_STATES_SUCCESS
+    return entity
+
+
+def test_watcher_request_completes(watcher, lp_entity):
+    """A build request resolves with its builds once completed."""
+    req = MagicMock(status="Pending", builds=["amd64", "arm64"])
+    statuses = iter(["Pending", "Pending", "Completed"])
+
+    def _refresh():
+        req.status = next(statuses)
+
+    req.lp_refresh.side_effect = _refresh
+    assert watcher.request(lp_entity, req).result(timeout=5) == ["amd64", "arm64"]
+
+
+def test_watcher_request_failed(watcher, lp_entity, builder_launchpad):
+    """A failed build request raises to the waiting entity."""
+    req = MagicMock(status="Failed")
+    with pytest.raises(builder_launchpad.BuildException):
+        watcher.request(lp_entity, req).result(timeout=5)
+
+
+def test_watcher_multiplexes_builds(watcher, lp_entity):
+    """Builds of several charms are tracked and resolved independently."""
+    first = [
+        _build("a-amd64", "Needs building", "Currently building", "Successfully built"),
+        _build("a-arm64", "Needs building", "Successfully built"),
+    ]
+    second = [_build("b-amd64", "Needs building", "Successfully built")]
+    futures = [watcher.builds(lp_entity, first), watcher.builds(lp_entity, second)]
+    assert [f.result(timeout=5) for f in futures] == [first, second]
+    assert all(b.buildstate == "Successfully built" for b in first + second)
+
+
+def test_watcher_cancels_siblings(watcher, lp_entity):
+    """When one build fails, its pending siblings are cancelled."""
+    failing = _build("amd64", "Currently building", "Failed to build")
+    sibling = _build("arm64", "Currently building")
+    sibling.can_be_cancelled = True
+    builds = watcher.builds(lp_entity, [failing, sibling]).result(timeout=5)
+    assert builds == [failing, sibling]
+    sibling.cancel.assert_called_once_with()
+    failing.cancel.assert_not_called()
+
+
+@pytest.fixture
+def lp_build_entity(builder_launchpad, watcher):
+    entity = builder_launchpad.LPBuildEntity.__new__(builder_launchpad.LPBuildEntity)
+    entity.name = entity.entity = "k8s-ci-charm"
+    entity._lp_watcher = watcher
+    entity._lp_charm_file_cache = {}
+    entity.echo = MagicMock()
+    return entity
+
+
+@pytest.fixture
+def urlopen(builder_launchpad):
+    """Serve urls from a dict of url to bytes, one small chunk at a time."""
+    content = {}
+
+    def _urlopen(url):
+        stream = BytesIO(content[url])
+        stream.read = lambda size=-1, _read=stream.read: _read(min(size, 7))
+        return stream
+
+    with patch.object(builder_launchpad.urllib.request, "urlopen", _urlopen):
+        yield content
+
+
+def test_lp_complete_builds_raises(lp_build_entity, urlopen, builder_launchpad):
+    """An entity raises with the build log when a build fails."""
+    failing = _build("amd64", "Currently building", "Failed to build")
+    failing.build_log_url = "https://lp/amd64/log.gz"
+    urlopen[failing.build_log_url] = gzip.compress(b"build\nlog")
+    with pytest.raises(builder_launchpad.BuildException, match="Failed to build"):
+        lp_build_entity._lp_complete_builds([failing])
+    echoed = [c.args[0] for c in lp_build_entity.echo.mock_calls]
+    assert echoed[-2:] == ["build", "log"]
+
+
+def test_lp_build_log_streams_lines(lp_build_entity, urlopen):
+    """Build logs are decompressed and split into lines as chunks arrive."""
+    build = _build("amd64", "Successfully built")
+    build.build_log_url = "https://lp/amd64/log.gz"
+    log = "first line\nünïcode line\n\nCreated k8s_ubuntu@22.04-amd64.charm\n"
+    urlopen[build.build_log_url] = gzip.compress(log.encode())
+    assert list(lp_build_entity._lp_build_log(build)) == log.split("\n")
+    assert (
+        lp_build_entity._lp_charm_filename_from_build(build)
+        == "k8s_ubuntu@22.04-amd64.charm"
+    )
+
+
+def test_lp_build_download_hashes_while_streaming(lp_build_entity, urlopen, tmp_path):
+    """The charm is written straight to disk and hashed chunk by chunk."""
+    build = _build("amd64", "Successfully built")
+    build.web_link = "https://lp/amd64"
+    lp_build_entity._lp_charm_file_cache["amd64"] = "k8s_ubuntu@22.04-amd64.charm"
+    payload = bytes(range(256)) * 3
+    urlopen["https://lp/amd64/+files/k8s_ubuntu@22.04-amd64.charm"] = payload
+    artifact = lp_build_entity._lp_build_download(build, tmp_path)
+    assert artifact.charm_or_bundle.read_bytes() == payload
+    assert [p.name for p in tmp_path.iterdir()] == ["k8s_ubuntu@22.04-amd64.charm"]
+    lp_build_entity.echo.assert_called_with(
+        f"Downloaded amd64 sha256sum={hashlib.sha256(payload).hexdigest()}"
+    )
@@ -0,0 +1,143 @@
+import os
+from types import SimpleNamespace
+from unittest import mock
+
+import requests
+
+import cilib.github_api as github_api
+
+
+def _page(names, **links):
+    return SimpleNamespace(
+        json=lambda: [{"name": name} for name in names],
+        links={rel: {"url": url} for rel, url in links.items()},
+        raise_for_status=lambda: None,
+    )
+
+
+def test_shared_session():
+    """Repositories with the same credentials share one session."""
+    a = github_api.Repository.with_session("org", "a", ("user", "pass"))
+    b = github_api.Repository.with_session("org", "b", ("user", "pass"))
+    c = github_api.Repository.with_session("org", "c", ("user", "pass"), False)
+    assert a.session is b.session
+    assert a.session is not c.session
+
+
+def test_paginate_fetches_known_pages():
+    """Once the last page is known every remaining page is requested."""
+    api = "https://api.github.com/repos/org/repo/tags?per_page=100"
+    pages = {
+        api: _page(["v1"], next=f"{api}&page=2", last=f"{api}&page=3"),
+        f"{api}&page=2": _page(["v2"]),
+        f"{api}&page=3": _page(["v3"]),
+    }
+    session = mock.MagicMock()
+    session.get.side_effect = lambda url: pages[url]
+    repo = github_api.Repository(session, "org", "repo")
+    assert repo.tags == ["v1", "v2", "v3"]
+    assert session.get.call_count == 3
+
+
+@mock.patch("cilib.github_api.time.sleep")
+@mock.patch("requests.Session.request")
+def test_rate_limit_retry(mock_request, mock_sleep):
+    """Rate limited requests are retried after the advertised delay."""
+    limited = SimpleNamespace(status_code=429, headers={"Retry-After": "3"})
+    ok = SimpleNamespace(status_code=200, headers={})
+    mock_request.side_effect = [limited, ok]
+    session = github_api.AuthSession(("user", "pass"))
+    assert session.get("https://api.github.com/repos/org/repo") is ok
+    mock_sleep.assert_called_once_with(3)
+
+
+@mock.patch("requests.Session.request")
+def test_read_only_graphql(mock_request):
+    """Read only sessions send GraphQL queries but block its mutations."""
+    session = github_api.AuthSession(("user", "pass"))
+    query = {"query": 'query { viewer { login } } # "mutation" in a comment'}
+    assert session.post(github_api.GRAPHQL_API, json=query) is mock_request.return_value
+    for document in [
+        "mutation { addStar(input: {starrableId: 1}) { clientMutationId } }",
+        "query { viewer { login } }\nmutation M { deleteRef(input: {}) { ok } }",
+    ]:
+        resp = session.post(github_api.GRAPHQL_API, json={"query": document})
+        assert resp.status_code == 403
+    resp = session.post(github_api.GRAPHQL_API, data="mutation {}")
+    assert resp.status_code == 403
+    mock_request.assert_called_once()
+
+
+@mock.patch("requests.Session.request")
+def test_response_cache_revalidates_with_etag(mock_request, tmp_path):
+    """Cached bodies are served again when GitHub answers 304."""
+    url = "https://api.github.com/repos/org/repo"
+    fresh = requests.Response()
+    fresh.status_code, fresh._content = 200, b'{"default_branch": "main"}'
+    fresh.headers["ETag"] = 'W/"abc"'
+    not_modified = requests.Response()
+    not_modified.status_code, not_modified.url = 304, url
+    mock_request.side_effect = [fresh, not_modified]
+
+    cache = github_api.ResponseCache(tmp_path)
+    session = github_api.AuthSession(("user", "pass"), cache=cache)
+    assert session.get(url).json() == {"default_branch": "main"}
+    resp = session.get(url)
+    assert resp.status_code == 200
+    assert resp.json() == {"default_branch": "main"}
+    _, kwargs = mock_request.call_args
+    assert kwargs["headers"]["If-None-Match"] == 'W/"abc"'
+
+
+def test_response_cache_evicts_least_recently_used(tmp_path):
+    """The oldest entries are dropped once the cache outgrows its bound."""
+    cache = github_api.ResponseCache(tmp_path, max_bytes=150)
+    for n in range(3):
+        resp = requests.Response()
+        resp.status_code, resp._content = 200, b"x" * 60
+        cache.put(f"key-{n}", resp)
+        os.utime(cache._entry_path(f"key-{n}"), (n, n))
+    cache._evict()
+    assert cache.get("key-0") is None
+    assert cache.get("key-2") is not None
+
+
+@mock.patch.dict("cilib.github_api._SEEDED", clear=True)
+@mock.patch("cilib.github_api.AuthSession.post")
+def test_bulk_resolve_seeds_repositories(mock_post):
+    """GraphQL results answer Repository reads without REST calls."""
+    refs = {"pageInfo": {"hasNextPage": False}, "nodes": [{"name": "main"}]}
+    paged = {"pageInfo": {"hasNextPage": True}, "nodes": [{"name": "v1"}]}
+    mock_post.return_value = SimpleNamespace(
+        ok=True,
+        json=lambda: {
+            "data": {
+                "r0": {
+                    "defaultBranchRef": {"name": "main"},
+                    "branches": refs,
+                    "tags": paged,
+                },
+                "r1": None,
+            }
+        },
+    )
+    github_api.bulk_resolve(
+        [
+            "charmed-kubernetes/charm-calico.git",
+            "https://github.com/charmed-kubernetes/layer-basic",
+            "https://git.launchpad.net/interface-prometheus",
+        ]
+    )
+    (url,), kwargs = mock_post.call_args
+    assert url == github_api.GRAPHQL_API
+    assert '"layer-basic"' in kwargs["json"]["query"]
+    assert "interface-prometheus" not in kwargs["json"]["query"]
+
+    session = mock.MagicMock()
+    repo = github_api.Repository(session, "charmed-kubernetes", "charm-calico.git")
+    assert repo.default_branch == "main"
+    assert repo.branches == ["main"]
+    session.get.assert_not_called()
+    # tags didn't fit in one page, so they still come from REST
+    session.get.return_value = _page(["v1", "v2"])
+    assert repo.tags == ["v1", "v2"]
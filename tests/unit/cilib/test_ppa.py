@@ -0,0 +1,69 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from cilib.models.ppa import PPACollection
+
+
+def _source(name, version, status="Published"):
+    return SimpleNamespace(
+        source_package_name=name, source_package_version=version, status=status
+    )
+
+
+def test_ppa_collection_lists_sources_once():
+    """Every ppa is listed once, and indexed by (ppa, package)."""
+    archives = [mock.MagicMock(), mock.MagicMock()]
+    archives[0].name = "1.30"
+    archives[0].getPublishedSources.return_value = [
+        _source("kubectl", "1.30.2-0", status="Pending"),
+        _source("kubectl", "1.30.1-0"),
+        _source("kubelet", "1.30.1-0"),
+        _source("kubectl", "1.30.0-0"),
+    ]
+    archives[1].name = "1.31"
+    archives[1].getPublishedSources.return_value = [_source("kubectl", "1.31.0-0")]
+
+    ppas = PPACollection(archives)
+    ppas.prefetch()
+    assert ppas.names == ["1.30", "1.31"]
+    assert ppas.index == {
+        ("1.30", "kubectl"): {
+            "name": "kubectl",
+            "version": "1.30.1-0",
+            "status": "Published",
+        },
+        ("1.30", "kubelet"): {
+            "name": "kubelet",
+            "version": "1.30.1-0",
+            "status": "Published",
+        },
+        ("1.31", "kubectl"): {
+            "name": "kubectl",
+            "version": "1.31.0-0",
+            "status": "Published",
+        },
+    }
+    ppa = ppas.get_ppa_by_major_minor("1.30")
+    assert str(ppa.get_source_semver("kubectl")) == "1.30.1-0"
+    assert ppas.get_ppa_by_major_minor("1.30") is ppa
+    assert ppas.get_ppa_by_major_minor("1.29") is None
+    for archive in archives:
+        archive.getPublishedSources.assert_called_once_with()
+
+
+def test_ppa_collection_prefetch_continues_past_failures():
+    """A ppa failing to list doesn't stop the others, it is retried on use."""
+    archives = [mock.MagicMock(), mock.MagicMock()]
+    archives[0].name = "1.30"
+    archives[0].getPublishedSources.side_effect = [
+        ConnectionError,
+        [_source("kubectl", "1.30.1-0")],
+    ]
+    archives[1].name = "1.31"
+    archives[1].getPublishedSources.return_value = [_source("kubectl", "1.31.0-0")]
+
+    ppas = PPACollection(archives)
+    ppas.prefetch()
+    archives[1].getPublishedSources.assert_called_once_with()
+    assert sorted(ppas.index) == [("1.30", "kubectl"), ("1.31", "kubectl")]
+    assert archives[0].getPublishedSources.call_count == 2
@@ -0,0 +1,69 @@
+import json
+from types import SimpleNamespace
+from unittest import mock
+
+import cilib.snapapi as snapapi
+
+CHANNEL_MAP = {
+    "channel-map": [
+        {"channel": "1.30/edge", "architecture": "amd64", "revision": 12},
+        {"channel": "1.30/edge", "architecture": "arm64", "revision": 13},
+        {"channel": "latest/stable", "architecture": "amd64", "revision": 10},
+    ],
+    "revisions": [
+        {"revision": 12, "architectures": ["amd64"], "version": "1.30.2"},
+        {"revision": 13, "architectures": ["arm64"], "version": "1.30.2"},
+        {"revision": 10, "architectures": ["amd64"], "version": "1.29.7"},
+    ],
+}
+
+
+@mock.patch("cilib.snapapi.capture")
+def test_snap_store_client_shared_channel_maps(mock_capture):
+    """Channel maps are fetched once per snap and shared across SnapStores."""
+    mock_capture.return_value = SimpleNamespace(stdout=json.dumps(CHANNEL_MAP).encode())
+    client = snapapi.SnapStoreClient()
+    client.prefetch(["kubectl", "kubelet", "kubectl"])
+    assert mock_capture.call_count == 2
+
+    kubectl = snapapi.SnapStore("kubectl", client=client)
+    assert kubectl.max_rev("arm64", "1.30/edge") == 13
+    assert kubectl.max_rev("s390x", "1.30/edge") is None
+    assert str(kubectl.version_from_rev(10, "amd64")) == "1.29.7"
+    assert kubectl.version_from_rev(10, "arm64") is None
+    assert snapapi.SnapStore("kubectl", client=client).channel_map == CHANNEL_MAP
+    assert mock_capture.call_count == 2
+
+
+REVISIONS = """Rev.    Uploaded              Arch    Version          Channels
+14      2024-05-01T10:00:00Z  amd64   1.30.2           1.30/edge*,1.30/beta*
+13      2024-04-01T10:00:00Z  amd64   1.30.1           1.30/edge
+12      2024-03-01T10:00:00Z  arm64   1.30.1           1.30/edge*
+11      2024-02-01T10:00:00Z  amd64   1.30.0-rc.1      1.30/edge
+10      2024-01-01T10:00:00Z  amd64   not-semver       -
+"""
+
+
+def test_parse_revisions():
+    """Revision rows are parsed into typed records."""
+    revs = list(snapapi.parse_revisions(REVISIONS.splitlines()))
+    assert [rev.revision for rev in revs] == [14, 13, 12, 11, 10]
+    assert revs[0].channels == ("1.30/edge*", "1.30/beta*")
+    assert revs[0].released == ("1.30/edge", "1.30/beta")
+    assert str(revs[3].semver_version) == "1.30.0-rc.1"
+    assert revs[4].semver_version is None
+
+
+@mock.patch.dict("cilib.snapapi._revisions_cache", clear=True)
+@mock.patch("cilib.snapapi.sh")
+def test_revisions_are_cached_per_snap(mock_sh):
+    """A listing of all arches is fetched once and serves per arch queries."""
+    mock_sh.snapcraft.revisions.return_value = iter(REVISIONS.splitlines())
+    published = snapapi.all_published("kubectl")
+    assert published["amd64"] == {"1.30.2": ["1.30/edge*", "1.30/beta*"]}
+    assert published["arm64"] == {"1.30.1": ["1.30/edge*"]}
+
+    latest = snapapi.latest("kubectl", "1.30/edge", "amd64", exclude_pre=True)
+    assert latest.revision == 14
+    assert snapapi.latest("kubectl", "1.31/edge", "amd64") is None
+    mock_sh.snapcraft.revisions.assert_called_once_with("kubectl", _iter=True)
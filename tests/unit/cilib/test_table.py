@@ -0,0 +1,8 @@
+from cilib.table import format_table
+
+
+def test_format_table():
+    """Columns fit their widest cell, trailing space is dropped."""
+    assert format_table(("Name", "Status"), [("kubectl", "ok"), ("cni", "")]) == (
+        "Name     Status\n" "-------  ------\n" "kubectl  ok\n" "cni"
+    )
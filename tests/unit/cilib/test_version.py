@@ -48,3 +48,31 @@ def test_channel_comparitor(channel):
 
     # all channel params fall outside the range ending at 0.15/edge
     assert channel not in version.ChannelRange(None, "0.15/edge")
+
+
+def test_semver_ref_index():
+    index = version.SemverRefIndex(
+        [
+            "main",
+            "v1.28.0",
+            "v1.28.2-rc.0",
+            "v1.28.1",
+            "v1.28.1+patch.2",
+            "v1.28.1+patch.10",
+            "v1.29.0-alpha.1",
+        ]
+    )
+    # non-semver refs are dropped, the rest is kept
+    assert len(index) == 6
+
+    assert str(index.latest("1.28")) == "1.28.2-rc.0"
+    assert str(index.latest("1.28", exclude_pre=True)) == "1.28.1"
+    assert index.latest("1.29", exclude_pre=True) is None
+    assert index.latest("1.30") is None
+
+    # patch levels compare numerically
+    assert index.patch(version.parse("1.28.1")) == 10
+    assert index.patch(version.parse("1.28.0")) is None
+
+    assert index.from_point("v1.28.2-alpha.0") == ["v1.28.2-rc.0", "v1.29.0-alpha.1"]
+    assert version.ref_index(["v1.28.0"]) is version.ref_index(["v1.28.0"])
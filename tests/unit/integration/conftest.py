@@ -0,0 +1,58 @@
+"""Ensure that path is included in PYTHONPATH before tests are run."""
+
+import importlib
+import sys
+import pytest
+
+
+@pytest.fixture(scope="package")
+def kubeapi():
+    sys.path.append("jobs/integration")
+    kubeapi = importlib.import_module("kubeapi")
+
+    yield kubeapi
+
+    sys.path.remove("jobs/integration")
+    del sys.modules["kubeapi"]
+    del kubeapi
+
+
+@pytest.fixture(scope="package")
+def jujuwait():
+    sys.path.append("jobs/integration")
+    jujuwait = importlib.import_module("jujuwait")
+
+    yield jujuwait
+
+    sys.path.remove("jobs/integration")
+    del sys.modules["jujuwait"]
+    del jujuwait
+
+
+@pytest.fixture(scope="package")
+def upgrade():
+    sys.path.append("jobs/integration")
+    upgrade = importlib.import_module("upgrade")
+
+    yield upgrade
+
+    sys.path.remove("jobs/integration")
+    del sys.modules["upgrade"]
+    del upgrade
+
+
+@pytest.fixture(scope="package")
+def utils():
+    yield importlib.import_module("jobs.integration.utils")
+
+
+@pytest.fixture(scope="package")
+def scheduler():
+    sys.path.append("jobs/integration")
+    scheduler = importlib.import_module("scheduler")
+
+    yield scheduler
+
+    sys.path.remove("jobs/integration")
+    del sys.modules["scheduler"]
+    del scheduler
@@ -0,0 +1,86 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+
+class FakeUnit:
+    def __init__(self, name, agent="executing", workload="maintenance"):
+        self.name = name
+        self.application = name.split("/")[0]
+        self.agent_status = agent
+        self.workload_status = workload
+        self.workload_status_message = ""
+        self.resolved = mock.AsyncMock()
+
+
+class FakeModel:
+    """A model whose unit changes are delivered to its observers."""
+
+    def __init__(self, *units):
+        self.units = {unit.name: unit for unit in units}
+        self.observers = []
+
+    def add_observer(self, callable_, entity_type=None):
+        self.observers.append(callable_)
+
+    async def change(self, unit, **status):
+        for key, value in status.items():
+            setattr(unit, key, value)
+        for observer in self.observers:
+            await observer(mock.Mock(entity="unit"), unit, unit, self)
+
+
+async def test_wait_follows_unit_changes(jujuwait):
+    """Waiters wake on unit deltas and settle once every unit is active."""
+    worker, plane = FakeUnit("worker/0"), FakeUnit("plane/0")
+    model = FakeModel(worker, plane)
+    waiter = jujuwait.ModelWaiter(model, settle=0.1, poll=30)
+    waiting = asyncio.ensure_future(waiter.wait(max_wait=10))
+
+    await asyncio.sleep(0.05)
+    assert not waiting.done()
+    assert len(model.observers) == 1
+    await model.change(worker, agent_status="idle", workload_status="active")
+    await asyncio.sleep(0.05)
+    assert not waiting.done()
+    # charms which don't set a status are ready once their agent is idle
+    await model.change(plane, agent_status="idle", workload_status="unknown")
+    await asyncio.wait_for(waiting, 1)
+
+    # later waiters share the model's observer
+    await jujuwait.ModelWaiter(model, settle=0).wait()
+    assert len(model.observers) == 1
+
+
+async def test_wait_excluded_and_timeout(jujuwait):
+    """Excluded applications are ignored, others time out after max_wait."""
+    model = FakeModel(FakeUnit("worker/0"), FakeUnit("plane/0", "idle", "active"))
+    await jujuwait.ModelWaiter(model, exclude="worker", settle=0).wait(max_wait=1)
+    with pytest.raises(jujuwait.JujuWaitError, match="waiting for worker/0"):
+        await jujuwait.ModelWaiter(model, settle=0).wait(max_wait=0.1)
+
+
+async def test_wait_retries_errors(jujuwait):
+    """Units in error are resolved retry_errors times before failing."""
+    unit = FakeUnit("etcd/0", "error", "error")
+    model = FakeModel(unit)
+    with pytest.raises(jujuwait.JujuWaitError, match="etcd/0 is in error"):
+        await jujuwait.ModelWaiter(model).wait(max_wait=1)
+    unit.resolved.assert_not_called()
+
+    waiter = jujuwait.ModelWaiter(model, retry_errors=1, settle=0)
+    waiting = asyncio.ensure_future(waiter.wait(max_wait=10))
+    await asyncio.sleep(0.05)
+    unit.resolved.assert_awaited_once_with(retry=True)
+    await model.change(unit, agent_status="idle", workload_status="active")
+    await asyncio.wait_for(waiting, 1)
+
+    # a unit failing again once resolved uses up its retries
+    waiter = jujuwait.ModelWaiter(model, retry_errors=1)
+    waiting = asyncio.ensure_future(waiter.wait(max_wait=10))
+    for status in ["error", "maintenance", "error"]:
+        await model.change(unit, agent_status="executing", workload_status=status)
+        await asyncio.sleep(0.05)
+    with pytest.raises(jujuwait.JujuWaitError, match="etcd/0 is in error"):
+        await asyncio.wait_for(waiting, 1)
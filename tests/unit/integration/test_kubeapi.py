@@ -0,0 +1,87 @@
+import asyncio
+import queue
+from unittest import mock
+
+import pytest
+
+
+def _pod(name, phase="Pending", namespace="default"):
+    return {
+        "metadata": {"name": name, "namespace": namespace},
+        "status": {"phase": phase},
+    }
+
+
+class FakeResource:
+    """A pod resource whose watch streams the events put on its queue."""
+
+    kind = "Pod"
+    group_version = "v1"
+
+    def __init__(self, pods):
+        self.pods = pods
+        self.events = queue.Queue()
+        self.queries = []
+
+    def get(self, **query):
+        self.queries.append(query)
+        listed = {"items": list(self.pods), "metadata": {"resourceVersion": "1"}}
+        return mock.Mock(to_dict=mock.Mock(return_value=listed))
+
+    def watch(self, resource_version, timeout, watcher, **query):
+        while (event := self.events.get()) is not None:
+            yield event
+
+
+def test_parse_selector(kubeapi):
+    """kubectl namespace and selector arguments become watch queries."""
+    assert kubeapi.parse_selector("") == ("default", None, None)
+    assert kubeapi.parse_selector("-n kube-system -l app=dns") == (
+        "kube-system",
+        "app=dns",
+        None,
+    )
+    assert kubeapi.parse_selector("-A --field-selector=status.phase=Running") == (
+        None,
+        None,
+        "status.phase=Running",
+    )
+    with pytest.raises(kubeapi.UnsupportedQuery):
+        kubeapi.parse_selector("-o wide")
+
+
+async def test_informer_follows_watch(kubeapi):
+    """Objects are listed once, kept current by events which wake waiters."""
+    resource = FakeResource([_pod("microbot-1")])
+    informer = kubeapi.Informer(resource, ("default", "app=microbot", None)).start()
+    try:
+        with kubeapi.Changes() as changes:
+            pods = await informer.items()
+        assert kubeapi.matching(pods, ["microbot"])[0]["kind"] == "Pod"
+        assert resource.queries == [
+            {"namespace": "default", "label_selector": "app=microbot"}
+        ]
+
+        running = _pod("microbot-1", phase="Running")
+        resource.events.put({"type": "MODIFIED", "raw_object": running})
+        assert await asyncio.wait_for(changes.wait(30), 5)
+        pods = await informer.items()
+        assert [pod["status"]["phase"] for pod in pods] == ["Running"]
+
+        resource.events.put({"type": "DELETED", "raw_object": running})
+        for _ in range(50):
+            if not await informer.items():
+                break
+            await asyncio.sleep(0.1)
+        assert await informer.items() == []
+        assert len(resource.queries) == 1
+    finally:
+        informer.stop()
+        resource.events.put(None)
+
+
+async def test_changes_without_reads(kubeapi):
+    """Nothing read from an informer leaves callers to poll as before."""
+    with kubeapi.Changes() as changes:
+        pass
+    assert await changes.wait(30) is False
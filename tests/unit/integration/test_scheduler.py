@@ -0,0 +1,252 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+CONFTEST = """
+import sys
+import pytest
+
+sys.path.append({path!r})
+from scheduler import SideEffectScheduler
+
+
+def pytest_configure(config):
+    config.pluginmanager.register(SideEffectScheduler(4), "side-effect-scheduler")
+
+
+@pytest.fixture(scope="module")
+def deployment():
+    return []
+
+
+@pytest.fixture(scope="module")
+def model():
+    return ["kubernetes-control-plane"]
+
+
+@pytest.fixture(scope="module")
+def cloud(deployment):
+    deployment.append("cloud setup")
+    return "ec2"
+
+
+@pytest.fixture()
+async def k8s_version(model):
+    return (1, 30)
+
+
+# function scoped autouse guards, as in the integration conftest
+@pytest.fixture(autouse=True)
+def skip_if_apps(request, model):
+    marker = request.node.get_closest_marker("skip_if_apps")
+    if marker and marker.args[0](model):
+        pytest.skip("apps predicate was True")
+
+
+@pytest.fixture(autouse=True)
+def skip_unless_all_charms(request, model):
+    marker = request.node.get_closest_marker("skip_unless_all_charms")
+    if marker and not set(marker.args[0]) <= set(model):
+        pytest.skip("not all matching charms found")
+
+
+@pytest.fixture(autouse=True)
+def xfail_if_open_bugs(request):
+    marker = request.node.get_closest_marker("xfail_if_open_bugs")
+    if marker:
+        request.node.add_marker(pytest.mark.xfail(True, reason="open bug"))
+
+
+@pytest.fixture(autouse=True)
+def skip_if_version(request, k8s_version):
+    marker = request.node.get_closest_marker("skip_if_version")
+    if marker and marker.args[0](k8s_version):
+        pytest.skip("k8s version")
+"""
+
+TESTS = """
+import asyncio
+import pytest
+
+
+@pytest.mark.mutates_topology
+async def test_upgrade(deployment):
+    deployment.append("upgrade")
+
+
+async def test_config(deployment):
+    deployment.append("config")
+
+
+@pytest.mark.skip("removed")
+@pytest.mark.mutates_topology
+async def test_removed(deployment):
+    deployment.append("removed")
+
+
+@pytest.mark.read_only
+async def test_read_a(deployment):
+    deployment.append("a start")
+    await asyncio.sleep(0.2)
+    deployment.append("a end")
+
+
+@pytest.mark.read_only
+async def test_read_b(deployment):
+    deployment.append("b start")
+    await asyncio.sleep(0.1)
+    deployment.append("b end")
+
+
+@pytest.mark.read_only
+async def test_read_cloud(deployment, cloud):
+    deployment.append(cloud)
+
+
+@pytest.mark.read_only
+async def test_read_skipped(deployment):
+    pytest.skip("nothing to read")
+
+
+@pytest.mark.read_only
+async def test_read_tmp(deployment, tmp_path):
+    deployment.append("tmp")
+
+
+@pytest.mark.read_only
+@pytest.mark.flaky(max_runs=2)
+async def test_read_flaky(deployment):
+    deployment.append("flaky")
+    assert deployment.count("flaky") == 2
+
+
+@pytest.mark.read_only
+@pytest.mark.skip_if_apps(lambda apps: "kubernetes-control-plane" in apps)
+async def test_read_guarded(deployment):
+    deployment.append("guarded")
+
+
+@pytest.mark.read_only
+async def test_read_c(deployment):
+    deployment.append("c")
+
+
+async def test_deployment(deployment):
+    assert deployment == [
+        "upgrade", "cloud setup", "a start", "b start", "ec2", "b end", "a end",
+        "tmp", "flaky", "flaky", "c", "config"
+    ]
+"""
+
+
+def test_scheduler_orders_and_batches(scheduler, tmp_path):
+    """Read only tests run first and at once, without crossing topology changes."""
+    path = str(Path(scheduler.__file__).parent.resolve())
+    (tmp_path / "pytest.ini").write_text("[pytest]\nasyncio_mode = auto\n")
+    (tmp_path / "conftest.py").write_text(CONFTEST.format(path=path))
+    (tmp_path / "test_deployment.py").write_text(TESTS)
+    run = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "pytest",
+            "-v",
+            "-p",
+            "no:cacheprovider",
+            "-W",
+            "ignore",
+        ],
+        cwd=tmp_path,
+        capture_output=True,
+        text=True,
+    )
+    outcomes = [
+        line.split("::")[1].split()[:2]
+        for line in run.stdout.splitlines()
+        if line.startswith("test_deployment.py::")
+    ]
+    assert outcomes == [
+        ["test_upgrade", "PASSED"],
+        ["test_read_a", "PASSED"],
+        ["test_read_b", "PASSED"],
+        ["test_read_cloud", "PASSED"],
+        ["test_read_skipped", "SKIPPED"],
+        ["test_read_tmp", "PASSED"],
+        ["test_read_flaky", "PASSED"],
+        ["test_read_guarded", "SKIPPED"],
+        ["test_read_c", "PASSED"],
+        ["test_config", "PASSED"],
+        ["test_deployment", "PASSED"],
+        ["test_removed", "SKIPPED"],
+    ], run.stdout
+
+
+JUJU = """#!/bin/sh
+case "$1" in
+  whoami) echo "user: admin" ;;
+  --version) echo "3.1.6-ubuntu-amd64" ;;
+esac
+"""
+
+BATCHES = """
+import json
+
+
+def pytest_collection_finish(session):
+    scheduler = session.config.pluginmanager.get_plugin("side-effect-scheduler")
+    batches, items, index = [], session.items, 0
+    while index < len(items):
+        batch = [items[index], *scheduler.candidates(items[index])]
+        if len(batch) > 1:
+            batches.append([item.name for item in batch])
+        index += len(batch)
+    print("BATCHES", json.dumps(batches))
+"""
+
+
+def test_scheduler_batches_validation(scheduler, tmp_path):
+    """The read only tests of the validation suite share batches."""
+    integration = Path(scheduler.__file__).parent.resolve()
+    juju = tmp_path / "juju"
+    juju.write_text(JUJU)
+    juju.chmod(0o755)
+    (tmp_path / "batches.py").write_text(BATCHES)
+    env = dict(os.environ, PYTHONPATH=str(tmp_path))
+    env["PATH"] = f"{tmp_path}:{env['PATH']}"
+    run = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "pytest",
+            str(integration / "validation.py"),
+            "--collect-only",
+            "-p",
+            "no:cacheprovider",
+            "-p",
+            "batches",
+            "--controller=ci",
+            "--model=validate",
+            "-o",
+            "addopts=",
+        ],
+        cwd=integration.parents[1],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    (batches,) = [
+        json.loads(line.split(" ", 1)[1])
+        for line in run.stdout.splitlines()
+        if line.startswith("BATCHES ")
+    ] or [run.stdout + run.stderr]
+    assert batches == [
+        [
+            "test_status_messages",
+            "test_snap_versions",
+            "test_rbac",
+            "test_cloud_node_labels",
+        ],
+        ["test_sriov_cni", "test_sriov_network_device_plugin"],
+    ]
@@ -0,0 +1,37 @@
+import asyncio
+
+
+def test_plan_upgrade(upgrade):
+    """Applications are tiered by dependency, unknown ones before the control plane."""
+    tiers = upgrade.plan_upgrade(
+        [
+            "kubernetes-worker",
+            "containerd",
+            "etcd",
+            "kubernetes-control-plane",
+            "calico",
+            "easyrsa",
+        ]
+    )
+    assert [(tier.name, tier.apps) for tier in tiers] == [
+        ("datastore", ["easyrsa", "etcd"]),
+        ("supporting", ["calico", "containerd"]),
+        ("control-plane", ["kubernetes-control-plane"]),
+        ("workers", ["kubernetes-worker"]),
+    ]
+    assert upgrade.plan_upgrade([]) == []
+
+
+async def test_run_tiers(upgrade):
+    """Each tier starts once the previous one finished, and is timed."""
+    upgraded = []
+
+    async def upgrade_tier(tier):
+        await asyncio.sleep(0.01)
+        upgraded.append(tier.apps)
+
+    tiers = upgrade.plan_upgrade(["kubernetes-worker", "etcd"])
+    assert await upgrade.run_tiers(tiers, upgrade_tier) is tiers
+    assert upgraded == [["etcd"], ["kubernetes-worker"]]
+    assert all(tier.seconds > 0 for tier in tiers)
+    assert upgrade.format_timings(tiers) == "datastore 0s, workers 0s"
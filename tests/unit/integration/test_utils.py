@@ -0,0 +1,83 @@
+import asyncio
+import uuid
+from unittest import mock
+
+import pytest
+
+
+class FakeUnit:
+    """A unit running commands for `seconds`, failing its first `fails` runs."""
+
+    running = 0
+    most_running = 0
+
+    def __init__(self, name, seconds=0.01, fails=0):
+        self.name = name
+        self.seconds = seconds
+        self.fails = fails
+        self.entity_id = name
+        self.runs = 0
+
+    async def run(self, cmd, **kwargs):
+        self.runs += 1
+        code = 1 if self.runs <= self.fails else 0
+        action = mock.Mock(
+            status="completed", results={"return-code": code, "stdout": self.name}
+        )
+        return mock.Mock(wait=mock.AsyncMock(side_effect=self._wait(action)))
+
+    def _wait(self, action):
+        async def wait():
+            FakeUnit.running += 1
+            FakeUnit.most_running = max(FakeUnit.running, FakeUnit.most_running)
+            await asyncio.sleep(self.seconds)
+            FakeUnit.running -= 1
+            return action
+
+        return wait
+
+
+async def test_run_on_units(utils):
+    """Units run at once up to the concurrency, results are keyed by unit."""
+    units = [FakeUnit(f"worker/{i}") for i in range(6)]
+    results = await utils.run_on_units(units, "hostname", concurrency=4)
+    assert FakeUnit.most_running == 4
+    assert list(results) == [unit.name for unit in units]
+    assert results["worker/5"].stdout == "worker/5"
+    assert results.success
+
+
+async def test_run_on_units_failures(utils):
+    """Failures raise when checked, are retried and can time out."""
+    flaky = FakeUnit("worker/1", fails=1)
+    units = [FakeUnit("worker/0"), flaky]
+    with pytest.raises(utils.JujuRunError, match="failed on worker/1"):
+        await utils.run_on_units(units, "hostname")
+
+    flaky.runs = 0
+    results = await utils.run_on_units(units, "hostname", check=False)
+    assert list(results.failed) == ["worker/1"]
+
+    flaky.runs = 0
+    results = await utils.run_on_units(units, "hostname", tries=2, delay=0)
+    assert flaky.runs == 2 and results.success
+
+    units.append(FakeUnit("worker/2", seconds=5))
+    with pytest.raises(asyncio.TimeoutError, match="timed out on worker/2"):
+        await utils.run_on_units(units, "hostname", timeout=0.1)
+
+
+async def test_kube_client_shares_kubeconfig(utils):
+    """The kubeconfig is read from the leader once, for fixture and client."""
+    leader, other = FakeUnit("kubernetes-control-plane/0"), FakeUnit("k-c-p/1")
+    leader.is_leader_from_status = mock.AsyncMock(return_value=True)
+    other.is_leader_from_status = mock.AsyncMock(return_value=False)
+    model = mock.Mock()
+    model.info.uuid = str(uuid.uuid4())
+    model.applications = {"kubernetes-control-plane": mock.Mock(units=[other, leader])}
+
+    with mock.patch.object(utils, "KubeClient") as client:
+        assert await utils.fetch_kubeconfig(model) == leader.name
+        assert await utils.kube_client(model) is client.return_value
+    client.assert_called_once_with(leader.name)
+    assert (leader.runs, other.runs) == (1, 0)
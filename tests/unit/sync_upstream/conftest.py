@@ -4,6 +4,7 @@ import importlib
 import os
 import sys
 import pytest
+from unittest import mock
 
 
 @pytest.fixture(scope="package")
@@ -32,3 +33,9 @@ def sync(cdkbot_creds):
     sys.path.remove("jobs/sync-upstream")
     del sys.modules["sync"]
     del sync
+
+
+@pytest.fixture(autouse=True)
+def bulk_resolve(sync):
+    with mock.patch.object(sync, "bulk_resolve") as mocked:
+        yield mocked
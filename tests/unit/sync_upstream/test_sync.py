@@ -1,12 +1,23 @@
+import json
+from pathlib import Path
+from types import SimpleNamespace
 from unittest import mock
 
+import pytest
+import sh
 from click.testing import CliRunner
+from drypy import dryrun
+
+from cilib import git
+from cilib.models.repos import BaseRepoModel
 
 
 @mock.patch("sync.CharmRepoModel.base", new_callable=mock.PropertyMock)
 @mock.patch("sync.CharmRepoModel.default_gh_branch", return_value="test-main")
 def test_sync_default_branch(mock_default_gh, mock_base, sync):
     """Tests cli forks command which is run by jenkins job."""
+    mock_base.return_value.is_ancestor.return_value = False
+    mock_base.return_value.merge.return_value.returncode = 0
     runner = CliRunner()
     result = runner.invoke(
         sync.forks,
@@ -15,15 +26,24 @@ def test_sync_default_branch(mock_default_gh, mock_base, sync):
         ],
     )
     assert result.exception is None
+    # forks are synced concurrently, so calls of other forks may come between
     mock_default_gh.assert_has_calls(
         [
             mock.call("juju-solutions/interface-aws-integration"),
             mock.call("charmed-kubernetes/interface-aws-integration"),
         ],
-        any_order=False,
+        any_order=True,
     )
     for name, args, kwargs in mock_base().mock_calls:
-        assert name in ["clone", "remote_add", "fetch", "checkout", "merge", "push"]
+        assert name in [
+            "clone",
+            "remote_add",
+            "fetch",
+            "checkout",
+            "is_ancestor",
+            "merge",
+            "push",
+        ]
         if ref := kwargs.get("ref"):
             assert ref == "test-main"
 
@@ -126,3 +146,149 @@ def test_rename_branch(mock_rename_branch, sync):
         )
     assert result.exception is None
     mock_rename_branch.assert_called_once_with("release_100.23", "release-100.23")
+
+
+@mock.patch("sync.snapapi.store_client.prefetch", mock.MagicMock())
+@mock.patch("sync.SnapService.sync_stable_track_snaps")
+@mock.patch("sync.SnapService.sync_all_track_snaps")
+@mock.patch("sync.SnapService.sync_from_upstream")
+def test_sync_snaps_collects_failures(mock_upstream, mock_all, mock_stable, sync):
+    """Tests that a failing snap doesn't stop the other snaps from syncing."""
+    mock_upstream.side_effect = [RuntimeError("lp timeout")] + [None] * 7
+    runner = CliRunner()
+    result = runner.invoke(sync.snaps, ["--dry-run", "--workers=1"])
+    assert isinstance(result.exception, RuntimeError)
+    assert str(result.exception) == "Couldn't sync snaps for kube-apiserver"
+    assert mock_upstream.call_count == 8
+    assert mock_all.call_count == 7
+    # every snap, cdk-addons included, but the failed one syncs its stable track
+    assert mock_stable.call_count == 8
+
+
+def test_sync_forks_summary(sync, tmp_path):
+    """Tests that forks are all synced and summarized, failures last."""
+    outcomes = {
+        "interface-aws-integration": (sync.SyncStatus.CONFLICT, "README.md"),
+        "layer-basic": (sync.SyncStatus.ERROR, "clone failed"),
+    }
+
+    def _sync(service):
+        return outcomes.get(service.name, (sync.SyncStatus.UP_TO_DATE, ""))
+
+    summary = tmp_path / "summary.json"
+    runner = CliRunner()
+    with mock.patch.object(sync.CharmService, "_sync", _sync):
+        result = runner.invoke(
+            sync.forks, ["--dry-run", "--workers=4", f"--summary={summary}"]
+        )
+    assert isinstance(result.exception, RuntimeError)
+    assert str(result.exception) == (
+        "Couldn't sync forks for interface-aws-integration, layer-basic"
+    )
+    results = json.loads(summary.read_text())
+    assert len(results) > len(outcomes)
+    by_name = {each["name"]: each for each in results}
+    assert by_name["interface-aws-integration"]["status"] == "conflict"
+    assert by_name["interface-aws-integration"]["detail"] == "README.md"
+    assert by_name["layer-basic"]["status"] == "error"
+    rows = result.output.splitlines()
+    assert [row.split()[:2] for row in rows[2:4]] == [
+        ["charmed-kubernetes/layer-basic", "error"],
+        ["charmed-kubernetes/interface-aws-integration", "conflict"],
+    ]
+    assert rows[-1] == (
+        f"1 error, 1 conflict, 0 synced, {len(results) - 2} up to date, 0 skipped"
+    )
+
+
+@pytest.fixture
+def fork(tmp_path, monkeypatch):
+    """A local upstream repo and a bare fork of it."""
+    for var in ("AUTHOR", "COMMITTER"):
+        monkeypatch.setenv(f"GIT_{var}_NAME", "test")
+        monkeypatch.setenv(f"GIT_{var}_EMAIL", "test@example.com")
+    upstream, downstream = tmp_path / "upstream", tmp_path / "fork.git"
+    sh.git("init", "-q", "-b", "main", str(upstream))
+
+    def _commit(repo, name, content):
+        (Path(repo) / name).write_text(content)
+        sh.git("-C", str(repo), "add", name)
+        sh.git("-C", str(repo), "commit", "-q", "-m", content)
+
+    _commit(upstream, "README.md", "upstream")
+    sh.git("clone", "-q", "--bare", str(upstream), str(downstream))
+    repo = SimpleNamespace(
+        name="fork",
+        upstream=str(upstream),
+        downstream="charmed-kubernetes/fork",
+        src="fork",
+        password="",
+        base=BaseRepoModel(repo=str(downstream), name="fork"),
+        default_gh_branch=lambda remote: "main",
+    )
+    dryrun(False)
+    with mock.patch.object(git, "mirror_cache", git.MirrorCache(tmp_path / "mirrors")):
+        yield repo, _commit
+
+
+def test_charm_service_sync(sync, fork, tmp_path):
+    """Tests a fork is merged and pushed, or its conflicts reported."""
+    repo, commit = fork
+    service = sync.CharmService(repo)
+    assert service.sync().status == sync.SyncStatus.UP_TO_DATE
+
+    commit(repo.upstream, "new-file", "added upstream")
+    result = service.sync()
+    assert result.status == sync.SyncStatus.SYNCED, result.detail
+    log = sh.git("--git-dir", repo.base.repo, "log", "--format=%s", "main")
+    assert "added upstream" in str(log)
+
+    work = tmp_path / "work"
+    sh.git("clone", "-q", repo.base.repo, str(work))
+    commit(work, "README.md", "downstream")
+    sh.git("-C", str(work), "push", "-q", "origin", "main")
+    commit(repo.upstream, "README.md", "changed upstream")
+    git.mirror_cache._fetched.clear()
+    result = service.sync()
+    assert result.status == sync.SyncStatus.CONFLICT
+    assert result.detail == "README.md"
+
+
+@mock.patch("sync.git.ref_cache.prefetch")
+@mock.patch("sync.lp.Client")
+@mock.patch("sync.DebService.run_builds")
+@mock.patch("sync.DebService.plan_builds", autospec=True)
+@mock.patch("sync.DebService.sync_from_upstream", autospec=True)
+def test_sync_debs_plans_then_builds(
+    mock_sync, mock_plan, mock_run, mock_client, mock_prefetch, sync
+):
+    """Tests debs are planned once published sources are gathered, then built."""
+    mock_client.return_value.ppas.return_value = []
+    builds = {
+        "kubectl": [sync.DebBuild("kubectl", "1.31", "1.31.1", "1.31.0")],
+        "cri-tools": [sync.DebBuild("cri-tools", "1.31", "1.31.0")],
+    }
+
+    def _plan(service, force):
+        if service.name == "kubelet":
+            raise RuntimeError("lp timeout")
+        return builds.get(service.name, [])
+
+    mock_plan.side_effect = _plan
+    runner = CliRunner()
+    result = runner.invoke(sync.debs, ["--sign-key=ABCD", "--dry-run", "--workers=2"])
+    assert isinstance(result.exception, RuntimeError)
+    assert str(result.exception) == "Couldn't sync debs for kubelet"
+    assert mock_sync.call_count == 5
+    assert mock_plan.call_count == 5
+    mock_run.assert_has_calls(
+        [mock.call(builds["kubectl"]), mock.call(builds["cri-tools"])],
+        any_order=True,
+    )
+    assert mock_run.call_count == 2
+    urls = set(mock_prefetch.call_args[0][0])
+    assert "git+ssh://k8s-team-ci@git.launchpad.net/kubectl" in urls
+    assert result.output.splitlines()[2:] == [
+        "kubectl    1.31  1.31.0     1.31.1",
+        "cri-tools  1.31  -          1.31.0",
+    ]